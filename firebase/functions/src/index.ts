@@ -289,6 +289,13 @@ exports.usernameUpdate = functions.database.ref('/v2/users/{userId}/username/').
 });
 
 
+// Generate updates when the status of a project is changed
+exports.projectStatusUpdate = functions.database.ref('/v2/projects/{projectId}/status/').onWrite((_, context) => {
+    const projectId = context.params.projectId;
+    // The time lets the workers keep updates written while they processed the previous ones.
+    return admin.database().ref('/v2/updates/projects/').child(projectId).set(admin.database.ServerValue.TIMESTAMP);
+});
+
 /*
 * Generates update commands for PSQL db
 * Gets triggered when new user group is created, update or deleted
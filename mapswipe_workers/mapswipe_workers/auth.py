@@ -1,5 +1,11 @@
+import threading
+import time
+from contextlib import contextmanager
+
 import firebase_admin
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 from firebase_admin import db
 
 from mapswipe_workers.config import (
@@ -8,6 +14,9 @@ from mapswipe_workers.config import (
     POSTGRES_DB,
     POSTGRES_HOST,
     POSTGRES_PASSWORD,
+    POSTGRES_POOL_MAX_SIZE,
+    POSTGRES_POOL_MIN_SIZE,
+    POSTGRES_POOL_TIMEOUT,
     POSTGRES_PORT,
     POSTGRES_USER,
 )
@@ -51,24 +60,238 @@ def firebaseDB() -> db:
         return db
 
 
+_session = threading.local()
+
+
+def _connect_postgres():
+    return psycopg2.connect(
+        database=POSTGRES_DB,
+        host=POSTGRES_HOST,
+        password=POSTGRES_PASSWORD,
+        port=POSTGRES_PORT,
+        user=POSTGRES_USER,
+    )
+
+
+class PostgresConnectionPool(object):
+    """Thread safe pool of Postgres connections.
+
+    Connections are created on demand up to max_size.
+    If all connections are in use, getconn waits until a connection
+    is returned. Connections are checked before they are handed out
+    and replaced if they are broken.
+    """
+
+    # Connections idle for longer than this are checked with a query.
+    health_check_interval = 60
+
+    def __init__(self, min_size, max_size, timeout=None, connect=_connect_postgres):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._connect = connect
+        self._condition = threading.Condition()
+        self._idle = []  # list of (connection, time it was returned)
+        self._size = 0
+        self.counters = {
+            "checkouts": 0,
+            "wait_time": 0.0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+        }
+
+    def _create_connection(self):
+        connection = self._connect()
+        with self._condition:
+            self.counters["connections_created"] += 1
+        return connection
+
+    def _is_healthy(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, connection):
+        with self._condition:
+            self.counters["connections_discarded"] += 1
+        if not connection.closed:
+            connection.close()
+
+    def getconn(self):
+        """Get a connection from the pool."""
+        start = time.monotonic()
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = None
+                if self.timeout is not None:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        raise psycopg2.pool.PoolError(
+                            "no connection available in postgres connection pool"
+                        )
+                self._condition.wait(remaining)
+            self.counters["checkouts"] += 1
+            self.counters["wait_time"] += time.monotonic() - start
+            if self._idle:
+                connection, idle_since = self._idle.pop()
+            else:
+                # Reserve a slot for a new connection.
+                connection, idle_since = None, None
+                self._size += 1
+
+        # Checks and new connections are done outside of the lock.
+        try:
+            if connection is not None and not self._is_healthy(connection, idle_since):
+                # The broken connection is replaced using the same slot.
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._create_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return connection
+
+    def putconn(self, connection):
+        """Return a connection to the pool. Open transactions are rolled back."""
+        if not connection.closed:
+            try:
+                status = connection.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except psycopg2.Error:
+                pass
+        with self._condition:
+            if connection.closed:
+                self.counters["connections_discarded"] += 1
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def fill(self):
+        """Open connections until the pool holds at least min_size connections."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._create_connection()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+            self.putconn(connection)
+
+    def closeall(self):
+        with self._condition:
+            for connection, _ in self._idle:
+                connection.close()
+                self._size -= 1
+            self._idle = []
+
+    def stats(self):
+        """Counters and current size of the pool for monitoring."""
+        with self._condition:
+            return {
+                **self.counters,
+                "size": self._size,
+                "idle": len(self._idle),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def postgres_pool() -> PostgresConnectionPool:
+    """Get the process wide Postgres connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PostgresConnectionPool(
+                POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE, POSTGRES_POOL_TIMEOUT
+            )
+            _pool.fill()
+        return _pool
+
+
+@contextmanager
+def postgres_session():
+    """Share one Postgres connection between all postgresDB instances
+    created by the current thread.
+
+    This is needed to use session bound objects like temporary tables
+    across function calls, e.g. when transferring results in parallel.
+    Temporary tables are dropped at the end of the session.
+    """
+    pool = postgres_pool()
+    connection = pool.getconn()
+    _session.connection = connection
+    try:
+        yield connection
+    finally:
+        _session.connection = None
+        try:
+            connection.rollback()
+            with connection.cursor() as cursor:
+                cursor.execute("DISCARD TEMP")
+            connection.commit()
+        except psycopg2.Error:
+            connection.close()
+        pool.putconn(connection)
+
+
 class postgresDB(object):
-    """Helper class for Postgres interactions"""
+    """Helper class for Postgres interactions
+
+    Connections are taken from the process wide connection pool
+    on first use and returned to the pool once the instance is deleted.
+    """
 
     __db_connection = None
     _db_cur = None
+    _in_session = False
 
     @property
     def _db_connection(self):
         if self.__db_connection is None:
-            self.__db_connection = psycopg2.connect(
-                database=POSTGRES_DB,
-                host=POSTGRES_HOST,
-                password=POSTGRES_PASSWORD,
-                port=POSTGRES_PORT,
-                user=POSTGRES_USER,
-            )
+            session_connection = getattr(_session, "connection", None)
+            if session_connection is not None:
+                self._in_session = True
+                self.__db_connection = session_connection
+            else:
+                self.__db_connection = postgres_pool().getconn()
         return self.__db_connection
 
+    @contextmanager
+    def transaction(self):
+        """Execute all queries using the yielded cursor in one transaction.
+
+        The transaction is committed at the end of the block
+        or rolled back if an exception is raised.
+        """
+        self._db_cur = self._db_connection.cursor()
+        try:
+            yield self._db_cur
+            self._db_connection.commit()
+        except Exception:
+            self._db_connection.rollback()
+            raise
+        finally:
+            self._db_cur.close()
+
     def query(self, query, data=None):
         self._db_cur = self._db_connection.cursor()
         self._db_cur.execute(query, data)
@@ -87,6 +310,17 @@ class postgresDB(object):
         self._db_connection.commit()
         self._db_cur.close()
 
+    def copy_binary(self, f, table, columns):
+        """Copy a file encoded in the binary COPY format into a table.
+
+        See mapswipe_workers.utils.binary_copy for how to encode the file.
+        The type of each field has to match the type of the column.
+        """
+        column_names = ", ".join(f'"{column}"' for column in columns)
+        self.copy_expert(
+            f"COPY {table} ({column_names}) FROM STDIN WITH (FORMAT binary)", f
+        )
+
     def table_exists(self, table_name):
         resp = self.retr_query(
             "SELECT to_regclass(%(table_name)s);", {"table_name": table_name}
@@ -101,6 +335,12 @@ class postgresDB(object):
         self._db_cur.close()
         return content
 
+    def close(self):
+        """Return the connection to the pool."""
+        # Connections of a session are returned when the session ends.
+        if self.__db_connection is not None and not self._in_session:
+            _pool.putconn(self.__db_connection)
+        self.__db_connection = None
+
     def __del__(self):
-        if self._db_connection and not self._db_connection.closed:
-            self._db_connection.close()
+        self.close()
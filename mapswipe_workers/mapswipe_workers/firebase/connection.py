@@ -0,0 +1,67 @@
+"""Helpers for many parallel requests to the Firebase Realtime Database."""
+
+from typing import Optional
+
+import firebase_admin
+import requests
+from firebase_admin import exceptions
+
+from mapswipe_workers.definitions import logger
+
+# Errors of Firebase which indicate that too many requests are sent at once.
+FIREBASE_OVERLOAD_ERRORS = (
+    exceptions.DeadlineExceededError,
+    exceptions.InternalError,
+    exceptions.ResourceExhaustedError,
+    exceptions.UnavailableError,
+)
+
+
+# Major versions of firebase_admin in which references keep the HTTP session
+# of the app in the private attribute `_client.session`.
+FIREBASE_ADMIN_SESSION_VERSIONS = range(4, 8)
+
+
+def get_firebase_session(fb_db) -> Optional[requests.Session]:
+    """Get the HTTP session which all references of the Firebase app share.
+
+    firebase_admin has no public API for the session.
+    None is returned for versions of firebase_admin which are not known
+    to keep the session in the same place.
+    """
+    major_version = int(firebase_admin.__version__.split(".")[0])
+    if major_version not in FIREBASE_ADMIN_SESSION_VERSIONS:
+        logger.warning(
+            f"Cannot get the HTTP session of firebase_admin {firebase_admin.__version__}."
+        )
+        return None
+    client = getattr(fb_db.reference(""), "_client", None)
+    session = getattr(client, "session", None)
+    if not isinstance(session, requests.Session):
+        return None
+    return session
+
+
+def keep_firebase_connections_alive(fb_db, pool_size: int) -> None:
+    """Keep as many connections to Firebase open as requests are sent in parallel.
+
+    All references share the HTTP session of the Firebase app.
+    By default this session keeps only 10 connections open.
+    Connections of additional threads are closed after each request.
+    If the session is not available the default connection pool is used.
+    """
+    session = get_firebase_session(fb_db)
+    if session is None:
+        return
+    for prefix in ["http://", "https://"]:
+        adapter = session.get_adapter(prefix)
+        if getattr(adapter, "_pool_maxsize", 0) >= pool_size:
+            continue
+        session.mount(
+            prefix,
+            requests.adapters.HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=adapter.max_retries,
+            ),
+        )
@@ -1,9 +1,45 @@
+import concurrent.futures
+import json
+import time
 from dataclasses import asdict
+from typing import Any, Iterable, Iterator, Tuple
 
 from mapswipe_workers import auth
 from mapswipe_workers.definitions import CustomError, logger
+from mapswipe_workers.firebase.connection import (
+    FIREBASE_OVERLOAD_ERRORS,
+    keep_firebase_connections_alive,
+)
 from mapswipe_workers.utils import gzip_str
 
+# Firebase limits the size of a single write request.
+# Batches of an update stay well below this limit.
+UPDATE_BATCH_MAX_BYTES = 8 * 1024 * 1024
+
+
+def get_batches_of_size(
+    items: Iterable[Tuple[str, Any]], max_bytes: int
+) -> Iterator[Tuple[dict, int]]:
+    """Pack (path, value) items into batches of at most max_bytes as JSON.
+
+    Yields each batch as dict for Reference.update and its size in bytes.
+    An item which is larger than max_bytes on its own becomes a single batch.
+    """
+    batch = {}
+    batch_bytes = 0
+    for path, value in items:
+        size = len(path) + len(json.dumps(value, separators=(",", ":")).encode())
+        if batch and batch_bytes + size > max_bytes:
+            yield batch, batch_bytes
+            batch = {}
+            batch_bytes = 0
+        if size > max_bytes:
+            logger.warning(f"{path} - {size} bytes exceed the batch size of firebase")
+        batch[path] = value
+        batch_bytes += size
+    if batch:
+        yield batch, batch_bytes
+
 
 class Firebase:
     def __init__(self):
@@ -28,37 +64,84 @@ class Firebase:
         self.ref.update({f"v2/groups/{projectId}": groups})
         logger.info(f"{projectId} -" f" uploaded groups to firebase realtime database")
 
+    def update_in_batches(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        max_bytes: int = UPDATE_BATCH_MAX_BYTES,
+        max_workers: int = 8,
+        max_attempts: int = 3,
+        backoff_seconds: float = 1,
+    ) -> int:
+        """Update many paths with batches which are sent in parallel.
+
+        Items are (path, value) pairs and are packed into batches
+        of at most max_bytes. Batches are uploaded while further items
+        are packed, so items can be created lazily. If Firebase is overloaded a batch is retried
+        after a backoff which is doubled with every attempt.
+
+        Returns the number of uploaded bytes.
+        """
+
+        def update(batch):
+            for attempt in range(max_attempts):
+                try:
+                    self.ref.update(batch)
+                    return
+                except FIREBASE_OVERLOAD_ERRORS:
+                    if attempt + 1 == max_attempts:
+                        raise
+                    time.sleep(backoff_seconds * 2**attempt)
+
+        keep_firebase_connections_alive(self.fb_db, max_workers)
+        uploaded_bytes = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for batch, batch_bytes in get_batches_of_size(items, max_bytes):
+                # keep only a few batches in memory which wait for a worker
+                if len(pending) >= 2 * max_workers:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(update, batch))
+                uploaded_bytes += batch_bytes
+            for future in concurrent.futures.as_completed(pending):
+                future.result()
+        return uploaded_bytes
+
     def save_tasks_to_firebase(self, projectId, groupsOfTasks, useCompression: bool):
-        task_upload_dict = {}
-        for group_counter, group_id in enumerate(groupsOfTasks.keys()):
-            for i in range(0, len(groupsOfTasks[group_id])):
-                groupsOfTasks[group_id][i].pop("geometry", None)
-
-            tasks_list = groupsOfTasks[group_id]
-            # for tasks of a building footprint project
-            # we use compression to reduce storage size in firebase
-            # since the tasks hold geometries their storage size
-            # can get quite big otherwise
-            if useCompression:
-                # removing properties from each task and compress
+        def get_task_upload_items():
+            for group_id, tasks_list in groupsOfTasks.items():
                 for task in tasks_list:
-                    task.pop("properties", None)
-
-                tasks_list = gzip_str.compress_tasks(tasks_list)
-
-            task_upload_dict[f"v2/tasks/{projectId}/{group_id}"] = tasks_list
-
-            # we upload tasks in batches of maximum 150 groups
-            # this is to avoid the maximum write size limit in firebase
-            if len(task_upload_dict) % 150 == 0 or (group_counter + 1) == len(
-                groupsOfTasks
-            ):
-                self.ref.update(task_upload_dict)
-                logger.info(
-                    f"{projectId} -"
-                    f" uploaded 150 groups with tasks to firebase realtime database"
-                )
-                task_upload_dict = {}
+                    task.pop("geometry", None)
+
+                # for tasks of a building footprint project
+                # we use compression to reduce storage size in firebase
+                # since the tasks hold geometries their storage size
+                # can get quite big otherwise
+                if useCompression:
+                    # removing properties from each task and compress
+                    for task in tasks_list:
+                        task.pop("properties", None)
+
+                    tasks_list = gzip_str.compress_tasks(tasks_list)
+
+                yield f"v2/tasks/{projectId}/{group_id}", tasks_list
+
+        # we upload tasks in batches of limited size
+        # this is to avoid the maximum write size limit in firebase
+        start = time.perf_counter()
+        uploaded_bytes = self.update_in_batches(get_task_upload_items())
+        duration = max(time.perf_counter() - start, 1e-9)
+        megabytes = uploaded_bytes / 1024 / 1024
+        logger.info(
+            f"{projectId} -"
+            f" uploaded {len(groupsOfTasks)} groups with tasks ({megabytes:.1f} MB)"
+            f" to firebase realtime database in {duration:.1f} s"
+            f" ({len(groupsOfTasks) / duration:.0f} groups/s,"
+            f" {megabytes / duration:.1f} MB/s)"
+        )
 
     def delete_project_draft_from_firebase(self, projectId):
         self.ref.update({f"v2/projectDrafts/{projectId}": {}})
@@ -1,6 +1,9 @@
-import csv
+import datetime
+import functools
 import io
-from typing import List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import dateutil.parser
 import geojson
@@ -9,18 +12,52 @@ import psycopg2
 from mapswipe_workers import auth
 from mapswipe_workers.definitions import ProjectType, logger, sentry
 from mapswipe_workers.firebase_to_postgres import update_data
-
-
-def transfer_results(project_id_list: List[str] = None) -> List[str]:
+from mapswipe_workers.utils import binary_copy
+from mapswipe_workers.utils.copy_functions import escape_copy_value
+
+# Columns of results_temp and results_geometry_temp in the order used by COPY.
+RESULTS_COLUMNS = [
+    "project_id",
+    "group_id",
+    "user_id",
+    "task_id",
+    "timestamp",
+    "start_time",
+    "end_time",
+    "result",
+    "app_version",
+    "client_type",
+]
+
+# Tables used to stage data before it is inserted into the actual tables.
+STAGING_TABLES = [
+    "results_temp",
+    "results_geometry_temp",
+    "results_user_groups_temp",
+    "users_temp",
+    "user_groups_temp",
+]
+
+
+def transfer_results(
+    project_id_list: List[str] = None,
+    page_size: Optional[int] = None,
+    workers: int = 1,
+) -> List[str]:
     """Transfer results for one project after the other.
     Will only trigger the transfer of results for projects
     that are defined in the postgres database.
     Will not transfer results for tutorials and
     for projects which are not set up in postgres.
+    If a page_size is given, the results of a project are streamed
+    from Firebase in pages of at most page_size groups.
+    Otherwise all results of a project are downloaded at once.
+    If workers is larger than 1, up to this number of projects are
+    transferred at the same time (see transfer_results_in_parallel).
     """
+    fb_db = auth.firebaseDB()
     if project_id_list is None:
         # get project_ids from existing results if no project ids specified
-        fb_db = auth.firebaseDB()
         project_id_list = fb_db.reference("v2/results/").get(shallow=True)
         if project_id_list is None:
             project_id_list = []
@@ -30,7 +67,7 @@ def transfer_results(project_id_list: List[str] = None) -> List[str]:
     # We will only transfer results for projects we have in postgres.
     project_type_per_id = get_projects_from_postgres()
 
-    project_id_list_transfered = []
+    projects = {}
     for project_id in project_id_list:
         if project_id not in project_type_per_id.keys():
             logger.info(
@@ -45,17 +82,145 @@ def transfer_results(project_id_list: List[str] = None) -> List[str]:
             )
             continue
         else:
-            logger.info(f"{project_id}: Start transfer results")
-            fb_db = auth.firebaseDB()
-            results_ref = fb_db.reference(f"v2/results/{project_id}")
-            results = results_ref.get()
-            del fb_db
-            project = ProjectType(project_type_per_id[project_id]).constructor
+            projects[project_id] = ProjectType(
+                project_type_per_id[project_id]
+            ).constructor
+
+    if workers > 1 and len(projects) > 1:
+        transfer_results_in_parallel(projects, page_size, workers)
+    else:
+        for project_id, project in projects.items():
+            transfer_project_results(project_id, project, page_size)
+
+    return list(projects.keys())
+
+
+def transfer_results_in_parallel(
+    projects: Dict[str, Any], page_size: Optional[int], workers: int
+) -> None:
+    """Transfer results of several projects at the same time.
+
+    Each worker uses its own postgres session with temporary staging tables.
+    This way Firebase requests of one project overlap with the inserts
+    of other projects without workers sharing results_temp and the like.
+    """
+
+    def _transfer(project_id, project):
+        with auth.postgres_session():
+            create_staging_tables()
+            transfer_project_results(project_id, project, page_size)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_transfer, project_id, project)
+            for project_id, project in projects.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+def create_staging_tables() -> None:
+    """Create temporary staging tables for the current postgres session.
+
+    Temporary tables take precedence over tables with the same name
+    in the public schema. All following queries of this session
+    therefore use the session's own staging tables.
+    """
+    p_con = auth.postgresDB()
+    query = "".join(
+        f"CREATE TEMP TABLE IF NOT EXISTS {table} (LIKE public.{table});"
+        for table in STAGING_TABLES
+    )
+    p_con.query(query)
+    del p_con
+
+
+def transfer_project_results(
+    project_id: str, project, page_size: Optional[int] = None
+) -> None:
+    """Transfer all results of a project and log how long this took."""
+    logger.info(f"{project_id}: Start transfer results")
+    group_count = 0
+    fetch_time = 0.0
+    transfer_time = 0.0
+
+    start = time.perf_counter()
+    for results in get_results(project_id, page_size):
+        fetched = time.perf_counter()
+        fetch_time += fetched - start
+        group_count += len(results)
+
+        transfer_results_for_project(project_id, results, project)
+
+        start = time.perf_counter()
+        transfer_time += start - fetched
+
+    logger.info(
+        f"{project_id}: Finished transfer of results for {group_count} groups "
+        f"in {fetch_time + transfer_time:.2f}s "
+        f"(fetch: {fetch_time:.2f}s, transfer: {transfer_time:.2f}s)"
+    )
+
+
+def get_results(project_id: str, page_size: Optional[int] = None) -> Iterator[dict]:
+    """Get the results of a project from Firebase.
+
+    If page_size is not set, all results are returned at once.
+    Otherwise results are returned in pages of at most page_size groups.
+    The next page is requested only after the previous page has been
+    processed.
+    """
+    if not page_size:
+        fb_db = auth.firebaseDB()
+        results = fb_db.reference(f"v2/results/{project_id}").get()
+        if results is None:
+            logger.info(f"{project_id}: No results in Firebase")
+        else:
+            yield results
+        return
+
+    last_group_id = None
+    page_count = 0
+    while True:
+        results = get_results_page(project_id, page_size, start_after=last_group_id)
+        if not results:
+            break
+
+        page_count += 1
+        logger.info(
+            f"{project_id}: Transfer results for page {page_count} "
+            f"with {len(results)} groups"
+        )
+        yield results
+
+        # Failed pages are not deleted from Firebase.
+        # Continue after the last group of this page to not fetch them again.
+        # Results are returned in the key order used by Firebase.
+        last_group_id = next(reversed(results))
+        if len(results) < page_size:
+            break
 
-            transfer_results_for_project(project_id, results, project)
-            project_id_list_transfered.append(project_id)
 
-    return project_id_list_transfered
+def get_results_page(
+    project_id: str, page_size: int, start_after: Optional[str] = None
+) -> dict:
+    """Get the results of at most page_size groups ordered by group id.
+
+    Firebase can't combine shallow queries with query parameters.
+    Hence, the full results of each group in the page are downloaded.
+    If start_after is set, only groups with a larger group id are returned.
+    """
+    fb_db = auth.firebaseDB()
+    query = fb_db.reference(f"v2/results/{project_id}").order_by_key()
+    if start_after is None:
+        results = query.limit_to_first(page_size).get()
+    else:
+        # start_at is inclusive, therefore we ask for one more group
+        # and drop the group we have already seen.
+        results = query.start_at(start_after).limit_to_first(page_size + 1).get()
+        if results:
+            results.pop(start_after, None)
+    return results or {}
 
 
 def transfer_results_for_project(
@@ -145,6 +310,11 @@ def transfer_results_for_project(
         if not filter_mode:
             transfer_results_for_project(project_id, results, project, filter_mode=True)
     except Exception as e:
+        # Make sure a failed transaction does not block following queries
+        # when the connection is shared in a postgres session.
+        p_con = auth.postgresDB()
+        p_con.query("ROLLBACK")
+
         sentry.capture_exception(e)
         sentry.capture_message(f"could not transfer results to postgres: {project_id}")
         logger.exception(e)
@@ -210,36 +380,59 @@ def results_complete(
     return complete
 
 
+@functools.lru_cache(maxsize=100000)
+def parse_timestamp(timestamp: str) -> datetime.datetime:
+    """Parse a timestamp as set by the app, e.g. 2020-02-03T15:39:39.332Z
+
+    The app always uses this ISO 8601 format which can be parsed
+    by the much faster datetime.fromisoformat once the Z is replaced.
+    For any other format we fall back to dateutil.
+    Many results share the same start and end time.
+    Therefore, parsed timestamps are cached.
+    """
+    if timestamp.endswith("Z"):
+        try:
+            return datetime.datetime.fromisoformat(f"{timestamp[:-1]}+00:00")
+        except ValueError:
+            pass
+    return dateutil.parser.parse(timestamp)
+
+
+@functools.lru_cache(maxsize=100000)
+def format_timestamp(timestamp: str) -> str:
+    """Format a timestamp set by the app for the COPY statement."""
+    return str(parse_timestamp(timestamp))
+
+
 def results_to_file(
-    results: dict, projectId: str, result_type: str = "integer"
-) -> Tuple[io.StringIO, io.StringIO]:
+    results: dict, projectId: str, result_type: str = "integer", binary: bool = False
+) -> Tuple[Union[io.StringIO, io.BytesIO], io.StringIO]:
     """
     Writes results to an in-memory file like object
-    formatted as a csv using the buffer module (StringIO).
+    formatted as tab separated text using the buffer module (StringIO).
     This can be then used by the COPY statement of Postgres
     for a more efficient import of many results into the Postgres
     instance.
+    The columns which are the same for all results of a user in a group
+    are formatted once and only task id and result are added per task.
     Parameters
     ----------
     results: dict
         The results as retrieved from the Firebase Realtime Database instance.
+    binary: bool
+        If true, results are encoded in the binary COPY format (BytesIO).
     Returns
     -------
     results_file: io.StingIO
         The results in an StringIO buffer.
     """
-    # If csv file is a file object, it should be opened with newline=''
-
-    results_file = io.StringIO("")
-    user_group_results_file = io.StringIO("")
-
-    w = csv.writer(results_file, delimiter="\t", quotechar="'")
-    user_group_results_csv = csv.writer(
-        user_group_results_file, delimiter="\t", quotechar="'"
-    )
+    rows = []
+    user_group_rows = []
+    project_id = escape_copy_value(projectId)
 
     logger.info(f"Got {len(results.items())} groups for project {projectId}")
     for groupId, users in results.items():
+        group_id = escape_copy_value(groupId)
         for userId, result_data in users.items():
 
             # check if all attributes are set
@@ -253,6 +446,7 @@ def results_to_file(
             ):
                 continue
 
+            user_id = escape_copy_value(userId)
             user_group_ids = [
                 user_group_id
                 for user_group_id, is_selected in result_data.get(
@@ -261,84 +455,119 @@ def results_to_file(
                 if is_selected
             ]
 
-            start_time = dateutil.parser.parse(result_data["startTime"])
-            end_time = dateutil.parser.parse(result_data["endTime"])
-            timestamp = end_time
-            app_version = result_data.get("appVersion", "")
-            client_type = result_data.get("clientType", "")
-
             if type(result_data["results"]) is dict:
-                for taskId, result in result_data["results"].items():
-                    if result_type == "geometry":
-                        result = geojson.dumps(geojson.GeometryCollection(result))
-                    w.writerow(
-                        [
-                            projectId,
-                            groupId,
-                            userId,
-                            taskId,
-                            timestamp,
-                            start_time,
-                            end_time,
-                            result,
-                            app_version,
-                            client_type,
-                        ]
-                    )
+                task_results = result_data["results"].items()
             elif type(result_data["results"]) is list:
-                # TODO: optimize for performance
-                # (make sure data from firebase is always a dict)
                 # if key is a integer firebase will return a list
                 # if first key (list index) is 5
                 # list indicies 0-4 will have value None
-                for taskId, result in enumerate(result_data["results"]):
-                    if result is None:
-                        continue
-                    else:
-                        if result_type == "geometry":
-                            result = geojson.dumps(geojson.GeometryCollection(result))
-                        w.writerow(
-                            [
-                                projectId,
-                                groupId,
-                                userId,
-                                taskId,
-                                timestamp,
-                                start_time,
-                                end_time,
-                                result,
-                                app_version,
-                                client_type,
-                            ]
-                        )
+                task_results = (
+                    (taskId, result)
+                    for taskId, result in enumerate(result_data["results"])
+                    if result is not None
+                )
             else:
                 raise TypeError
 
+            if result_type == "geometry":
+                task_results = (
+                    (taskId, geojson.dumps(geojson.GeometryCollection(result)))
+                    for taskId, result in task_results
+                )
+
+            if binary:
+                rows.extend(
+                    binary_result_rows(
+                        task_results,
+                        projectId,
+                        groupId,
+                        userId,
+                        result_data,
+                        result_type,
+                    )
+                )
+            else:
+                start_time = format_timestamp(result_data["startTime"])
+                end_time = format_timestamp(result_data["endTime"])
+                timestamp = end_time
+                app_version = escape_copy_value(result_data.get("appVersion", ""))
+                client_type = escape_copy_value(result_data.get("clientType", ""))
+
+                # Each row is: task_id, result and the columns in prefix and suffix.
+                prefix = f"{project_id}\t{group_id}\t{user_id}\t"
+                times = f"\t{timestamp}\t{start_time}\t{end_time}\t"
+                suffix = f"\t{app_version}\t{client_type}\n"
+                rows.extend(
+                    f"{prefix}{escape_copy_value(taskId)}{times}"
+                    f"{escape_copy_value(result)}{suffix}"
+                    for taskId, result in task_results
+                )
+
             if result_data["results"]:
-                user_group_results_csv.writerows(
-                    [
-                        [
-                            # Not using taskId as it is included by projectId-groupId
-                            projectId,
-                            groupId,
-                            userId,
-                            user_group_id,
-                        ]
-                        for user_group_id in user_group_ids
-                    ]
+                user_group_rows.extend(
+                    # Not using taskId as it is included by projectId-groupId
+                    f"{project_id}\t{group_id}\t{user_id}\t"
+                    f"{escape_copy_value(user_group_id)}\n"
+                    for user_group_id in user_group_ids
                 )
 
-    results_file.seek(0)
-    user_group_results_file.seek(0)
+    if binary:
+        results_file = io.BytesIO(
+            binary_copy.HEADER + b"".join(rows) + binary_copy.TRAILER
+        )
+    else:
+        results_file = io.StringIO("".join(rows))
+    user_group_results_file = io.StringIO("".join(user_group_rows))
     return results_file, user_group_results_file
 
 
+def binary_result_rows(
+    task_results: Iterable[Tuple[Any, Any]],
+    projectId: str,
+    groupId: str,
+    userId: str,
+    result_data: dict,
+    result_type: str,
+) -> Iterator[bytes]:
+    """Encode the results of a user for a group in the binary COPY format."""
+    start_time = parse_timestamp(result_data["startTime"])
+    end_time = parse_timestamp(result_data["endTime"])
+    timestamp = end_time
+
+    # Each row is: task_id, result and the fields in prefix and suffix.
+    prefix = (
+        binary_copy.encode_tuple_header(len(RESULTS_COLUMNS))
+        + binary_copy.encode_varchar(projectId)
+        + binary_copy.encode_varchar(groupId)
+        + binary_copy.encode_varchar(userId)
+    )
+    times = (
+        binary_copy.encode_timestamp(timestamp)
+        + binary_copy.encode_timestamp(start_time)
+        + binary_copy.encode_timestamp(end_time)
+    )
+    suffix = binary_copy.encode_varchar(
+        result_data.get("appVersion", "")
+    ) + binary_copy.encode_varchar(result_data.get("clientType", ""))
+
+    if result_type == "geometry":
+        encode_result = binary_copy.encode_varchar
+    else:
+        encode_result = binary_copy.encode_int
+
+    for taskId, result in task_results:
+        yield prefix + binary_copy.encode_varchar(taskId) + times + encode_result(
+            result
+        ) + suffix
+
+
 def save_results_to_postgres(
     results_file: io.StringIO,
     project_id: str,
     filter_mode: bool,
     result_temp_table: str = "results_temp",
     result_table: str = "mapping_sessions_results",
+    binary: bool = False,
 ) -> None:
     """
     Saves results to a temporary table in postgres
@@ -346,7 +575,7 @@ def save_results_to_postgres(
     for a more efficient import into the database.
     Parameters
     ----------
-    results_file: io.StringIO
+    results_file: io.StringIO or io.BytesIO
     filter_mode: boolean
         If true, try to filter out invalid results.
     result_temp_table:
@@ -355,22 +584,15 @@ def save_results_to_postgres(
     result_table:
         result_temp_table and result_table are different from usual if
         result type is not int
+    binary: boolean
+        If true, results_file is encoded in the binary COPY format.
     """
 
     p_con = auth.postgresDB()
-    columns = [
-        "project_id",
-        "group_id",
-        "user_id",
-        "task_id",
-        "timestamp",
-        "start_time",
-        "end_time",
-        "result",
-        "app_version",
-        "client_type",
-    ]
-    p_con.copy_from(results_file, result_temp_table, columns)
+    if binary:
+        p_con.copy_binary(results_file, result_temp_table, RESULTS_COLUMNS)
+    else:
+        p_con.copy_from(results_file, result_temp_table, RESULTS_COLUMNS)
     results_file.close()
 
     if filter_mode:
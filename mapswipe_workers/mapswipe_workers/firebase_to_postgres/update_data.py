@@ -1,13 +1,18 @@
 """Update users and project information from Firebase in Postgres."""
 
+import collections
 import concurrent.futures
 import csv
 import datetime as dt
 import io
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from mapswipe_workers import auth
 from mapswipe_workers.definitions import logger
+from mapswipe_workers.firebase.connection import (
+    FIREBASE_OVERLOAD_ERRORS,
+    keep_firebase_connections_alive,
+)
 
 
 # TODO: Change firebase/client side to send UTC time instead.
@@ -23,34 +28,78 @@ def convert_firebase_datetime_to_database_format(timestamp):
         return dt.datetime.strptime(timestamp.replace("Z", ""), "%Y-%m-%dT%H:%M:%S")
 
 
-def get_user_attribute_from_firebase(user_ids: List[str], attribute: str):
-    """Use threading to query a user attribute in firebase.
+def get_attributes_from_firebase(
+    path: str,
+    ids: List[str],
+    attributes: List[str],
+    max_workers: int = 20,
+    max_attempts: int = 3,
+) -> Dict[str, Dict[str, Any]]:
+    """Get attributes of many users or projects from Firebase.
 
-    Follows a workflow describted in this blogpost:
-    https://www.digitalocean.com/community/tutorials/how-to-use-threadpoolexecutor-in-python-3
+    Each node (e.g. `v2/users/<user_id>`) is requested once as shallow read.
+    This returns all attributes which are primitive values
+    without nested data like the contributions of a user.
+    Only attributes with primitive values can be requested this way.
+
+    Requests are sent in rounds of ten requests per parallel request.
+    The number of parallel requests is doubled after a successful round
+    up to max_workers and halved if Firebase is overloaded.
+    Failed requests are retried in the next round.
+
+    Returns a dict with a dict of the requested attributes for each id.
+    Attributes which are not set in Firebase are None.
     """
 
-    def get_user_attribute(_user_id, _attribute):
-        ref = fb_db.reference(f"v2/users/{_user_id}/{_attribute}")
-        return [_user_id, ref.get()]
+    def get_attributes(_id):
+        node = fb_db.reference(f"{path}/{_id}").get(shallow=True)
+        if not isinstance(node, dict):
+            node = {}
+        return {attribute: node.get(attribute) for attribute in attributes}
 
     fb_db = auth.firebaseDB()
-    user_attribute_dict = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = []
-        for user_id in user_ids:
-            futures.append(
-                executor.submit(
-                    get_user_attribute, _user_id=user_id, _attribute=attribute
-                )
+    keep_firebase_connections_alive(fb_db, max_workers)
+
+    attributes_dict = {}
+    attempts = collections.Counter()
+    pending = collections.deque(ids)
+    workers = max(1, max_workers // 4)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending:
+            batch = collections.deque(
+                pending.popleft() for _ in range(min(len(pending), workers * 10))
             )
+            running = {}
+            overloaded = False
+            while batch or running:
+                # at most `workers` requests are sent at the same time
+                while batch and len(running) < workers:
+                    _id = batch.popleft()
+                    running[executor.submit(get_attributes, _id)] = _id
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    _id = running.pop(future)
+                    try:
+                        attributes_dict[_id] = future.result()
+                    except FIREBASE_OVERLOAD_ERRORS:
+                        attempts[_id] += 1
+                        if attempts[_id] >= max_attempts:
+                            raise
+                        overloaded = True
+                        pending.append(_id)
+
+            if overloaded:
+                workers = max(1, workers // 2)
+                logger.info(f"Firebase is overloaded. Use {workers} parallel requests.")
+            else:
+                workers = min(max_workers, workers * 2)
 
-        for future in concurrent.futures.as_completed(futures):
-            user_id, status = future.result()
-            user_attribute_dict[user_id] = status
-
-    logger.info(f"Got attribute '{attribute}' from firebase for {len(user_ids)} users.")
-    return user_attribute_dict
+    logger.info(
+        f"Got attributes {attributes} from firebase for {len(ids)} nodes in {path}."
+    )
+    return attributes_dict
 
 
 def update_user_data(user_ids: Optional[List[str]] = None) -> None:
@@ -83,11 +132,8 @@ def update_user_data(user_ids: Optional[List[str]] = None) -> None:
     else:
         logger.info(f"There are {len(new_user_ids)} new users in Firebase.")
         # get username and created attributes from firebase
-        firebase_usernames_dict = get_user_attribute_from_firebase(
-            new_user_ids, "username"
-        )
-        firebase_created_dict = get_user_attribute_from_firebase(
-            new_user_ids, "created"
+        firebase_users_dict = get_attributes_from_firebase(
+            "v2/users", new_user_ids, ["username", "created"]
         )
 
         # write user information to in memory file
@@ -97,12 +143,12 @@ def update_user_data(user_ids: Optional[List[str]] = None) -> None:
         for new_user_id in new_user_ids:
             # Get username from dict.
             # Some users might not have a username set in Firebase.
-            username = firebase_usernames_dict.get(new_user_id, None)
+            username = firebase_users_dict[new_user_id]["username"]
 
             # Get created timestamp from dict.
             # Convert timestamp (ISO 8601) from string to a datetime object.
             # Use current timestamp if the value is not set in Firebase
-            timestamp = firebase_created_dict.get(new_user_id, None)
+            timestamp = firebase_users_dict[new_user_id]["created"]
             if timestamp:
                 created = dt.datetime.strptime(
                     timestamp.replace("Z", ""), "%Y-%m-%dT%H:%M:%S.%f"
@@ -470,38 +516,6 @@ def create_update_membership_data(
     del pg_db
 
 
-def get_project_attribute_from_firebase(project_ids: List[str], attribute: str):
-    """Use threading to query a project attribute in firebase.
-
-    Follows a workflow describted in this blogpost:
-    https://www.digitalocean.com/community/tutorials/how-to-use-threadpoolexecutor-in-python-3
-    """
-
-    def get_project_attribute(_project_id, _attribute):
-        ref = fb_db.reference(f"v2/projects/{_project_id}/{_attribute}")
-        return [_project_id, ref.get()]
-
-    fb_db = auth.firebaseDB()
-    project_attribute_dict = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = []
-        for project_id in project_ids:
-            futures.append(
-                executor.submit(
-                    get_project_attribute, _project_id=project_id, _attribute=attribute
-                )
-            )
-
-        for future in concurrent.futures.as_completed(futures):
-            project_id, status = future.result()
-            project_attribute_dict[project_id] = status
-
-    logger.info(
-        f"Got attribute '{attribute}' from firebase for {len(project_ids)} projects."
-    )
-    return project_attribute_dict
-
-
 def update_project_data(project_ids: list = []):
     """Get status of projects from Firebase and updates them in Postgres.
 
@@ -537,13 +551,15 @@ def update_project_data(project_ids: list = []):
 
     # get project status from firebase
     if len(project_ids) > 0:
-        project_status_dict = get_project_attribute_from_firebase(project_ids, "status")
+        project_status_dict = get_attributes_from_firebase(
+            "v2/projects", project_ids, ["status"]
+        )
 
         for project_id, postgres_status in project_info:
             # for each project we check if the status set in firebase
             # and the status set in postgres are different
             # we update status in postgres if value has changed
-            firebase_status = project_status_dict[project_id]
+            firebase_status = project_status_dict[project_id]["status"]
             if postgres_status == firebase_status or firebase_status is None:
                 # project status did not change or
                 # project status is not available in firebase
@@ -567,6 +583,34 @@ def update_project_data(project_ids: list = []):
     logger.info("Finished status update projects.")
 
 
+def update_changed_project_data() -> List[str]:
+    """Update status of projects which have changed in Firebase in Postgres.
+
+    A Firebase function writes the time to `v2/updates/projects/{project_id}`
+    when the status of a project is written.
+    Processed project ids are removed from there, unless the status
+    was written again meanwhile.
+    Use update_project_data to check the status of all projects.
+    """
+    fb_db = auth.firebaseDB()
+    ref = fb_db.reference("v2/updates/projects")
+    changed_projects = ref.get() or {}
+
+    if not changed_projects:
+        logger.info("There are NO projects with a changed status in Firebase.")
+        return []
+
+    changed_project_ids = list(changed_projects.keys())
+    update_project_data(changed_project_ids)
+
+    # Finally delete used records, which have not been written again
+    for project_id, value in changed_projects.items():
+        ref.child(project_id).transaction(
+            lambda current, value=value: None if current == value else current
+        )
+    return changed_project_ids
+
+
 def get_project_progress(project_id: str) -> int:
     """
     Calculate overall project progress as the average progress for all groups.
@@ -578,48 +622,27 @@ def get_project_progress(project_id: str) -> int:
     progress, we return 100% here. We should evaluate if this is what we want if/when
     we introduce automated project rotation upon completion (as the reported completion
     would happen 0.5% before actual completion).
+
+    The number of users per group is maintained in the groups_progress table
+    by a trigger on mapping_sessions.
     """
     pg_db = auth.postgresDB()
     query = """
         select
-          avg(group_progress)::integer as progress
-        from
-        (
-            -- Get all groups for this project and
-            -- add progress for groups that have been worked on already.
-            -- Set progress to 0 if no user has worked on this group.
-            -- For groups that no users worked on
-            -- there are no entries in the results table.
-            select
-              g.group_id
-              ,g.project_id
-              ,case
-                when group_progress is null then 0
-                else group_progress
-              end as group_progress
-            from groups g
-            left join
-                (
-                -- Here we get the progress for all groups
-                -- for which results have been submitted already.
-                -- Progress for a group can be max 100
-                -- even if more users than required submitted results.
-                -- The verification number of a project is used here.
-                select
-                  ms.group_id
-                  ,ms.project_id
-                  ,case
-                    when count(distinct user_id) >= p.verification_number then 100
-                    else 100 * count(distinct user_id) / p.verification_number
-                  end as group_progress
-                from mapping_sessions ms, projects p
-                where ms.project_id = p.project_id
-                group by group_id, ms.project_id, p.verification_number
-            ) bar
-            on bar.group_id = g.group_id and bar.project_id = g.project_id
-            where g.project_id = %s
-        ) foo
-        group by project_id
+          avg(
+            -- Progress for a group can be max 100
+            -- even if more users than required submitted results.
+            -- Groups no user has worked on have no entry in groups_progress.
+            case
+              when coalesce(gp.number_of_users, 0) >= p.verification_number then 100
+              else 100 * coalesce(gp.number_of_users, 0) / p.verification_number
+            end
+          )::integer as progress
+        from groups g
+        join projects p using (project_id)
+        left join groups_progress gp using (project_id, group_id)
+        where g.project_id = %s
+        group by g.project_id
     """
     data = [project_id]
     return pg_db.retr_query(query, data)[0][0]
@@ -639,8 +662,8 @@ def get_contributor_count_from_postgres(project_id: str) -> int:
     pg_db = auth.postgresDB()
     query = """
         select
-          count(distinct user_id)
-        from mapping_sessions ms
+          count(*)
+        from projects_contributors
         where
           project_id = %s
     """
@@ -660,6 +683,38 @@ def set_contributor_count_in_firebase(project_id: str):
     )
 
 
+def backfill_progress() -> None:
+    """Rebuild groups_progress and projects_contributors from mapping_sessions.
+
+    The triggers on mapping_sessions keep both tables up to date.
+    This is only needed once after the tables have been created
+    for mapping sessions which already exist.
+    Inserts into mapping_sessions are blocked until the backfill is done.
+    """
+    pg_db = auth.postgresDB()
+    with pg_db.transaction() as cursor:
+        cursor.execute("LOCK TABLE mapping_sessions IN SHARE MODE")
+        cursor.execute("TRUNCATE groups_progress, projects_contributors")
+        cursor.execute(
+            """
+            INSERT INTO groups_progress (project_id, group_id, number_of_users)
+            SELECT project_id, group_id, count(*)
+            FROM mapping_sessions
+            GROUP BY project_id, group_id
+            """
+        )
+        logger.info(f"backfilled progress for {cursor.rowcount} groups")
+        cursor.execute(
+            """
+            INSERT INTO projects_contributors (project_id, user_id, number_of_groups)
+            SELECT project_id, user_id, count(*)
+            FROM mapping_sessions
+            GROUP BY project_id, user_id
+            """
+        )
+        logger.info(f"backfilled {cursor.rowcount} project contributors")
+
+
 def set_tileserver_api_key(project_id: str, api_key: str) -> None:
     """Set the tileserver api key value in Firebase."""
 
@@ -1,12 +1,16 @@
+import concurrent.futures
 import csv
 import datetime as dt
 import hashlib
+import multiprocessing
 import os
 import shutil
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+import pandas as pd
 
 from mapswipe_workers import auth
-from mapswipe_workers.definitions import DATA_PATH, ProjectType, logger
+from mapswipe_workers.definitions import DATA_PATH, ProjectType, logger, sentry
 from mapswipe_workers.generate_stats import overall_stats
 
 
@@ -88,7 +92,53 @@ def get_recent_projects(hours: int = 3):
     return project_ids
 
 
-def generate_stats(project_id_list: Optional[List[str]] = None):
+def get_per_project_statistics(
+    project_id: str, project_info: pd.DataFrame
+) -> Optional[dict]:
+    """
+    Aggregate results and get per project statistics.
+    Return None if this failed, so that other projects are not affected.
+    """
+    logger.info(f"start generate stats for project: {project_id}")
+    try:
+        project = ProjectType(project_info["project_type"].item()).constructor
+        return project.get_per_project_statistics(project_id, project_info)
+    except Exception:
+        sentry.capture_exception()
+        logger.exception(f"failed to generate stats for project: {project_id}")
+        return None
+
+
+def save_project_info_dynamic(
+    filename: str,
+    projects_dynamic_df: pd.DataFrame,
+    project_stats: Dict[str, Optional[dict]],
+) -> pd.DataFrame:
+    """
+    Replace the rows of the projects for which statistics have been generated.
+    Rows of projects for which this failed are kept.
+    Write the csv file to a temporary file first, which replaces the file at once.
+    """
+    succeeded = {
+        project_id: project_stats_dict
+        for project_id, project_stats_dict in project_stats.items()
+        if project_stats_dict is not None
+    }
+    projects_dynamic_df = pd.concat(
+        [
+            projects_dynamic_df[~projects_dynamic_df["project_id"].isin(succeeded)],
+            pd.DataFrame([stats for stats in succeeded.values() if stats]),
+        ],
+        ignore_index=True,
+    )
+
+    tmp_filename = f"{filename}.tmp"
+    projects_dynamic_df.to_csv(tmp_filename, index_label="idx")
+    os.replace(tmp_filename, filename)
+    return projects_dynamic_df
+
+
+def generate_stats(project_id_list: Optional[List[str]] = None, workers: int = 1):
     """
     Query attributes for all projects from postgres projects table
     Write information on status (e.g. active, inactive, finished) and further attributes
@@ -103,9 +153,14 @@ def generate_stats(project_id_list: Optional[List[str]] = None):
     Convert projects.csv file into GeoJSON format using project geometry and project
     centroid.
 
+    If workers is larger than 1, the statistics of up to this number of projects
+    are generated at the same time in separate processes.
+    A project for which this fails is logged and skipped.
+
     Parameters
     ----------
     project_id_list: list
+    workers: int
     """
 
     projects_info_filename = f"{DATA_PATH}/api/projects/projects_static.csv"
@@ -127,36 +182,66 @@ def generate_stats(project_id_list: Optional[List[str]] = None):
 
     logger.info(f"will generate stats for: {project_id_list}")
 
-    # get per project stats and aggregate based on task_id
+    projects_info = {}
     for project_id in project_id_list:
-
         # check if project id is existing
         if project_id not in project_id_list_postgres:
             logger.info(f"project {project_id} does not exist. skip this one.")
             continue
+        projects_info[project_id] = projects_df.loc[
+            projects_df["project_id"] == project_id
+        ]
 
-        project_info = projects_df.loc[projects_df["project_id"] == project_id]
-
-        logger.info(f"start generate stats for project: {project_id}")
-        idx = projects_dynamic_df.index[
-            projects_dynamic_df["project_id"] == project_id
-        ].tolist()
-        if len(idx) > 0:
-            projects_dynamic_df.drop([idx[0]], inplace=True)
-
-        # aggregate results and get per project statistics
-        project = ProjectType(project_info["project_type"].item()).constructor
-
-        project_stats_dict = project.get_per_project_statistics(
-            project_id, project_info
-        )
-        if project_stats_dict:
-            projects_dynamic_df = projects_dynamic_df.append(
-                project_stats_dict, ignore_index=True
-            )
-            projects_dynamic_df.to_csv(
-                projects_info_dynamic_filename, index_label="idx"
+    # get per project stats and aggregate based on task_id
+    # projects_dynamic.csv is saved after each batch of projects
+    project_stats = {}
+    batch_size = max(1, workers) * 10
+    if workers > 1 and len(projects_info) > 1:
+        # Spawned processes do not share the postgres connections of this process.
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {
+                executor.submit(
+                    get_per_project_statistics, project_id, project_info
+                ): project_id
+                for project_id, project_info in projects_info.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                project_id = futures[future]
+                try:
+                    project_stats[project_id] = future.result()
+                except Exception:
+                    # e.g. the process of the project has been killed
+                    sentry.capture_exception()
+                    logger.exception(
+                        f"failed to generate stats for project: {project_id}"
+                    )
+                    project_stats[project_id] = None
+                if len(project_stats) % batch_size == 0:
+                    save_project_info_dynamic(
+                        projects_info_dynamic_filename,
+                        projects_dynamic_df,
+                        project_stats,
+                    )
+    else:
+        for project_id, project_info in projects_info.items():
+            project_stats[project_id] = get_per_project_statistics(
+                project_id, project_info
             )
+            if len(project_stats) % batch_size == 0:
+                save_project_info_dynamic(
+                    projects_info_dynamic_filename, projects_dynamic_df, project_stats
+                )
+
+    projects_dynamic_df = save_project_info_dynamic(
+        projects_info_dynamic_filename, projects_dynamic_df, project_stats
+    )
+    failed = [
+        project_id for project_id, stats in project_stats.items() if stats is None
+    ]
+    if failed:
+        logger.warning(f"failed to generate stats for: {failed}")
 
     if len(project_id_list) > 0:
         # merge static info and dynamic info and save
@@ -173,7 +258,7 @@ def generate_stats(project_id_list: Optional[List[str]] = None):
     generate_data_for_mapswipe_website()
 
 
-def generate_stats_all_projects():
+def generate_stats_all_projects(workers: int = 1):
     """
     queries all existing project ids from postgres projects table
     saves them into a csv file and returns a list of all project ids
@@ -188,4 +273,4 @@ def generate_stats_all_projects():
     project_id_list = projects_df["project_id"].to_list()
 
     # generate stats for the derived project ids
-    generate_stats(project_id_list)
+    generate_stats(project_id_list, workers=workers)
@@ -1,23 +1,26 @@
 import ast
-import datetime
+import glob
 import gzip
 import json
 import os
+import shutil
 import tempfile
 import typing
 
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype
 from psycopg2 import sql
 
 from mapswipe_workers import auth
-from mapswipe_workers.definitions import DATA_PATH, logger, sentry
+from mapswipe_workers.definitions import DATA_PATH, logger
 from mapswipe_workers.generate_stats import (
     project_stats_by_date,
+    stats_cache,
     tasking_manager_geometries,
     user_stats,
 )
-from mapswipe_workers.utils import geojson_functions, tile_functions
+from mapswipe_workers.utils import geojson_functions, vectorized_tile_functions
 
 
 def add_metadata_to_csv(filename: str):
@@ -55,41 +58,68 @@ def normalize_project_type_specifics(path):
     df.to_csv(path)
 
 
-def write_sql_to_gzipped_csv(filename: str, sql_query: sql.SQL):
+def write_sql_to_gzipped_csv(
+    filename: str, sql_query: sql.SQL, cache: bool = False
+) -> pd.DataFrame:
     """
     Use the copy statement to write data from postgres to a csv file.
+    Return the data as load_df_from_csv would load it from this file.
+    Save the data to the stats cache as well, if it is loaded again later.
     """
 
     # generate temporary file which will be automatically deleted at the end
-    tmp_csv_file = os.path.join(tempfile._get_default_tempdir(), "tmp.csv")
-    pg_db = auth.postgresDB()
-    with open(tmp_csv_file, "w") as f:
-        pg_db.copy_expert(sql_query, f)
+    # each call uses its own directory, since projects are processed in parallel
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_csv_file = os.path.join(tmp_dir, "tmp.csv")
+        pg_db = auth.postgresDB()
+        with open(tmp_csv_file, "w") as f:
+            pg_db.copy_expert(sql_query, f)
 
-    normalize_project_type_specifics(tmp_csv_file)
+        normalize_project_type_specifics(tmp_csv_file)
+        df = load_df_from_csv(tmp_csv_file, compression=None)
 
-    with open(tmp_csv_file, "rb") as f_in, gzip.open(filename, "wb") as f_out:
-        f_out.writelines(f_in)
+        with open(tmp_csv_file, "rb") as f_in, gzip.open(filename, "wb") as f_out:
+            f_out.writelines(f_in)
 
     logger.info(f"wrote gzipped csv file from sql: {filename}")
 
+    if cache:
+        stats_cache.write_cache(filename, df)
+    return df
+
 
-def load_df_from_csv(filename: str) -> pd.DataFrame:
+def load_df_from_csv(
+    filename: str, compression: typing.Optional[str] = "gzip"
+) -> pd.DataFrame:
     """
     Load a csv file into a pandas dataframe.
     Make sure that project_id, group_id and task_id are read as strings.
     """
     dtype_dict = {"project_id": str, "group_id": str, "task_id": str}
 
-    df = pd.read_csv(filename, dtype=dtype_dict, compression="gzip")
+    df = pd.read_csv(filename, dtype=dtype_dict, compression=compression)
     logger.info(f"loaded pandas df from {filename}")
     return df
 
 
+def load_df(filename: str) -> pd.DataFrame:
+    """
+    Load a csv file written by write_sql_to_gzipped_csv.
+    Use the stats cache if possible, otherwise add the data to the cache.
+    """
+    df = stats_cache.read_cache(filename)
+    if df is None:
+        df = load_df_from_csv(filename)
+        stats_cache.write_cache(filename, df)
+    return df
+
+
 def get_results(
     filename: str,
     project_id: str,
     result_table: str = "mapping_sessions_results",
+    after_mapping_session_id: typing.Optional[int] = None,
+    until_mapping_session_id: typing.Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Query results from postgres database for project id.
@@ -103,6 +133,9 @@ def get_results(
     ----------
     filename: str
     project_id: str
+    result_table: str
+    after_mapping_session_id: only query results of later mapping sessions
+    until_mapping_session_id: only query results up to this mapping session
     """
 
     if result_table == "mapping_sessions_results_geometry":
@@ -110,6 +143,16 @@ def get_results(
     else:
         result_sql = "msr.result"
 
+    mapping_session_filter = sql.SQL("")
+    if after_mapping_session_id is not None:
+        mapping_session_filter += sql.SQL(" AND ms.mapping_session_id > {}").format(
+            sql.Literal(after_mapping_session_id)
+        )
+    if until_mapping_session_id is not None:
+        mapping_session_filter += sql.SQL(" AND ms.mapping_session_id <= {}").format(
+            sql.Literal(until_mapping_session_id)
+        )
+
     sql_query = sql.SQL(
         f"""
         COPY (
@@ -136,26 +179,91 @@ def get_results(
             LEFT JOIN mapping_sessions ms ON
                 ms.mapping_session_id = msr.mapping_session_id
             LEFT JOIN users U USING (user_id)
-            WHERE project_id = {"{}"}
+            WHERE project_id = {"{}"}{"{}"}
         ) TO STDOUT WITH CSV HEADER
         """
-    ).format(sql.Literal(project_id))
-    write_sql_to_gzipped_csv(filename, sql_query)
-
-    df = load_df_from_csv(filename)
+    ).format(sql.Literal(project_id), mapping_session_filter)
+    df = write_sql_to_gzipped_csv(filename, sql_query)
 
     if df.empty:
         logger.info(f"there are no results for this project {project_id}")
         return None
     else:
         df["timestamp"] = pd.to_datetime(df["timestamp"])
-        df["day"] = df["timestamp"].apply(
-            lambda x: datetime.datetime(year=x.year, month=x.month, day=x.day)
-        )
+        df["day"] = df["timestamp"].dt.normalize()
         logger.info(f"added day attribute for results for {project_id}")
         return df
 
 
+def get_latest_mapping_session_id(project_id: str) -> typing.Optional[int]:
+    """Get the highest mapping session id of a project."""
+    pg_db = auth.postgresDB()
+    query = """
+        SELECT max(mapping_session_id)
+        FROM mapping_sessions
+        WHERE project_id = %(project_id)s
+    """
+    return pg_db.retr_query(query, {"project_id": project_id})[0][0]
+
+
+def get_results_of_groups(
+    project_id: str, group_ids: typing.List[str], until_mapping_session_id: int
+) -> pd.DataFrame:
+    """Query the results of the given groups up to a mapping session id."""
+    pg_db = auth.postgresDB()
+    query = """
+        SELECT ms.project_id, ms.group_id, ms.user_id, msr.task_id, msr.result
+        FROM mapping_sessions ms
+        JOIN mapping_sessions_results msr USING (mapping_session_id)
+        WHERE ms.project_id = %(project_id)s
+            AND ms.group_id = ANY(%(group_ids)s)
+            AND ms.mapping_session_id <= %(mapping_session_id)s
+    """
+    results = pg_db.retr_query(
+        query,
+        {
+            "project_id": project_id,
+            "group_ids": list(group_ids),
+            "mapping_session_id": until_mapping_session_id,
+        },
+    )
+    return pd.DataFrame(
+        results, columns=["project_id", "group_id", "user_id", "task_id", "result"]
+    )
+
+
+def append_to_gzipped_csv(filename: str, new_filename: str):
+    """Append the rows of a gzipped csv file, without its header, to another one."""
+    with gzip.open(new_filename, "rt") as f_in, gzip.open(filename, "at") as f_out:
+        next(f_in, None)
+        f_out.writelines(f_in)
+
+    logger.info(f"appended rows of {new_filename} to {filename}")
+
+
+def get_pending_results_filename(filename: str, watermark: typing.Any) -> str:
+    """Get the name of the results file appended up to a mapping session."""
+    return f"{filename}.{watermark}.pending"
+
+
+def publish_pending_results(filename: str, watermark: int):
+    """
+    Replace the results file with the pending results file of the watermark
+    of the saved stats state, if there is one.
+    Pending results files of other watermarks are left by failed runs
+    and are removed.
+    """
+    pending_filename = get_pending_results_filename(filename, watermark)
+    for stale_filename in glob.glob(
+        get_pending_results_filename(glob.escape(filename), "*")
+    ):
+        if stale_filename != pending_filename:
+            os.remove(stale_filename)
+    if os.path.isfile(pending_filename):
+        os.replace(pending_filename, filename)
+        logger.info(f"published results until mapping session {watermark}")
+
+
 def get_tasks(
     filename: str,
     project_id: str,
@@ -175,7 +283,7 @@ def get_tasks(
 
     if os.path.isfile(filename):
         logger.info(f"file {filename} already exists for {project_id}. skip download.")
-        pass
+        df = load_df(filename)
     else:
 
         sql_query = sql.SQL(
@@ -204,9 +312,7 @@ def get_tasks(
             ) TO STDOUT WITH CSV HEADER
             """
         ).format(sql.Literal(project_id))
-        write_sql_to_gzipped_csv(filename, sql_query)
-
-    df = load_df_from_csv(filename)
+        df = write_sql_to_gzipped_csv(filename, sql_query, cache=True)
 
     # Tasks for the "validate" project type can contain a "username" attribute.
     # We rename this attribute into "osm_username" to be able to distinguish it
@@ -234,7 +340,7 @@ def get_groups(filename: str, project_id: str) -> pd.DataFrame:
 
     if os.path.isfile(filename):
         logger.info(f"file {filename} already exists for {project_id}. skip download.")
-        pass
+        df = load_df(filename)
     else:
         # TODO: check how we use number_of_users_required
         #   it can get you a wrong number, if more users finished than required
@@ -247,9 +353,8 @@ def get_groups(filename: str, project_id: str) -> pd.DataFrame:
             ) TO STDOUT WITH CSV HEADER
             """
         ).format(sql.Literal(project_id))
-        write_sql_to_gzipped_csv(filename, sql_query)
+        df = write_sql_to_gzipped_csv(filename, sql_query, cache=True)
 
-    df = load_df_from_csv(filename)
     return df
 
 
@@ -274,6 +379,22 @@ def calc_agreement(row: pd.Series) -> float:
     return agreement
 
 
+def calc_agreements(df: pd.DataFrame) -> pd.Series:
+    """
+    Calculate the agreement of calc_agreement for all tasks at once.
+    Uses total_count and all other columns which contain "count".
+    """
+    count_df = df.filter(like="count")
+    n = count_df["total_count"].to_numpy(dtype=np.int64)
+    counts = count_df.drop(columns=["total_count"]).to_numpy(dtype=np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agreement = ((counts**2).sum(axis=1) - n) / (n * (n - 1))
+    # set agreement to None if only one user contributed
+    agreement[(n == 1) | (n == 0)] = np.nan
+    return pd.Series(agreement, index=df.index)
+
+
 def calc_share(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate the share of each category on the total count."""
     share_df = df.filter(like="count").div(df.total_count, axis=0)
@@ -300,18 +421,23 @@ def calc_count(df: pd.DataFrame) -> pd.DataFrame:
     return df_new_sum
 
 
-def calc_quadkey(row: pd.Series) -> str:
-    """Calculate quadkey based on task id."""
-    try:
-        tile_z, tile_x, tile_y = row["task_id"].split("-")
-        quadkey = tile_functions.tile_coords_and_zoom_to_quadKey(
-            int(tile_x), int(tile_y), int(tile_z)
-        )
-    except ValueError:
-        # return None if task_id is not composed of x,y ,z
-        quadkey = None
+def calc_quadkeys(task_ids: pd.Series) -> pd.Series:
+    """Calculate quadkeys based on task ids.
+
+    The quadkey is None if a task id is not composed of z, x and y.
+    """
+    tiles = task_ids.astype(str).str.extract(r"^(\d+)-(\d+)-(\d+)$")
+    valid = tiles.notna().all(axis=1).to_numpy()
+    tile_z, tile_x, tile_y = tiles[valid].astype(np.int64).to_numpy().T
+    positions = np.flatnonzero(valid)
 
-    return quadkey
+    quadkeys = np.full(len(task_ids), None, dtype=object)
+    for zoom in np.unique(tile_z):
+        selected = tile_z == zoom
+        quadkeys[positions[selected]] = vectorized_tile_functions.tile_quadkeys(
+            tile_x[selected], tile_y[selected], int(zoom)
+        ).tolist()
+    return pd.Series(quadkeys, index=task_ids.index)
 
 
 def get_custom_options(custom_options: pd.Series) -> typing.Dict[int, typing.Set[int]]:
@@ -346,37 +472,20 @@ def add_missing_result_columns(
     )
 
 
-def get_agg_results_by_task_id(
-    results_df: pd.DataFrame,
-    tasks_df: pd.DataFrame,
-    custom_options_raw: pd.Series,
+def get_task_counts(results_df: pd.DataFrame) -> pd.Series:
+    """Count the results for each task and result value."""
+    return results_df.groupby(["project_id", "group_id", "task_id", "result"]).size()
+
+
+def get_counts_by_task_id(
+    task_counts: pd.Series,
+    custom_options: typing.Dict[int, typing.Set[int]],
 ) -> pd.DataFrame:
     """
-    For each task several users contribute results.
-    Get agg_results dataframe by aggregating results df by task_id,
-    group_id and project_id.
-    Calculate the following attributes to agg_results dataframe:
-    total_count, 0_count, 1_count, 2_count, 3_count
-    0_share, 1_share, 2_share, 3_share.
-    Calculate "agreement" for each task based on Scott's Pi.
-    Perform a left join for agg_results df with
-    tasks dataframe to add the task geometry.
-    Return aggregated results dataframe.
-
-    Parameters
-    ----------
-    results_df: pd.DataFrame
-    tasks_df: pd.DataFrame
-    custom_options_raw: pd.Series
+    Get a column with the count of each answer option and the total count
+    for each task. Counts of sub options are added to their parent option.
     """
-
-    results_by_task_id_df = (
-        results_df.groupby(["project_id", "group_id", "task_id", "result"])
-        .size()
-        .unstack(fill_value=0)
-    )
-
-    custom_options = get_custom_options(custom_options_raw)
+    results_by_task_id_df = task_counts.unstack(fill_value=0)
 
     # add columns for answer options that were not chosen for any task
     results_by_task_id_df = add_missing_result_columns(
@@ -390,29 +499,42 @@ def get_agg_results_by_task_id(
     # calculate total count of votes per task
     results_by_task_id_df["total_count"] = calc_count(results_by_task_id_df)
 
-    results_by_task_id_df = calc_parent_option_count(
+    return calc_parent_option_count(
         results_by_task_id_df,
         custom_options,
     )
 
+
+def get_agg_results_from_task_counts(
+    task_counts: pd.Series,
+    tasks_df: pd.DataFrame,
+    custom_options: typing.Dict[int, typing.Set[int]],
+) -> pd.DataFrame:
+    """
+    For each task several users contribute results.
+    Get agg_results dataframe from the counts of get_task_counts,
+    which are aggregated by task_id, group_id and project_id.
+    Calculate the following attributes to agg_results dataframe:
+    total_count, 0_count, 1_count, 2_count, 3_count
+    0_share, 1_share, 2_share, 3_share.
+    Calculate "agreement" for each task based on Scott's Pi.
+    Perform a left join for agg_results df with
+    tasks dataframe to add the task geometry.
+    Return aggregated results dataframe.
+    """
+    results_by_task_id_df = get_counts_by_task_id(task_counts, custom_options)
+
     # calculate share based on counts
     results_by_task_id_df = calc_share(results_by_task_id_df)
 
     # calculate agreement
-    results_by_task_id_df["agreement"] = results_by_task_id_df.filter(
-        like="count"
-    ).apply(
-        calc_agreement,
-        axis=1,
-    )
+    results_by_task_id_df["agreement"] = calc_agreements(results_by_task_id_df)
 
     logger.info("calculated agreement, share and total count")
 
     # add quadkey
     results_by_task_id_df.reset_index(level=["task_id"], inplace=True)
-    results_by_task_id_df["quadkey"] = results_by_task_id_df.apply(
-        lambda row: calc_quadkey(row), axis=1
-    )
+    results_by_task_id_df["quadkey"] = calc_quadkeys(results_by_task_id_df["task_id"])
 
     # this joins all project_type_specifics in tasks to the result
     tasks_df.drop(columns=["project_id", "group_id"], inplace=True)
@@ -447,6 +569,135 @@ def explode_result_geometry_column(results_df: pd.DataFrame) -> pd.DataFrame:
     return results_df
 
 
+def get_sessions(results_df: pd.DataFrame) -> pd.DataFrame:
+    """Get the groups each user has mapped per day."""
+    return results_df[["project_id", "group_id", "user_id", "day"]].drop_duplicates(
+        ignore_index=True
+    )
+
+
+def get_usernames(results_df: pd.DataFrame) -> pd.Series:
+    """Get the username for each user id."""
+    return results_df.groupby("user_id")["username"].last()
+
+
+def create_stats_state(
+    watermark: int,
+    results_df: pd.DataFrame,
+    custom_options: typing.Dict[int, typing.Set[int]],
+) -> dict:
+    """
+    Create the state needed to update the project statistics with new results.
+
+    The state consists of:
+    - watermark: the highest mapping session id of the results
+    - task_counts: the number of results per task and result value
+    - sessions: the groups each user has mapped per day,
+        which is enough to derive the project history
+    - usernames: the username for each user id
+    - contributions: the contributions of each user
+    """
+    task_counts = get_task_counts(results_df)
+
+    return {
+        "watermark": watermark,
+        "task_counts": task_counts,
+        "sessions": get_sessions(results_df),
+        "usernames": get_usernames(results_df),
+        "contributions": user_stats.get_contributions_by_user_id(
+            results_df,
+            get_counts_by_task_id(task_counts, custom_options)
+            .reset_index(level="project_id", drop=True)
+            .reset_index(),
+        ),
+    }
+
+
+def update_stats_state(
+    state: dict,
+    watermark: int,
+    new_results_df: pd.DataFrame,
+    previous_results_df: pd.DataFrame,
+    custom_options: typing.Dict[int, typing.Set[int]],
+) -> dict:
+    """
+    Add the results of new mapping sessions to the state of create_stats_state.
+
+    New results change the agreement of all results for the same tasks.
+    previous_results_df needs to contain at least the results
+    up to the previous watermark for these tasks.
+    """
+    task_counts = (
+        pd.concat([state["task_counts"], get_task_counts(new_results_df)])
+        .groupby(level=["project_id", "group_id", "task_id", "result"])
+        .sum()
+    )
+
+    # the same task_id can be part of several groups
+    tasks = pd.MultiIndex.from_frame(new_results_df[["group_id", "task_id"]])
+    previous_results_df = previous_results_df[
+        pd.MultiIndex.from_frame(previous_results_df[["group_id", "task_id"]]).isin(
+            tasks
+        )
+    ]
+
+    def _get_contributions(results_df, _task_counts):
+        _task_counts = _task_counts[
+            _task_counts.index.droplevel(["project_id", "result"]).isin(tasks)
+        ]
+        return user_stats.get_contributions_by_user_id(
+            results_df,
+            get_counts_by_task_id(_task_counts, custom_options)
+            .reset_index(level="project_id", drop=True)
+            .reset_index(),
+        )
+
+    # replace the contributions for these tasks
+    contributions_by_user_id_df = (
+        state["contributions"]
+        .sub(
+            _get_contributions(previous_results_df, state["task_counts"]),
+            fill_value=0,
+        )
+        .add(
+            _get_contributions(
+                pd.concat([previous_results_df, new_results_df]), task_counts
+            ),
+            fill_value=0,
+        )
+        .astype(int)
+    )
+
+    return {
+        "watermark": watermark,
+        "task_counts": task_counts,
+        "sessions": pd.concat(
+            [state["sessions"], get_sessions(new_results_df)]
+        ).drop_duplicates(ignore_index=True),
+        "usernames": get_usernames(new_results_df).combine_first(state["usernames"]),
+        "contributions": contributions_by_user_id_df,
+    }
+
+
+def load_stats_state(filename: str) -> typing.Optional[dict]:
+    """Load the state saved by save_stats_state. Return None if there is none."""
+    if not os.path.isfile(filename):
+        return None
+    try:
+        return pd.read_pickle(filename, compression="gzip")
+    except Exception:
+        logger.exception(f"could not load stats state from {filename}")
+        return None
+
+
+def save_stats_state(filename: str, state: dict):
+    """Save the state of create_stats_state. Replace the previous state at once."""
+    tmp_filename = f"{filename}.tmp"
+    pd.to_pickle(state, tmp_filename, compression="gzip")
+    os.replace(tmp_filename, filename)
+    logger.info(f"saved stats state until mapping session {state['watermark']}")
+
+
 def create_project_stats_dict(project_id, project_stats_by_date_df):
     return {
         "project_id": project_id,
@@ -517,10 +768,17 @@ def get_statistics_for_integer_result_project(
     - return the most recent statistics as a dictionary
     The returned dictionary will be used by generate_stats.py
     to update the projects_dynamic.csv
+
+    The statistics are updated incrementally. Only the results of mapping
+    sessions since the last run are queried and added to the stats state.
+    Remove the stats state file to calculate the statistics from all results.
+    This relies on mapping session ids being assigned in the order the
+    sessions are committed, as done by the single firebase-to-postgres worker.
     """
 
     # set filenames
     results_filename = f"{DATA_PATH}/api/results/results_{project_id}.csv.gz"
+    new_results_filename = f"{DATA_PATH}/api/results/results_{project_id}_new.csv.gz"
     tasks_filename = f"{DATA_PATH}/api/tasks/tasks_{project_id}.csv.gz"
     groups_filename = f"{DATA_PATH}/api/groups/groups_{project_id}.csv.gz"
     agg_results_filename = (
@@ -528,70 +786,118 @@ def get_statistics_for_integer_result_project(
     )
     agg_results_by_user_id_filename = f"{DATA_PATH}/api/users/users_{project_id}.csv.gz"
     project_stats_by_date_filename = f"{DATA_PATH}/api/history/history_{project_id}.csv"
+    stats_state_filename = f"{DATA_PATH}/stats_state/stats_state_{project_id}.pkl.gz"
+
+    custom_options = get_custom_options(project_info["custom_options"])
+    watermark = get_latest_mapping_session_id(project_id)
+    state = load_stats_state(stats_state_filename)
+    if state is not None:
+        # finish publishing the results of the previous run
+        publish_pending_results(results_filename, state["watermark"])
+
+    if (
+        state is None
+        # states saved when the user stats failed have no contributions
+        or state["contributions"] is None
+        or not os.path.isfile(results_filename)
+    ):
+        # load data from postgres
+        results_df = get_results(
+            results_filename, project_id, until_mapping_session_id=watermark
+        )
+        if results_df is None:
+            logger.info(f"no results: skipping per project stats for {project_id}")
+            return {}
+        state = create_stats_state(watermark, results_df, custom_options)
+    else:
+        new_results_df = None
+        if watermark is not None and watermark > state["watermark"]:
+            new_results_df = get_results(
+                new_results_filename,
+                project_id,
+                after_mapping_session_id=state["watermark"],
+                until_mapping_session_id=watermark,
+            )
+        if new_results_df is None:
+            logger.info(f"no new results: skipping per project stats for {project_id}")
+            project_stats_by_date_df = pd.read_csv(
+                project_stats_by_date_filename, index_col="day", parse_dates=["day"]
+            )
+            return create_project_stats_dict(project_id, project_stats_by_date_df)
 
-    # load data from postgres or local storage if already downloaded
-    results_df = get_results(results_filename, project_id)
+        # the results file is only replaced once the state is saved,
+        # otherwise the new results could be appended again by the next run
+        pending_results_filename = get_pending_results_filename(
+            results_filename, watermark
+        )
+        shutil.copyfile(results_filename, pending_results_filename)
+        append_to_gzipped_csv(pending_results_filename, new_results_filename)
+        os.remove(new_results_filename)
+
+        previous_results_df = get_results_of_groups(
+            project_id,
+            new_results_df["group_id"].unique(),
+            until_mapping_session_id=state["watermark"],
+        )
+        state = update_stats_state(
+            state, watermark, new_results_df, previous_results_df, custom_options
+        )
+        logger.info(
+            f"added {len(new_results_df)} new results to stats state of {project_id}"
+        )
 
-    if results_df is None:
-        logger.info(f"no results: skipping per project stats for {project_id}")
-        return {}
+    groups_df = get_groups(groups_filename, project_id)
+    tasks_df = get_tasks(tasks_filename, project_id)
+
+    if any("maxar" in s for s in project_info["tile_server_names"]):
+        add_metadata = True
     else:
-        groups_df = get_groups(groups_filename, project_id)
-        tasks_df = get_tasks(tasks_filename, project_id)
+        add_metadata = False
 
-        if any("maxar" in s for s in project_info["tile_server_names"]):
-            add_metadata = True
-        else:
-            add_metadata = False
+    # aggregate results by task id
+    agg_results_df = get_agg_results_from_task_counts(
+        state["task_counts"],
+        tasks_df,
+        custom_options,
+    )
+    agg_results_df.to_csv(agg_results_filename, index_label="idx")
 
-        # aggregate results by task id
-        agg_results_df = get_agg_results_by_task_id(
-            results_df,
-            tasks_df,
-            project_info["custom_options"],
-        )
-        agg_results_df.to_csv(agg_results_filename, index_label="idx")
+    geojson_functions.gzipped_csv_to_gzipped_geojson(
+        filename=agg_results_filename,
+        geometry_field="geom",
+        add_metadata=add_metadata,
+    )
+    logger.info(f"saved agg results for {project_id}: {agg_results_filename}")
 
-        geojson_functions.gzipped_csv_to_gzipped_geojson(
-            filename=agg_results_filename,
-            geometry_field="geom",
-            add_metadata=add_metadata,
+    # aggregate results by user id
+    agg_results_by_user_id_df = (
+        user_stats.get_agg_results_by_user_id_from_contributions(
+            state["contributions"], state["sessions"], state["usernames"]
         )
-        logger.info(f"saved agg results for {project_id}: {agg_results_filename}")
+    )
+    agg_results_by_user_id_df.to_csv(agg_results_by_user_id_filename, index_label="idx")
+    logger.info(
+        f"saved agg results for {project_id}: {agg_results_by_user_id_filename}"
+    )
 
-        # aggregate results by user id
-        # TODO: solve memory issue for agg results by user id
-        try:
-            agg_results_by_user_id_df = user_stats.get_agg_results_by_user_id(
-                results_df, agg_results_df
-            )
-            agg_results_by_user_id_df.to_csv(
-                agg_results_by_user_id_filename, index_label="idx"
-            )
-            logger.info(
-                f"saved agg results for {project_id}: {agg_results_by_user_id_filename}"
-            )
-        except MemoryError:
-            sentry.capture_exception()
-            logger.info(f"failed to agg results by user id for {project_id}")
+    # calculate progress and contributors over time for project
+    project_stats_by_date_df = project_stats_by_date.get_project_history(
+        state["sessions"], groups_df, project_id, project_stats_by_date_filename
+    )
+    logger.info(
+        f"saved project stats by date for {project_id}: "
+        f"{project_stats_by_date_filename}"
+    )
 
-        # calculate progress and contributors over time for project
-        project_stats_by_date_df = project_stats_by_date.get_project_history(
-            results_df, groups_df, project_id, project_stats_by_date_filename
-        )
-        logger.info(
-            f"saved project stats by date for {project_id}: "
-            f"{project_stats_by_date_filename}"
+    if generate_hot_tm_geometries:
+        tasking_manager_geometries.generate_tasking_manager_geometries(
+            project_id=project_id, agg_results_filename=agg_results_filename
         )
 
-        if generate_hot_tm_geometries:
-            tasking_manager_geometries.generate_tasking_manager_geometries(
-                project_id=project_id, agg_results_filename=agg_results_filename
-            )
+    save_stats_state(stats_state_filename, state)
+    publish_pending_results(results_filename, state["watermark"])
 
-        # prepare output of function
-        project_stats_dict = create_project_stats_dict(
-            project_id, project_stats_by_date_df
-        )
+    # prepare output of function
+    project_stats_dict = create_project_stats_dict(project_id, project_stats_by_date_df)
 
-        return project_stats_dict
+    return project_stats_dict
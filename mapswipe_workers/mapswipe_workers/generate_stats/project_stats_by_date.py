@@ -1,17 +1,16 @@
-import datetime
-
+import numpy as np
 import pandas as pd
 
 from mapswipe_workers.definitions import logger
 
 
 def calc_results_progress(
-    number_of_users: int,
-    number_of_users_required: int,
-    cum_number_of_users: int,
-    number_of_tasks: int,
-    number_of_results: int,
-) -> int:
+    number_of_users: pd.Series,
+    number_of_users_required: pd.Series,
+    cum_number_of_users: pd.Series,
+    number_of_tasks: pd.Series,
+    number_of_results: pd.Series,
+) -> np.ndarray:
     """
     for each project the progress is calculated
     not all results are considered when calculating the progress
@@ -19,34 +18,33 @@ def calc_results_progress(
     all further results will not contribute to increase the progress
     """
 
-    if cum_number_of_users <= number_of_users_required:
-        # this is the simplest case, the number of users is less than the required
-        # number of users all results contribute to progress
-        number_of_results_progress = number_of_results
-    elif (cum_number_of_users - number_of_users) < number_of_users_required:
-        # the number of users is bigger than the number of users required
-        # but the previous number of users was below the required number
-        # some results contribute to progress
-        number_of_results_progress = (
-            number_of_users_required - (cum_number_of_users - number_of_users)
-        ) * number_of_tasks
-    else:
+    previous_number_of_users = cum_number_of_users - number_of_users
+    return np.select(
+        [
+            # this is the simplest case, the number of users is less than the
+            # required number of users all results contribute to progress
+            cum_number_of_users <= number_of_users_required,
+            # the number of users is bigger than the number of users required
+            # but the previous number of users was below the required number
+            # some results contribute to progress
+            previous_number_of_users < number_of_users_required,
+        ],
+        [
+            number_of_results,
+            (number_of_users_required - previous_number_of_users) * number_of_tasks,
+        ],
         # for all other cases: already more users than required
         # all results do not contribute to progress
-        number_of_results_progress = 0
-
-    return number_of_results_progress
+        default=0,
+    )
 
 
-def is_new_user(day: datetime.datetime, first_day: datetime.datetime):
+def is_new_user(day: pd.Series, first_day: pd.Series) -> pd.Series:
     """
     Check if user has contributed results to this project before
     """
 
-    if day == first_day:
-        return 1
-    else:
-        return 0
+    return (day == first_day).astype(int)
 
 
 def get_progress_by_date(
@@ -79,17 +77,20 @@ def get_progress_by_date(
     required_results = groups_df["required_results"].sum()
     logger.info(f"calcuated required results: {required_results}")
 
-    results_with_groups_df = results_df.merge(
-        groups_df, left_on="group_id", right_on="group_id"
-    )
-    results_by_group_id_df = results_with_groups_df.groupby(
-        ["project_id_x", "group_id", "day"]
-    ).agg(
-        number_of_tasks=pd.NamedAgg(column="number_of_tasks", aggfunc="min"),
-        number_of_users_required=pd.NamedAgg(
-            column="number_of_users_required", aggfunc="min"
-        ),
-        number_of_users=pd.NamedAgg(column="user_id", aggfunc=pd.Series.nunique),
+    # count the distinct users per group and day before adding the groups
+    results_by_group_id_df = (
+        results_df[["project_id", "group_id", "day", "user_id"]]
+        .drop_duplicates()
+        .groupby(["project_id", "group_id", "day"])
+        .size()
+        .rename("number_of_users")
+        .reset_index()
+        .merge(
+            groups_df[["group_id", "number_of_tasks", "number_of_users_required"]],
+            left_on="group_id",
+            right_on="group_id",
+        )
+        .set_index(["project_id", "group_id", "day"])
     )
     results_by_group_id_df["number_of_results"] = (
         results_by_group_id_df["number_of_users"]
@@ -97,18 +98,15 @@ def get_progress_by_date(
     )
     results_by_group_id_df["cum_number_of_users"] = (
         results_by_group_id_df["number_of_users"]
-        .groupby(["project_id_x", "group_id"])
+        .groupby(["project_id", "group_id"])
         .cumsum()
     )
-    results_by_group_id_df["number_of_results_progress"] = results_by_group_id_df.apply(
-        lambda row: calc_results_progress(
-            row["number_of_users"],
-            row["number_of_users_required"],
-            row["cum_number_of_users"],
-            row["number_of_tasks"],
-            row["number_of_results"],
-        ),
-        axis=1,
+    results_by_group_id_df["number_of_results_progress"] = calc_results_progress(
+        results_by_group_id_df["number_of_users"],
+        results_by_group_id_df["number_of_users_required"],
+        results_by_group_id_df["cum_number_of_users"],
+        results_by_group_id_df["number_of_tasks"],
+        results_by_group_id_df["number_of_results"],
     )
 
     progress_by_date_df = (
@@ -156,19 +154,18 @@ def get_contributors_by_date(results_df: pd.DataFrame) -> pd.DataFrame:
         - refers to the project contributorCount attribute in firebase
     """
 
-    user_first_day_df = results_df.groupby(["user_id"]).agg(
-        first_day=pd.NamedAgg(column="day", aggfunc="min")
+    results_by_user_id_df = (
+        results_df[["project_id", "user_id", "day"]]
+        .drop_duplicates()
+        .reset_index(drop=True)
     )
+    results_by_user_id_df["first_day"] = results_by_user_id_df.groupby("user_id")[
+        "day"
+    ].transform("min")
     logger.info("calculated first day per user")
 
-    results_by_user_id_df = results_df.groupby(["project_id", "user_id", "day"]).agg(
-        number_of_results=pd.NamedAgg(column="user_id", aggfunc="count")
-    )
-    results_by_user_id_df = results_by_user_id_df.reset_index().merge(
-        user_first_day_df, left_on="user_id", right_on="user_id"
-    )
-    results_by_user_id_df["new_user"] = results_by_user_id_df.apply(
-        lambda row: is_new_user(row["day"], row["first_day"]), axis=1
+    results_by_user_id_df["new_user"] = is_new_user(
+        results_by_user_id_df["day"], results_by_user_id_df["first_day"]
     )
 
     contributors_by_date_df = (
@@ -0,0 +1,83 @@
+"""Columnar copies of the csv files used to generate the project statistics.
+
+The gzipped csv files in DATA_PATH/api are published and are kept as they are.
+Decompressing and parsing them every time generate_stats runs is slow.
+Therefore the loaded data frames are also saved as Arrow IPC files,
+which are read memory mapped. Id columns are dictionary encoded
+and all columns keep their type, e.g. timestamps.
+"""
+
+import os
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from mapswipe_workers.definitions import DATA_PATH, logger
+
+# Columns with few distinct values, which are stored only once per file.
+DICTIONARY_COLUMNS = [
+    "project_id",
+    "group_id",
+    "user_id",
+    "username",
+    "app_version",
+    "client_type",
+]
+
+
+def get_cache_filename(filename: str) -> str:
+    """Get the cache file for a csv file, e.g. tasks_x.csv.gz -> tasks_x.arrow"""
+    name = os.path.basename(filename).split(".")[0]
+    return f"{DATA_PATH}/stats_cache/{name}.arrow"
+
+
+def write_cache(filename: str, df: pd.DataFrame):
+    """Save a data frame loaded from the csv file to the cache."""
+    cache_filename = get_cache_filename(filename)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except pa.ArrowException:
+        # e.g. columns of project type specifics with mixed types
+        logger.exception(f"could not convert {filename} for the stats cache")
+        return
+
+    for name in DICTIONARY_COLUMNS:
+        index = table.schema.get_field_index(name)
+        if index != -1 and pa.types.is_string(table.schema.field(index).type):
+            table = table.set_column(
+                index, name, pc.dictionary_encode(table.column(index))
+            )
+
+    tmp_filename = f"{cache_filename}.tmp"
+    with pa.OSFile(tmp_filename, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_filename, cache_filename)
+    logger.info(f"saved {filename} to stats cache: {cache_filename}")
+
+
+def read_cache(filename: str) -> Optional[pd.DataFrame]:
+    """
+    Load the data frame of a csv file from the cache.
+    Return None if it is not cached or the csv file has changed since.
+    """
+    cache_filename = get_cache_filename(filename)
+    if not os.path.isfile(cache_filename) or (
+        os.path.isfile(filename)
+        and os.path.getmtime(filename) > os.path.getmtime(cache_filename)
+    ):
+        return None
+
+    with pa.memory_map(cache_filename) as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    # decode ids to strings, pandas categories would change how groupby works
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(
+                index, field.name, table.column(index).cast(field.type.value_type)
+            )
+    logger.info(f"loaded {filename} from stats cache: {cache_filename}")
+    return table.to_pandas()
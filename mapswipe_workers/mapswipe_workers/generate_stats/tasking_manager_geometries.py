@@ -1,13 +1,13 @@
+import collections
 import csv
 import gzip
-import threading
 import typing
-from queue import Queue
 
+import numpy as np
 from osgeo import ogr
 
 from mapswipe_workers.definitions import DATA_PATH, logger
-from mapswipe_workers.utils import geojson_functions, tile_functions
+from mapswipe_workers.utils import geojson_functions, vectorized_tile_functions
 
 
 def load_data(project_id: str, gzipped_csv_file: str) -> list:
@@ -81,12 +81,20 @@ def load_data(project_id: str, gzipped_csv_file: str) -> list:
                     "bad_imagery_share": _get_row_value(
                         column_index_map, row, "3_share", modifier=float
                     ),
-                    "wkt": tile_functions.geometry_from_tile_coords(
-                        task_x, task_y, task_z
-                    ),
                 }
             )
 
+    # Geometries of all tasks with the same zoom level are created at once.
+    for task_z in {task["task_z"] for task in project_data}:
+        tasks = [task for task in project_data if task["task_z"] == task_z]
+        geometries = vectorized_tile_functions.geometries_from_tile_coords(
+            [task["task_x"] for task in tasks],
+            [task["task_y"] for task in tasks],
+            task_z,
+        )
+        for task, wkt in zip(tasks, geometries):
+            task["wkt"] = wkt
+
     return project_data
 
 
@@ -149,159 +157,124 @@ def get_neighbour_list(neighbourhood_shape: str, neighbourhood_size: int) -> lis
     return neighbour_list
 
 
-def add_group_id_to_neighbours(task_x: int, task_y: int, task_z: int, group_id: int):
+def get_group_ids(tasks: dict, neighbour_list: list) -> dict:
     """
-    Add a group id to all other tiles that are in the neighbourhood of the given tile,
-    which is defined by task_x, task_y and task_z.
+    Assign a group id to each task, so that tasks which are in the neighbourhood
+    of each other get the same group id.
+
+    The tasks are visited in the order of their ids. A task without group id
+    gets a new one, which is then also given to all tasks in its neighbourhood.
+    Tasks can end up with a different group id than their neighbours this way.
+    Therefore neighbouring tasks are joined in a union-find structure as well.
+    Each connected set of tasks gets the lowest group id of its tasks.
     """
 
-    # look for neighbours
-    for i, j in neighbour_list:
-        new_task_x = int(task_x) + i
-        new_task_y = int(task_y) + j
-        new_task_id = f"{task_z}-{new_task_x}-{new_task_y}"
-
-        if new_task_id in yes_results_dict:
-            yes_results_dict[new_task_id]["my_group_id"] = group_id
-
-
-def create_duplicates_dict() -> dict:
-    """
-    Check which tasks belong to multiple groups.
-    This will be used as a later stage to put tasks into distinct groups.
-    """
+    # grid index of the tasks and a union-find parent for each task
+    index = {
+        (int(task["task_z"]), int(task["task_x"]), int(task["task_y"])): i
+        for i, task in enumerate(tasks.values())
+    }
+    task_ids = list(tasks.keys())
+    parents = list(range(len(task_ids)))
+
+    def _find(i: int) -> int:
+        while parents[i] != i:
+            # path halving
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    group_ids = {}
+    highest_group_id = 0
+    for task_id in sorted(tasks.keys()):
+        if task_id not in group_ids:
+            highest_group_id += 1
+            group_ids[task_id] = highest_group_id
+        group_id = group_ids[task_id]
 
-    duplicated_groups = {}
-    for task_id in yes_results_dict.keys():
-        my_group_id = yes_results_dict[task_id]["my_group_id"]
-        # check for other results in the neighbourhood
-        # look for neighbours
+        # check for other results in the neighbourhood and add the group id to them
+        task = tasks[task_id]
+        task_z, task_x, task_y = (
+            int(task["task_z"]),
+            int(task["task_x"]),
+            int(task["task_y"]),
+        )
+        root = _find(index[(task_z, task_x, task_y)])
         for i, j in neighbour_list:
-            new_task_x = int(yes_results_dict[task_id]["task_x"]) + i
-            new_task_y = int(yes_results_dict[task_id]["task_y"]) + j
-            new_task_id = (
-                f"{yes_results_dict[task_id]['task_z']}-{new_task_x}-{new_task_y}"
-            )
-
-            if new_task_id in yes_results_dict:
-                neighbours_group_id = yes_results_dict[new_task_id]["my_group_id"]
-                if neighbours_group_id != my_group_id:
-                    # add the other group to duplicated groups dict
-                    try:
-                        duplicated_groups[my_group_id].add(neighbours_group_id)
-                    except KeyError:
-                        duplicated_groups[my_group_id] = set([neighbours_group_id])
-                    # add my_group_id to other groupd_id in duplicated dict
-                    try:
-                        duplicated_groups[neighbours_group_id].add(my_group_id)
-                    except KeyError:
-                        duplicated_groups[neighbours_group_id] = set([my_group_id])
-
-    return duplicated_groups
-
-
-def remove_duplicates(duplicated_groups: dict):
-    """
-    Remove groups ids for tasks which have more than one.
-    This is to make sure that every task belongs to a single group only.
-    This distinct group id will be the basis for further geometric processing.
-    """
-
-    for duplicated_group_id in sorted(duplicated_groups.keys(), reverse=True):
-        logger.debug(
-            f"{duplicated_group_id}: {list(duplicated_groups[duplicated_group_id])}"
+            neighbour = index.get((task_z, task_x + i, task_y + j))
+            if neighbour is None:
+                continue
+            group_ids[task_ids[neighbour]] = group_id
+            neighbour_root = _find(neighbour)
+            if neighbour_root != root:
+                parents[neighbour_root] = root
+
+    # each connected set of tasks gets the lowest group id of its tasks
+    lowest_group_ids = {}
+    for i, task_id in enumerate(task_ids):
+        root = _find(i)
+        lowest_group_ids[root] = min(
+            lowest_group_ids.get(root, group_ids[task_id]), group_ids[task_id]
         )
-        my_duplicated_group_id = duplicated_group_id
-        for other_group_id in duplicated_groups[duplicated_group_id]:
-            if other_group_id < my_duplicated_group_id:
-                my_duplicated_group_id = other_group_id
-
-        for task_id in yes_results_dict.keys():
-            if yes_results_dict[task_id]["my_group_id"] == duplicated_group_id:
-                yes_results_dict[task_id]["my_group_id"] = my_duplicated_group_id
+    return {task_id: lowest_group_ids[_find(i)] for i, task_id in enumerate(task_ids)}
 
 
-def split_groups(q):
+def split_group(
+    task_x: np.ndarray, task_y: np.ndarray, group_size: int, neighbourhood_size: int
+) -> list:
     """
-    This function will be executed using threading.
-    First it checks if there are still processes pending in the queue.
-    We are using a clustering algorithm to put tasks together in groups.
-    Since it is computationally expensive to check which tiles are neighbours,
-    we split our results into chunks (called groups here).
-    When we reach a group size below the defined group size we will stop.
-    Otherwise, the group will be split into two parts and
-    both will be added as new groups to our queue.
+    Split a group of tiles into smaller groups by recursive bisection.
+    The group is cut in half along its wider side. Both halves are split again
+    until they hold less than group_size tiles. Halves which would still
+    span a large area are split further, even if they hold only a few tiles.
+    As before, this area is the extent of the group which has been cut in half.
+
+    The groups are visited breadth first. A list of (depth, indices) tuples is
+    returned, with the indices of the tiles of each split group in task_x and
+    task_y and the depth of the group that has been cut in half.
+    The function only depends on the coordinates of one group, so independent
+    groups can be split in parallel.
     """
 
-    while not q.empty():
-        group_id, group_data, group_size = q.get()
-        logger.debug(f"the group ({group_id}) has {len(group_data)} members")
-
-        # find min x, and min y
-        x_list = []
-        y_list = []
-
-        for result, data in group_data.items():
-            x_list.append(int(data["task_x"]))
-            y_list.append(int(data["task_y"]))
-
-        min_x = min(x_list)
-        max_x = max(x_list)
-        x_width = max_x - min_x
-
-        min_y = min(y_list)
-        max_y = max(y_list)
-        y_width = max_y - min_y
-
-        new_grouped_data = {"a": {}, "b": {}}
+    max_area = 2 * (neighbourhood_size * neighbourhood_size)
+    split_groups_list = []
+    pending = collections.deque([(0, np.arange(len(task_x)))])
+    while pending:
+        depth, indices = pending.popleft()
+        logger.debug(f"the group has {len(indices)} members")
+        group_x = task_x[indices]
+        group_y = task_y[indices]
+
+        min_x = group_x.min()
+        x_width = group_x.max() - min_x
+        min_y = group_y.min()
+        y_width = group_y.max() - min_y
+
+        if x_width == 0 and y_width == 0:
+            # all tiles have the same coordinates and can not be split
+            split_groups_list.append((depth, indices))
+            continue
 
         if x_width >= y_width:
             # first split vertically
-            for result, data in group_data.items():
-                # result is in first segment
-                if int(data["task_x"]) < (min_x + (x_width / 2)):
-                    new_grouped_data["a"][result] = data
-                else:
-                    new_grouped_data["b"][result] = data
+            in_first_segment = group_x < (min_x + (x_width / 2))
         else:
             # first split horizontally
-            for result, data in group_data.items():
-                # result is in first segment
-                if int(data["task_y"]) < (min_y + (y_width / 2)):
-                    new_grouped_data["a"][result] = data
-                else:
-                    new_grouped_data["b"][result] = data
-
-        for k in ["a", "b"]:
-            logger.debug("there are %s results in %s" % (len(new_grouped_data[k]), k))
-
-            for result, data in new_grouped_data[k].items():
-                x_list.append(int(data["task_x"]))
-                y_list.append(int(data["task_y"]))
-
-            min_x = min(x_list)
-            max_x = max(x_list)
-            x_width = max_x - min_x
-
-            min_y = min(y_list)
-            max_y = max(y_list)
-            y_width = max_y - min_y
-
-            if len(new_grouped_data[k]) < group_size:
-
-                # add this check to avoid large groups groups with few items
-                if x_width * y_width > 2 * (
-                    my_neighbourhood_size * my_neighbourhood_size
-                ):
-                    q.put([group_id, new_grouped_data[k], group_size])
-                else:
-                    split_groups_list.append(new_grouped_data[k])
-                    logger.debug('add "a" to split_groups_dict')
+            in_first_segment = group_y < (min_y + (y_width / 2))
+
+        for split_indices in [
+            indices[in_first_segment],
+            indices[~in_first_segment],
+        ]:
+            if len(split_indices) == 0:
+                continue
+            # add this check to avoid large groups groups with few items
+            if len(split_indices) < group_size and x_width * y_width <= max_area:
+                split_groups_list.append((depth, split_indices))
             else:
-                # add this group to a queue
-                q.put([group_id, new_grouped_data[k], group_size])
+                pending.append((depth + 1, split_indices))
 
-        q.task_done()
+    return split_groups_list
 
 
 def create_hot_tm_tasks(
@@ -316,9 +289,9 @@ def create_hot_tm_tasks(
     Tasking Manager.
     It will create a neighbourhood list, which will function as a mask to filter tiles
     that are close to each other.
-    The functions assigns group ids to each tile.
-    For tiles that got several group ids, this will be resolved in the next step.
-    Once each task has a unique group id, the function checks the size (number of tiles)
+    The functions assigns group ids to each tile, so that all tiles which are
+    connected through their neighbourhoods get the same group id.
+    Once each task has a group id, the function checks the size (number of tiles)
     for each group.
     Groups that hold too many tiles (too big to map in the Tasking Manager) will be
     split into smaller groups.
@@ -328,10 +301,8 @@ def create_hot_tm_tasks(
 
     # final groups dict will store the groups that are exported
     final_groups_dict = {}
-    highest_group_id = 0
 
     # create a dictionary with all results
-    global yes_results_dict
     yes_results_dict = {}
     for result in project_data:
         yes_results_dict[result["id"]] = result
@@ -341,53 +312,19 @@ def create_hot_tm_tasks(
     if len(yes_results_dict) < 1:
         return final_groups_dict
 
-    global neighbour_list
-    global my_neighbourhood_size
-    my_neighbourhood_size = neighbourhood_size
-
     neighbour_list = get_neighbour_list(neighbourhood_shape, neighbourhood_size)
     logger.info(
         "got neighbour list. neighbourhood_shape: %s, neighbourhood_size: %s"
         % (neighbourhood_shape, neighbourhood_size)
     )
 
-    global split_groups_list
-    split_groups_list = []
-
     # test for neighbors and set groups id
-    for task_id in sorted(yes_results_dict.keys()):
-        try:
-            # this task has already a group id, great.
-            group_id = yes_results_dict[task_id]["my_group_id"]
-        except KeyError:
-            group_id = highest_group_id + 1
-            highest_group_id += 1
-            yes_results_dict[task_id]["my_group_id"] = group_id
-            logger.debug("created new group id")
-        logger.debug("group id: %s" % group_id)
-
-        # check for other results in the neighbourhood and add the group id to them
-        add_group_id_to_neighbours(
-            yes_results_dict[task_id]["task_x"],
-            yes_results_dict[task_id]["task_y"],
-            yes_results_dict[task_id]["task_z"],
-            group_id,
-        )
-
+    group_ids = get_group_ids(yes_results_dict, neighbour_list)
     logger.info("added group ids to yes maybe results dict")
 
-    # check if some tasks have different groups from their neighbours
-    duplicates_dict = create_duplicates_dict()
-    while len(duplicates_dict) > 0:
-        remove_duplicates(duplicates_dict)
-        duplicates_dict = create_duplicates_dict()
-        logger.debug("there are %s duplicated groups" % len(duplicates_dict))
-
-    logger.info("removed all duplicated group ids in yes maybe results dict")
-
     grouped_results_dict = {}
     for task_id in yes_results_dict.keys():
-        group_id = yes_results_dict[task_id]["my_group_id"]
+        group_id = group_ids[task_id]
         try:
             grouped_results_dict[group_id][task_id] = yes_results_dict[task_id]
         except KeyError:
@@ -400,31 +337,34 @@ def create_hot_tm_tasks(
     highest_group_id = max(grouped_results_dict)
     logger.debug("new highest group id: %s" % highest_group_id)
 
-    q = Queue(maxsize=0)
-    num_threads = 1
-
-    for group_id in grouped_results_dict.keys():
-
-        if len(grouped_results_dict[group_id]) < group_size:
-            final_groups_dict[group_id] = grouped_results_dict[group_id]
-        else:
-            group_data = grouped_results_dict[group_id]
-            # add this group to the queue
-            q.put([group_id, group_data, group_size])
-
-    logger.info("added groups to queue.")
-
-    for i in range(num_threads):
-        worker = threading.Thread(target=split_groups, args=(q,))
-        worker.start()
-
-    q.join()
+    split_groups_list = []
+    for cluster_index, group_id in enumerate(grouped_results_dict.keys()):
+        group_data = grouped_results_dict[group_id]
+        if len(group_data) < group_size:
+            final_groups_dict[group_id] = group_data
+            continue
+
+        task_ids = list(group_data.keys())
+        task_x = np.array([int(task["task_x"]) for task in group_data.values()])
+        task_y = np.array([int(task["task_y"]) for task in group_data.values()])
+        for depth, indices in split_group(
+            task_x, task_y, group_size, neighbourhood_size
+        ):
+            split_groups_list.append(
+                (
+                    depth,
+                    cluster_index,
+                    {task_ids[i]: group_data[task_ids[i]] for i in indices},
+                )
+            )
     logger.info("split all groups.")
 
     logger.debug("there are %s split groups" % len(split_groups_list))
 
-    # add the split groups to the final groups dict
-    for group_data in split_groups_list:
+    # add the split groups to the final groups dict,
+    # ordered by depth first as if all groups had been split at once
+    split_groups_list.sort(key=lambda split: split[:2])
+    for _, _, group_data in split_groups_list:
         new_group_id = highest_group_id + 1
         highest_group_id += 1
         final_groups_dict[new_group_id] = group_data
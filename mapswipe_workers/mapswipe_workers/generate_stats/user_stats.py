@@ -1,86 +1,122 @@
+import numpy as np
 import pandas as pd
 
+# Number of users for which contributions are calculated at once.
+USERS_PER_CHUNK = 1000
 
-def get_agreeing_contributions_per_user_and_task(row):
+
+def get_raw_contributions(
+    results_df: pd.DataFrame, agg_results_df: pd.DataFrame
+) -> pd.DataFrame:
     """
     Compare user contibution to classifications of other users by calculating
     the number of agreeing and disagreeing results.
+    Add the number of agreeing and disagreeing contributions from other users
+    to each result of a task in agg_results_df.
+    Tasks are identified by group_id and task_id,
+    since the same task_id can be part of several groups.
+    Only the "{result}_count" column of each result value is looked up.
+    Results of -999 have no agreeing contributions.
     """
+    task_positions = pd.MultiIndex.from_frame(
+        agg_results_df[["group_id", "task_id"]]
+    ).get_indexer(pd.MultiIndex.from_frame(results_df[["group_id", "task_id"]]))
+    raw_contributions_df = results_df[task_positions != -1].copy()
+    task_positions = task_positions[task_positions != -1]
+
+    result = raw_contributions_df["result"].to_numpy()
+    agreeing_contributions = np.zeros(len(raw_contributions_df), dtype="int64")
+    for value in np.unique(result):
+        if value == -999:
+            continue
+        is_value = result == value
+        counts = agg_results_df[f"{value}_count"].to_numpy()
+        agreeing_contributions[is_value] = counts[task_positions[is_value]] - 1
 
-    r = row["result"]
-    count_str = f"{r}_count"
-    # ignore -999 values
-    if count_str == "-999_count":
-        return 0
-    else:
-        return row[count_str] - 1
+    total_count = agg_results_df["total_count"].to_numpy()[task_positions]
+    raw_contributions_df["agreeing_contributions"] = agreeing_contributions
+    raw_contributions_df["disagreeing_contributions"] = np.where(
+        total_count == 0, 0, total_count - (agreeing_contributions + 1)
+    )
+    return raw_contributions_df
 
 
-def get_disagreeing_contributions_per_user_and_task(row):
+def get_contributions_by_user_id(
+    results_df: pd.DataFrame,
+    agg_results_df: pd.DataFrame,
+    users_per_chunk: int = USERS_PER_CHUNK,
+) -> pd.DataFrame:
     """
-    Compare user contibution to classifications of other users by calculating
-    the number of agreeing and disagreeing results.
+    Sum up total, agreeing and disagreeing contributions for each user.
+    The sums for separate sets of results can be added up.
+    The results are processed in chunks of users to limit the memory needed.
+    Returns a pandas dataframe indexed by project_id and user_id.
     """
+    results_df = results_df[["project_id", "group_id", "user_id", "task_id", "result"]]
+    positions_by_user_id = results_df.groupby("user_id", sort=False).indices
+    user_positions = list(positions_by_user_id.values())
 
-    total_count = row["total_count"]
-    if total_count == 0:
-        return 0
-    else:
-        agreeing_contributions = row["agreeing_contributions"]
-        disagreeing_contributions = total_count - (agreeing_contributions + 1)
-        return disagreeing_contributions
+    contributions = []
+    for i in range(0, max(len(user_positions), 1), users_per_chunk):
+        positions = user_positions[i : i + users_per_chunk]
+        raw_contributions_df = get_raw_contributions(
+            results_df.iloc[np.concatenate(positions) if positions else []],
+            agg_results_df,
+        )
+        contributions.append(
+            raw_contributions_df.groupby(["project_id", "user_id"]).agg(
+                total_contributions=pd.NamedAgg(column="user_id", aggfunc="count"),
+                agreeing_contributions=pd.NamedAgg(
+                    column="agreeing_contributions", aggfunc="sum"
+                ),
+                disagreeing_contributions=pd.NamedAgg(
+                    column="disagreeing_contributions", aggfunc="sum"
+                ),
+            )
+        )
+    return pd.concat(contributions).sort_index()
 
 
-def get_agg_results_by_user_id(
-    results_df: pd.DataFrame, agg_results_df: pd.DataFrame
+def add_simple_agreement_score(agg_results_by_user_id_df: pd.DataFrame):
+    """Calc simple agreement score as share of agreeing contributions."""
+    agg_results_by_user_id_df["simple_agreement_score"] = agg_results_by_user_id_df[
+        "agreeing_contributions"
+    ] / (
+        agg_results_by_user_id_df["agreeing_contributions"]
+        + agg_results_by_user_id_df["disagreeing_contributions"]
+    )
+
+
+def get_agg_results_by_user_id_from_contributions(
+    contributions_by_user_id_df: pd.DataFrame,
+    sessions_df: pd.DataFrame,
+    usernames: pd.Series,
 ) -> pd.DataFrame:
     """
-    For each user we calculate the number of total contributions (tasks)
-    and completed groups.
-    Then we compute agreeing and disagreeing contributions from other users.
+    For each user get the number of total contributions (tasks)
+    and completed groups and the agreeing and disagreeing contributions
+    from other users.
     This is the basis for a simple agreement score.
     The agreement score tells you how often the results from other users
     coincide with the results of this user. E.g 0.8 means, that 80% of the
     results from other users are the same as the results for that user.
-    Returns a pandas dataframe.
+    The contributions are the sums of get_contributions_by_user_id.
     """
-    raw_contributions_df = results_df.merge(
-        agg_results_df,
-        left_on="task_id",
-        right_on="task_id",
-    )
+    groups_completed = sessions_df.groupby(["project_id", "user_id"])[
+        "group_id"
+    ].nunique()
 
-    raw_contributions_df["agreeing_contributions"] = raw_contributions_df.apply(
-        get_agreeing_contributions_per_user_and_task,
-        axis=1,
+    agg_results_by_user_id_df = contributions_by_user_id_df.reset_index()
+    agg_results_by_user_id_df.insert(
+        2, "username", agg_results_by_user_id_df["user_id"].map(usernames)
     )
-
-    raw_contributions_df["disagreeing_contributions"] = raw_contributions_df.apply(
-        get_disagreeing_contributions_per_user_and_task,
-        axis=1,
+    agg_results_by_user_id_df.insert(
+        3,
+        "groups_completed",
+        groups_completed.reindex(contributions_by_user_id_df.index).to_numpy(),
     )
-
-    agg_results_by_user_id_df = raw_contributions_df.groupby(
-        ["project_id", "user_id", "username"]
-    ).agg(
-        groups_completed=pd.NamedAgg(column="group_id", aggfunc=pd.Series.nunique),
-        total_contributions=pd.NamedAgg(column="user_id", aggfunc="count"),
-        agreeing_contributions=pd.NamedAgg(
-            column="agreeing_contributions", aggfunc="sum"
-        ),
-        disagreeing_contributions=pd.NamedAgg(
-            column="disagreeing_contributions", aggfunc="sum"
-        ),
-    )
-
-    # Calc simple agreement score as share of agreeing contributions.
-    agg_results_by_user_id_df["simple_agreement_score"] = agg_results_by_user_id_df[
-        "agreeing_contributions"
-    ] / (
-        agg_results_by_user_id_df["agreeing_contributions"]
-        + agg_results_by_user_id_df["disagreeing_contributions"]
+    agg_results_by_user_id_df.sort_values(
+        ["project_id", "user_id", "username"], inplace=True, ignore_index=True
     )
-
-    agg_results_by_user_id_df.reset_index(inplace=True)
-
+    add_simple_agreement_score(agg_results_by_user_id_df)
     return agg_results_by_user_id_df
@@ -7,6 +7,7 @@ from typing import List, Optional
 import click
 import schedule as sched
 
+from mapswipe_workers import auth
 from mapswipe_workers.definitions import (
     CustomError,
     MessageType,
@@ -179,13 +180,32 @@ def run_create_user_group_membership_log():
         "(You need the quotes.)"
     ),
 )
-def run_firebase_to_postgres(project_ids: list) -> list:
+@click.option(
+    "--page_size",
+    type=int,
+    default=1000,
+    help=(
+        "Number of groups for which results are transferred at once. "
+        "Set to 0 to transfer all results of a project at once."
+    ),
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=4,
+    help="Number of projects for which results are transferred in parallel.",
+)
+def run_firebase_to_postgres(project_ids: list, page_size: int, workers: int) -> list:
     """Update users and transfer results from Firebase to Postgres."""
 
     if len(project_ids) > 0:
-        project_ids_transferred = transfer_results.transfer_results(project_ids)
+        project_ids_transferred = transfer_results.transfer_results(
+            project_ids, page_size=page_size, workers=workers
+        )
     else:
-        project_ids_transferred = transfer_results.transfer_results()
+        project_ids_transferred = transfer_results.transfer_results(
+            page_size=page_size, workers=workers
+        )
 
     if len(project_ids_transferred) > 0:
         for project_id in project_ids_transferred:
@@ -193,11 +213,30 @@ def run_firebase_to_postgres(project_ids: list) -> list:
             update_data.set_contributor_count_in_firebase(project_id)
             send_progress_notification(project_id)
 
-    update_data.update_project_data()
+    update_data.update_changed_project_data()
+    logger.info(f"postgres connection pool: {auth.postgres_pool().stats()}")
 
     return project_ids
 
 
+@cli.command("update-project-status")
+@click.option(
+    "--all-projects",
+    is_flag=True,
+    help="Check the status of all projects which have not been archived.",
+)
+def run_update_project_status(all_projects: bool) -> None:
+    """Update the status of projects in Postgres from Firebase.
+
+    By default only projects for which the status has been changed in Firebase
+    are updated. Use --all-projects to reconcile the status of all projects.
+    """
+    if all_projects:
+        update_data.update_project_data()
+    else:
+        update_data.update_changed_project_data()
+
+
 @cli.command("generate-stats")
 @click.option(
     "--project_ids",
@@ -209,25 +248,37 @@ def run_firebase_to_postgres(project_ids: list) -> list:
         "(You need the quotes.)"
     ),
 )
-def run_generate_stats(project_ids: list) -> None:
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of projects for which statistics are generated in parallel.",
+)
+def run_generate_stats(project_ids: list, workers: int) -> None:
     """
     This is the wrapper function to generate statistics for given project ids.
     We do it this way, to be able to use --verbose flag
     for the _run_generate_stats function.
     Otherwise we can't use --verbose during run function.
     """
-    _run_generate_stats(project_ids)
+    _run_generate_stats(project_ids, workers=workers)
 
 
-def _run_generate_stats(project_ids: list) -> None:
+def _run_generate_stats(project_ids: list, workers: int = 1) -> None:
     """Generate statistics for given project ids."""
-    generate_stats.generate_stats(project_ids)
+    generate_stats.generate_stats(project_ids, workers=workers)
 
 
 @cli.command("generate-stats-all-projects")
-def run_generate_stats_all_projects() -> None:
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of projects for which statistics are generated in parallel.",
+)
+def run_generate_stats_all_projects(workers: int) -> None:
     """Generate statistics for all projects."""
-    generate_stats.generate_stats_all_projects()
+    generate_stats.generate_stats_all_projects(workers=workers)
 
 
 @cli.command("user-management")
@@ -499,6 +550,13 @@ def run_set_tileserver_api_key(
         update_data.set_tileserver_api_key(project_id, api_key)
 
 
+@cli.command("backfill-progress")
+def run_backfill_progress() -> None:
+    """Rebuild the progress and contributor counts of all projects in Postgres."""
+    update_data.backfill_progress()
+    click.echo("Finished backfill of progress")
+
+
 @cli.command("run")
 @click.option(
     "--analysis_type",
@@ -517,13 +575,23 @@ def run_set_tileserver_api_key(
     default=10,
     help="Time interval for scheduled jobs in minutes.",
 )
+@click.option(
+    "--reconcile_interval",
+    type=int,
+    default=60,
+    help=(
+        "Time interval in minutes to check the status of all projects. "
+        "Used together with firebase-to-postgres."
+    ),
+)
 @click.pass_context
-def run(context, analysis_type, schedule, time_interval):
+def run(context, analysis_type, schedule, time_interval, reconcile_interval):
     """
     Run all commands.
 
     Run --create-projects, --firebase-to-postgres and --generate_stats_all_projects.
     If schedule option is set above commands will be run every 10 minutes sequentially.
+    The status of all projects is reconciled every hour.
     """
 
     def _run():
@@ -555,6 +623,10 @@ def run(context, analysis_type, schedule, time_interval):
         logger.info("start mapswipe backend workflow to generate stats and files.")
         context.invoke(run_generate_stats, project_ids=[])
 
+    def _run_reconcile_project_status():
+        logger.info("start mapswipe backend workflow to reconcile project status.")
+        context.invoke(run_update_project_status, all_projects=True)
+
     if schedule:
         if analysis_type == "all":
             sched.every(time_interval).minutes.do(_run).run()
@@ -564,6 +636,8 @@ def run(context, analysis_type, schedule, time_interval):
             sched.every(time_interval).minutes.do(_run_firebase_to_postgres).run()
         elif analysis_type == "generate-stats":
             sched.every(time_interval).minutes.do(_run_stats).run()
+        if analysis_type in ["all", "firebase-to-postgres"]:
+            sched.every(reconcile_interval).minutes.do(_run_reconcile_project_status)
         while True:
             sched.run_pending()
             time.sleep(1)
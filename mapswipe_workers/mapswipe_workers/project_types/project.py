@@ -1,17 +1,86 @@
-import csv
 import datetime as dt
+import functools
+import io
 import json
 import os
 from abc import ABC, abstractmethod
-from dataclasses import asdict, dataclass
-from typing import Dict, List
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from osgeo import ogr
 
 from mapswipe_workers import auth
-from mapswipe_workers.definitions import DATA_PATH, CustomError, logger, sentry
+from mapswipe_workers.definitions import DATA_PATH, CustomError, logger
 from mapswipe_workers.firebase.firebase import Firebase
-from mapswipe_workers.utils import geojson_functions
+from mapswipe_workers.utils import binary_copy, geojson_functions
+from mapswipe_workers.utils.copy_functions import escape_copy_value
+
+RAW_GROUPS_COLUMNS = [
+    "project_id",
+    "group_id",
+    "number_of_tasks",
+    "finished_count",
+    "required_count",
+    "progress",
+    "project_type_specifics",
+]
+RAW_GROUPS_COLUMN_TYPES = ["varchar", "varchar", "int", "int", "int", "int", "json"]
+
+RAW_TASKS_COLUMNS = [
+    "project_id",
+    "group_id",
+    "task_id",
+    "geom",
+    "project_type_specifics",
+]
+RAW_TASKS_COLUMN_TYPES = ["varchar", "varchar", "varchar", "geometry", "json"]
+
+# these common attributes don't need to be written
+# to the project_type_specifics since they are
+# already stored in separate columns
+GROUP_COMMON_ATTRIBUTES = (
+    "projectId",
+    "groupId",
+    "numberOfTasks",
+    "requiredCount",
+    "finishedCount",
+    "progress",
+)
+TASK_COMMON_ATTRIBUTES = ("projectId", "groupId", "taskId", "geometry", "geojson")
+
+
+@functools.lru_cache(maxsize=None)
+def get_project_type_specific_fields(cls, common_attributes: Tuple[str]) -> List[str]:
+    """Get the names of the fields of a dataclass without the common attributes."""
+    return [field.name for field in fields(cls) if field.name not in common_attributes]
+
+
+def get_project_type_specifics(item, common_attributes: Tuple[str]) -> str:
+    """Serialize the project type specific attributes of a group or task."""
+    return json.dumps(
+        {
+            name: getattr(item, name)
+            for name in get_project_type_specific_fields(type(item), common_attributes)
+        }
+    )
+
+
+def encode_text_chunks(
+    rows: Iterable[Iterable], rows_per_chunk: int = 1000
+) -> Iterator[bytes]:
+    """Encode rows in chunks of bytes in the text format of the COPY statement."""
+    lines = []
+    for i, row in enumerate(rows, start=1):
+        lines.append(
+            "\t".join(
+                "\\N" if value is None else escape_copy_value(value) for value in row
+            )
+        )
+        if i % rows_per_chunk == 0:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
 
 
 @dataclass
@@ -34,6 +103,13 @@ class BaseGroup:
 
 
 class BaseProject(ABC):
+    # If true, groups and tasks are copied to postgres
+    # using the binary format of the COPY statement.
+    # This only pays off if get_raw_tasks_rows is overridden to create
+    # the EWKB of the tasks from their coordinates. Parsing the WKT
+    # in the worker would only move the cost away from postgres.
+    use_binary_copy = False
+
     def __init__(self, project_draft):
         # TODO define as abstract base attributes
         self.groups: Dict[str, BaseGroup]
@@ -104,14 +180,12 @@ class BaseProject(ABC):
         """
         logger.info(f"{self.projectId}" f" - start creating a project")
 
-        # Convert object attributes to dictionaries
-        # for saving it to firebase and postgres
-        tasks = {k: [asdict(i) for i in v] for k, v in self.tasks.items()}
-        groups = {k: asdict(v) for k, v in self.groups.items()}
+        # Convert object attributes to dictionaries for saving it to firebase.
+        # Groups and tasks are read from their objects when saved to postgres.
         project = vars(self)
 
-        project.pop("groups")
-        project.pop("tasks")
+        groups = project.pop("groups")
+        tasks = project.pop("tasks")
         project.pop("inputGeometries", None)
         project.pop("inputGeometriesFileName", None)
 
@@ -155,8 +229,12 @@ class BaseProject(ABC):
 
         try:
             self.save_project_to_firebase(project)
-            self.save_groups_to_firebase(project["projectId"], groups)
-            self.save_tasks_to_firebase(project["projectId"], tasks)
+            self.save_groups_to_firebase(
+                project["projectId"], {k: asdict(v) for k, v in groups.items()}
+            )
+            self.save_tasks_to_firebase(
+                project["projectId"], self.tasks_to_dicts(tasks)
+            )
             # Delete project draft in Firebase once all things are in Firebase
             self.delete_draft_from_firebase()
 
@@ -193,11 +271,18 @@ class BaseProject(ABC):
     def save_tasks_to_firebase(self, projectId: str, tasks: dict):
         pass
 
+    def tasks_to_dicts(self, tasks: dict) -> dict:
+        """Convert the tasks of each group to dictionaries for firebase."""
+        return {k: [asdict(i) for i in v] for k, v in tasks.items()}
+
     def save_to_postgres(self, project, groups, groupsOfTasks):
         """
         Defines SQL queries and data for import a project into postgres.
         SQL queries will be executed as transaction.
         (Either every query will be executed or none)
+
+        Groups and tasks are encoded while they are copied to temporary tables
+        of the postgres session, which are dropped at the end of the transaction.
         """
 
         query_insert_project = """
@@ -267,9 +352,8 @@ class BaseProject(ABC):
             project["requestingOrganisation"],
         ]
 
-        query_recreate_raw_groups = """
-            DROP TABLE IF EXISTS raw_groups CASCADE;
-            CREATE TABLE raw_groups (
+        query_create_raw_groups = """
+            CREATE TEMP TABLE raw_groups (
               project_id varchar,
               group_id varchar,
               number_of_tasks int,
@@ -277,7 +361,7 @@ class BaseProject(ABC):
               required_count int,
               progress int,
               project_type_specifics json
-            );
+            ) ON COMMIT DROP;
             """
 
         query_insert_raw_groups = """
@@ -299,80 +383,109 @@ class BaseProject(ABC):
               progress,
               project_type_specifics
             FROM raw_groups;
-            DROP TABLE IF EXISTS raw_groups CASCADE;
             """
 
-        query_recreate_raw_tasks = """
-            DROP TABLE IF EXISTS raw_tasks CASCADE;
-            CREATE TABLE raw_tasks (
+        if self.use_binary_copy:
+            # Geometries are copied as WKB with SRID 4326 into a geometry column.
+            raw_tasks_geom_type = "geometry"
+            raw_tasks_geom_sql = "ST_Force2D(ST_Multi(geom))"
+        else:
+            raw_tasks_geom_type = "varchar"
+            raw_tasks_geom_sql = """
+              CASE
+                WHEN geom='' THEN NULL
+                ELSE ST_Force2D(ST_Multi(ST_GeomFromText(geom, 4326)))
+              END
+            """
+
+        query_create_raw_tasks = f"""
+            CREATE TEMP TABLE raw_tasks (
                 project_id varchar,
                 group_id varchar,
                 task_id varchar,
-                geom varchar,
+                geom {raw_tasks_geom_type},
                 project_type_specifics json
-            );
+            ) ON COMMIT DROP;
             """
 
-        query_insert_raw_tasks = """
+        query_insert_raw_tasks = f"""
             INSERT INTO tasks
             SELECT
               project_id,
               group_id,
               task_id,
-              CASE
-                WHEN geom='' THEN NULL
-                ELSE ST_Force2D(ST_Multi(ST_GeomFromText(geom, 4326)))
-              END geom,
+              {raw_tasks_geom_sql} geom,
               project_type_specifics
             FROM raw_tasks;
-            DROP TABLE IF EXISTS raw_tasks CASCADE;
             """
 
-        groups_txt_filename = self.create_groups_txt_file(groups)
-        tasks_txt_filename = self.create_tasks_txt_file(groupsOfTasks)
-
-        groups_columns = [
-            "project_id",
-            "group_id",
-            "number_of_tasks",
-            "finished_count",
-            "required_count",
-            "progress",
-            "project_type_specifics",
-        ]
-
-        tasks_columns = [
-            "project_id",
-            "group_id",
-            "task_id",
-            "geom",
-            "project_type_specifics",
-        ]
+        groups_rows = self.get_raw_groups_rows(groups)
+        tasks_rows = self.get_raw_tasks_rows(groupsOfTasks)
+        if self.use_binary_copy:
+            groups_file = binary_copy.stream_rows(groups_rows, RAW_GROUPS_COLUMN_TYPES)
+            tasks_file = binary_copy.stream_rows(tasks_rows, RAW_TASKS_COLUMN_TYPES)
+            copy_format = "binary"
+        else:
+            groups_file = io.BufferedReader(
+                binary_copy.ChunkedFile(encode_text_chunks(groups_rows))
+            )
+            tasks_file = io.BufferedReader(
+                binary_copy.ChunkedFile(encode_text_chunks(tasks_rows))
+            )
+            copy_format = "text"
 
         # execution of all SQL-Statements as transaction
         # (either every query gets executed or none)
+        p_con = auth.postgresDB()
         try:
-            p_con = auth.postgresDB()
-            p_con._db_cur = p_con._db_connection.cursor()
-            p_con._db_cur.execute(query_insert_project, data_project)
-            p_con._db_cur.execute(query_recreate_raw_groups, None)
-            p_con._db_cur.execute(query_recreate_raw_tasks, None)
-            with open(groups_txt_filename, "r") as groups_file:
-                p_con._db_cur.copy_from(
-                    groups_file, "raw_groups", columns=groups_columns
-                )
-            with open(tasks_txt_filename, "r") as tasks_file:
-                p_con._db_cur.copy_from(tasks_file, "raw_tasks", columns=tasks_columns)
-            p_con._db_cur.execute(query_insert_raw_groups, None)
-            p_con._db_cur.execute(query_insert_raw_tasks, None)
-            p_con._db_connection.commit()
-            p_con._db_cur.close()
-        except Exception:
+            with p_con.transaction() as cursor:
+                cursor.execute(query_insert_project, data_project)
+                cursor.execute(query_create_raw_groups, None)
+                cursor.execute(query_create_raw_tasks, None)
+                for f, table, columns in [
+                    (groups_file, "raw_groups", RAW_GROUPS_COLUMNS),
+                    (tasks_file, "raw_tasks", RAW_TASKS_COLUMNS),
+                ]:
+                    cursor.copy_expert(
+                        f"COPY {table} ({', '.join(columns)}) "
+                        f"FROM STDIN WITH (FORMAT {copy_format})",
+                        f,
+                    )
+                cursor.execute(query_insert_raw_groups, None)
+                cursor.execute(query_insert_raw_tasks, None)
+        finally:
+            groups_file.close()
+            tasks_file.close()
             del p_con
-            raise
 
-        os.remove(groups_txt_filename)
-        os.remove(tasks_txt_filename)
+    def get_raw_groups_rows(self, groups):
+        """Get the rows of the raw_groups table in the order of RAW_GROUPS_COLUMNS."""
+        for groupId, group in groups.items():
+            yield (
+                self.projectId,
+                groupId,
+                group.numberOfTasks,
+                group.finishedCount,
+                group.requiredCount,
+                group.progress,
+                get_project_type_specifics(group, GROUP_COMMON_ATTRIBUTES),
+            )
+
+    def get_raw_tasks_rows(self, groupsOfTasks):
+        """Get the rows of the raw_tasks table in the order of RAW_TASKS_COLUMNS.
+
+        The geometries are WKT which postgres parses with ST_GeomFromText.
+        Project types with use_binary_copy yield EWKB with SRID 4326 instead.
+        """
+        for groupId, tasks in groupsOfTasks.items():
+            for task in tasks:
+                yield (
+                    self.projectId,
+                    groupId,
+                    task.taskId,
+                    getattr(task, "geometry", None) or "",
+                    get_project_type_specifics(task, TASK_COMMON_ATTRIBUTES),
+                )
 
     def save_to_files(self, project):
         """Save the project extent geometry as a GeoJSON file."""
@@ -397,168 +510,6 @@ class BaseProject(ABC):
         except FileNotFoundError:
             pass
 
-    def create_groups_txt_file(self, groups):
-        """
-        Creates a text file containing groups information
-        for a specific project.
-        The text file is temporary and used only by BaseImport module.
-
-        Parameters
-        ----------
-        projectId : int
-            The id of the project
-        groups : dict
-            The dictionary with the group information
-
-        Returns
-        -------
-        string
-            Filename
-        """
-
-        if not os.path.isdir("{}/tmp".format(DATA_PATH)):
-            os.mkdir("{}/tmp".format(DATA_PATH))
-
-        # create txt file with header for later
-        # import with copy function into postgres
-        groups_txt_filename = f"{DATA_PATH}/tmp/raw_groups_{self.projectId}.txt"
-        groups_txt_file = open(groups_txt_filename, "w", newline="")
-        fieldnames = (
-            "project_id",
-            "group_id",
-            "number_of_tasks",
-            "finished_count",
-            "required_count",
-            "progress",
-            "project_type_specifics",
-        )
-        w = csv.DictWriter(
-            groups_txt_file,
-            fieldnames=fieldnames,
-            delimiter="\t",
-            quotechar="'",
-        )
-
-        for groupId, group in groups.items():
-            try:
-                output_dict = {
-                    "project_id": self.projectId,
-                    "group_id": groupId,
-                    "number_of_tasks": group["numberOfTasks"],
-                    "finished_count": group["finishedCount"],
-                    "required_count": group["requiredCount"],
-                    "progress": group["progress"],
-                    "project_type_specifics": dict(),
-                }
-
-                # these common attributes don't need to be written
-                # to the project_type_specifics since they are
-                # already stored in separate columns
-                common_attributes = [
-                    "projectId",
-                    "groupId",
-                    "numberOfTasks",
-                    "requiredCount",
-                    "finishedCount",
-                    "progress",
-                ]
-
-                for key in group.keys():
-                    if key not in common_attributes:
-                        output_dict["project_type_specifics"][key] = group[key]
-                output_dict["project_type_specifics"] = json.dumps(
-                    output_dict["project_type_specifics"]
-                )
-
-                w.writerow(output_dict)
-
-            except Exception as e:
-                logger.exception(
-                    f"{self.projectId}"
-                    f" - set_groups_postgres - "
-                    f"groups missed critical information: {e}"
-                )
-                sentry.capture_exception()
-
-        groups_txt_file.close()
-
-        return groups_txt_filename
-
-    def create_tasks_txt_file(self, groupsOfTasks):
-        """
-        Creates a text file containing tasks information
-        for a specific project.
-        It interates over groups and extracts tasks.
-        The text file is temporary and used only by BaseImport module.
-
-        Parameters
-        ----------
-        projectId : int
-            The id of the project
-        tasks : dictionary
-            Dictionary containing tasks of a project
-
-        Returns
-        -------
-        string
-            Filename
-        """
-
-        if not os.path.isdir("{}/tmp".format(DATA_PATH)):
-            os.mkdir("{}/tmp".format(DATA_PATH))
-
-        # save tasks in txt file
-        tasks_txt_filename = f"{DATA_PATH}/tmp/raw_tasks_{self.projectId}.txt"
-        tasks_txt_file = open(tasks_txt_filename, "w", newline="")
-
-        fieldnames = (
-            "project_id",
-            "group_id",
-            "task_id",
-            "geom",
-            "project_type_specifics",
-        )
-        w = csv.DictWriter(
-            tasks_txt_file,
-            fieldnames=fieldnames,
-            delimiter="\t",
-            quotechar="'",
-        )
-
-        for groupId, tasks in groupsOfTasks.items():
-            for task in tasks:
-                output_dict = {
-                    "project_id": self.projectId,
-                    "group_id": groupId,
-                    "task_id": task["taskId"],
-                    "geom": task["geometry"],
-                    "project_type_specifics": dict(),
-                }
-
-                # these common attributes don't need to be written
-                # to the project_type_specifics since they are
-                # already stored in separate columns
-                common_attributes = [
-                    "projectId",
-                    "groupId",
-                    "taskId",
-                    "geometry",
-                    "geojson",
-                ]
-
-                for key in task.keys():
-                    if key not in common_attributes:
-                        output_dict["project_type_specifics"][key] = task[key]
-                output_dict["project_type_specifics"] = json.dumps(
-                    output_dict["project_type_specifics"]
-                ).replace(
-                    "'", ""
-                )  # to prevent error: invalid token "'"
-
-                w.writerow(output_dict)
-        tasks_txt_file.close()
-        return tasks_txt_filename
-
     def delete_draft_from_firebase(self):
         firebase = Firebase()
         firebase.delete_project_draft_from_firebase(self.projectId)
@@ -1,4 +1,5 @@
-from dataclasses import asdict, dataclass
+import functools
+from dataclasses import dataclass
 
 from mapswipe_workers.firebase.firebase import Firebase
 from mapswipe_workers.project_types.tile_map_service.project import (
@@ -6,7 +7,7 @@ from mapswipe_workers.project_types.tile_map_service.project import (
     TileMapServiceBaseTask,
 )
 from mapswipe_workers.project_types.tile_server import BaseTileServer
-from mapswipe_workers.utils.tile_functions import tile_coords_zoom_and_tileserver_to_url
+from mapswipe_workers.utils import vectorized_tile_functions
 
 
 @dataclass
@@ -22,18 +23,13 @@ class ChangeDetectionProject(TileMapServiceBaseProject):
     def create_tasks(self):
         super().create_tasks()
         # Add urlB attribute.
-        for group_id, group in self.tasks.items():
-            tasks = []
-            for task in group:
-                urlB = tile_coords_zoom_and_tileserver_to_url(
-                    task.taskX,
-                    task.taskY,
-                    self.zoomLevel,
-                    self.tileServerB,
-                )
-                # Cast super task class to completeness task class.
-                tasks.append(ChangeDetectionTask(**asdict(task), urlB=urlB))
-            self.tasks[group_id] = tasks
+        urls_b = functools.partial(
+            vectorized_tile_functions.tile_urls,
+            zoom=self.zoomLevel,
+            tile_server=self.tileServerB,
+        )
+        for tasks in self.tasks.values():
+            tasks.add_column("urlB", urls_b, ChangeDetectionTask)
 
     def save_tasks_to_firebase(self, projectId: str, tasks: dict):
         """How to move the result data from firebase to postgres."""
@@ -1,11 +1,12 @@
-from dataclasses import asdict, dataclass
+import functools
+from dataclasses import dataclass
 
 from mapswipe_workers.project_types.tile_map_service.project import (
     TileMapServiceBaseProject,
     TileMapServiceBaseTask,
 )
 from mapswipe_workers.project_types.tile_server import BaseTileServer
-from mapswipe_workers.utils.tile_functions import tile_coords_zoom_and_tileserver_to_url
+from mapswipe_workers.utils import vectorized_tile_functions
 
 
 @dataclass
@@ -26,15 +27,10 @@ class CompletenessProject(TileMapServiceBaseProject):
     def create_tasks(self):
         super().create_tasks()
         # Add urlB attribute.
-        for group_id, group in self.tasks.items():
-            tasks = []
-            for task in group:
-                urlB = tile_coords_zoom_and_tileserver_to_url(
-                    task.taskX,
-                    task.taskY,
-                    self.zoomLevel,
-                    self.tileServerB,
-                )
-                # Cast super task class to completeness task class.
-                tasks.append(CompletenessTask(**asdict(task), urlB=urlB))
-            self.tasks[group_id] = tasks
+        urls_b = functools.partial(
+            vectorized_tile_functions.tile_urls,
+            zoom=self.zoomLevel,
+            tile_server=self.tileServerB,
+        )
+        for tasks in self.tasks.values():
+            tasks.add_column("urlB", urls_b, CompletenessTask)
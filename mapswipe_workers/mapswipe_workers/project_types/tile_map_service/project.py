@@ -1,6 +1,11 @@
+import functools
+import json
 from abc import abstractmethod
-from dataclasses import dataclass
-from typing import Dict, List
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
 
 from mapswipe_workers.firebase.firebase import Firebase
 from mapswipe_workers.firebase_to_postgres.transfer_results import (
@@ -11,9 +16,19 @@ from mapswipe_workers.firebase_to_postgres.transfer_results import (
 from mapswipe_workers.generate_stats.project_stats import (
     get_statistics_for_integer_result_project,
 )
-from mapswipe_workers.project_types.project import BaseGroup, BaseProject, BaseTask
+from mapswipe_workers.project_types.project import (
+    TASK_COMMON_ATTRIBUTES,
+    BaseGroup,
+    BaseProject,
+    BaseTask,
+    get_project_type_specific_fields,
+)
 from mapswipe_workers.project_types.tile_server import BaseTileServer
-from mapswipe_workers.utils import tile_functions, tile_grouping_functions
+from mapswipe_workers.utils import (
+    binary_copy,
+    tile_grouping_functions,
+    vectorized_tile_functions,
+)
 from mapswipe_workers.utils.validate_input import (
     multipolygon_to_wkt,
     save_geojson_to_file,
@@ -37,13 +52,125 @@ class TileMapServiceBaseGroup(BaseGroup):
     yMin: int
 
 
+class TileMapServiceTasks(Sequence):
+    """Tasks of a group stored as columns.
+
+    Only the tile coordinates of the tasks are kept as arrays.
+    Other attributes like geometry and url are computed for all tasks
+    of the group when the tasks are read and are not stored.
+    Project types add columns for further attributes of their task class.
+    Reading single tasks creates task objects of the task class.
+    """
+
+    def __init__(
+        self,
+        projectId: str,
+        groupId: str,
+        zoom: int,
+        tile_x: np.ndarray,
+        tile_y: np.ndarray,
+    ):
+        self.projectId = projectId
+        self.groupId = groupId
+        self.zoom = zoom
+        self.tile_x = tile_x
+        self.tile_y = tile_y
+        self.task_class = TileMapServiceBaseTask
+        self.columns: Dict[str, Callable[[np.ndarray, np.ndarray], list]] = {}
+
+    def add_column(
+        self,
+        name: str,
+        column: Callable[[np.ndarray, np.ndarray], list],
+        task_class: type = None,
+    ):
+        """Add an attribute computed from the tile coordinates of all tasks.
+
+        task_class is the class of the tasks with this attribute.
+        """
+        self.columns[name] = column
+        if task_class is not None:
+            self.task_class = task_class
+
+    def get_columns(self, exclude: Tuple[str, ...] = ()) -> Dict[str, list]:
+        """Get the values of all attributes in the order of the task fields.
+
+        Attributes in exclude are left out and not computed.
+        """
+        return self.get_values(self.tile_x, self.tile_y, exclude)
+
+    def get_values(
+        self, tile_x: np.ndarray, tile_y: np.ndarray, exclude: Tuple[str, ...] = ()
+    ) -> Dict[str, list]:
+        """Get the values of all attributes for the given tiles of the group."""
+        tile_x_list = tile_x.tolist()
+        tile_y_list = tile_y.tolist()
+        values = {
+            "projectId": [self.projectId] * len(tile_x_list),
+            "groupId": [self.groupId] * len(tile_x_list),
+            "taskId": [
+                f"{self.zoom}-{x}-{y}" for x, y in zip(tile_x_list, tile_y_list)
+            ],
+            "taskX": tile_x_list,
+            "taskY": tile_y_list,
+        }
+        for name, column in self.columns.items():
+            if name not in exclude:
+                values[name] = column(tile_x, tile_y)
+        return {
+            field.name: values[field.name]
+            for field in fields(self.task_class)
+            if field.name not in exclude
+        }
+
+    def to_dicts(self) -> List[dict]:
+        """Get the tasks as dictionaries like dataclasses.asdict."""
+        columns = self.get_columns()
+        return [dict(zip(columns.keys(), row)) for row in zip(*columns.values())]
+
+    def __len__(self) -> int:
+        return len(self.tile_x)
+
+    def __iter__(self) -> Iterator[TileMapServiceBaseTask]:
+        for row in zip(*self.get_columns().values()):
+            yield self.task_class(*row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        i = range(len(self))[index]
+        values = self.get_values(self.tile_x[i : i + 1], self.tile_y[i : i + 1])
+        return self.task_class(*(column[0] for column in values.values()))
+
+
+class TileMapServiceTaskDicts(Mapping):
+    """Tasks of all groups as dictionaries like dataclasses.asdict.
+
+    The dictionaries of a group are only created when the group is read.
+    This way tasks are converted group by group while they are uploaded.
+    """
+
+    def __init__(self, tasks: Dict[str, TileMapServiceTasks]):
+        self.tasks = tasks
+
+    def __getitem__(self, group_id: str) -> List[dict]:
+        return self.tasks[group_id].to_dicts()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tasks)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
 class TileMapServiceBaseProject(BaseProject):
+    # Projects with many small tile geometries benefit most from WKB.
+    use_binary_copy = True
+
     def __init__(self, project_draft: dict):
         super().__init__(project_draft)
         self.groups: Dict[str, TileMapServiceBaseGroup] = {}
-        self.tasks: Dict[str, List[TileMapServiceBaseTask]] = (
-            {}
-        )  # dict keys are group ids
+        self.tasks: Dict[str, TileMapServiceTasks] = {}  # dict keys are group ids
 
         self.geometry = project_draft["geometry"]
         self.zoomLevel = int(project_draft.get("zoomLevel", 18))
@@ -97,41 +224,77 @@ class TileMapServiceBaseProject(BaseProject):
     def create_tasks(self):
         if len(self.groups) == 0:
             raise ValueError("Groups needs to be created before tasks can be created.")
+        geometries = functools.partial(
+            vectorized_tile_functions.geometries_from_tile_coords, zoom=self.zoomLevel
+        )
+        urls = functools.partial(
+            vectorized_tile_functions.tile_urls,
+            zoom=self.zoomLevel,
+            tile_server=self.tileServer,
+        )
         for group_id, group in self.groups.items():
-            self.tasks[group_id] = []
-            for TileX in range(group.xMin, group.xMax + 1):
-                for TileY in range(group.yMin, group.yMax + 1):
-                    geometry = tile_functions.geometry_from_tile_coords(
-                        TileX,
-                        TileY,
-                        self.zoomLevel,
-                    )
+            tile_x, tile_y = vectorized_tile_functions.tiles_of_extent(
+                group.xMin, group.xMax, group.yMin, group.yMax
+            )
+            tasks = TileMapServiceTasks(
+                self.projectId, group_id, self.zoomLevel, tile_x, tile_y
+            )
+            tasks.add_column("geometry", geometries)
+            tasks.add_column("url", urls)
+            self.tasks[group_id] = tasks
+            group.numberOfTasks = len(tasks)
 
-                    url = tile_functions.tile_coords_zoom_and_tileserver_to_url(
-                        TileX,
-                        TileY,
-                        self.zoomLevel,
-                        self.tileServer,
-                    )
-                    self.tasks[group_id].append(
-                        TileMapServiceBaseTask(
-                            projectId=self.projectId,
-                            groupId=group_id,
-                            taskId=f"{self.zoomLevel}-{TileX}-{TileY}",
-                            taskX=TileX,
-                            taskY=TileY,
-                            geometry=geometry,
-                            url=url,
-                        )
+    def tasks_to_dicts(
+        self, tasks: Dict[str, TileMapServiceTasks]
+    ) -> TileMapServiceTaskDicts:
+        return TileMapServiceTaskDicts(tasks)
+
+    def get_raw_tasks_rows(self, groupsOfTasks, wkb: bool = True):
+        """Get the rows of the raw_tasks table from the columns of the tasks.
+
+        If wkb is true, the geometries are EWKB with SRID 4326 for the
+        binary COPY. Otherwise they are WKT like in BaseProject.
+        """
+        for groupId, tasks in groupsOfTasks.items():
+            specifics = get_project_type_specific_fields(
+                tasks.task_class, TASK_COMMON_ATTRIBUTES
+            )
+            if wkb:
+                # The WKB is created from the tile coordinates, not from the WKT.
+                columns = tasks.get_columns(exclude=("geometry",))
+                wkb_geometries = (
+                    vectorized_tile_functions.wkb_polygons_from_tile_coords(
+                        tasks.tile_x, tasks.tile_y, tasks.zoom
                     )
-            self.groups[group_id].numberOfTasks = len(self.tasks[group_id])
+                )
+                geometries = [
+                    binary_copy.wkb_with_srid(geometry, 4326)
+                    for geometry in wkb_geometries
+                ]
+            else:
+                columns = tasks.get_columns()
+                geometries = columns["geometry"]
+            for taskId, geom, *values in zip(
+                columns["taskId"],
+                geometries,
+                *(columns[name] for name in specifics),
+            ):
+                yield (
+                    self.projectId,
+                    groupId,
+                    taskId,
+                    geom,
+                    json.dumps(dict(zip(specifics, values))),
+                )
 
     @staticmethod
     def results_to_postgres(results: dict, project_id: str, filter_mode: bool):
         """How to move the result data from firebase to postgres."""
-        results_file, user_group_results_file = results_to_file(results, project_id)
+        results_file, user_group_results_file = results_to_file(
+            results, project_id, binary=True
+        )
         truncate_temp_results()
-        save_results_to_postgres(results_file, project_id, filter_mode)
+        save_results_to_postgres(results_file, project_id, filter_mode, binary=True)
         return user_group_results_file
 
     @staticmethod
@@ -0,0 +1,134 @@
+"""Encode data in the binary format of the Postgres COPY statement.
+
+Fields are sent in the binary representation of their column type.
+Postgres does not need to parse text for every field.
+See https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+"""
+
+import datetime
+import io
+import struct
+from typing import Callable, Dict, Iterable, Iterator, List
+
+HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+TRAILER = struct.pack("!h", -1)
+NULL = struct.pack("!i", -1)
+
+POSTGRES_EPOCH = datetime.datetime(2000, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def encode_varchar(value) -> bytes:
+    data = str(value).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def encode_int(value) -> bytes:
+    return struct.pack("!ii", 4, int(value))
+
+
+def encode_timestamp(value: datetime.datetime) -> bytes:
+    """Encode a timestamp without time zone as microseconds since 2000-01-01.
+
+    Like for the text format the time zone of the value is ignored.
+    """
+    microseconds = (value.replace(tzinfo=None) - POSTGRES_EPOCH) // ONE_MICROSECOND
+    return struct.pack("!iq", 8, microseconds)
+
+
+def encode_json(value) -> bytes:
+    """Encode a json column. The value is a serialized json string."""
+    return encode_varchar(value)
+
+
+def encode_geometry(value: bytes) -> bytes:
+    """Encode a PostGIS geometry column. The value is a (E)WKB geometry."""
+    return struct.pack("!i", len(value)) + bytes(value)
+
+
+def wkb_with_srid(wkb: bytes, srid: int) -> bytes:
+    """Add a SRID to a WKB geometry, which gives the EWKB used by PostGIS."""
+    byte_order = "<" if wkb[0] == 1 else ">"
+    (geometry_type,) = struct.unpack(f"{byte_order}I", wkb[1:5])
+    return (
+        wkb[:1]
+        + struct.pack(f"{byte_order}II", geometry_type | 0x20000000, srid)
+        + wkb[5:]
+    )
+
+
+ENCODERS: Dict[str, Callable] = {
+    "varchar": encode_varchar,
+    "int": encode_int,
+    "timestamp": encode_timestamp,
+    "json": encode_json,
+    "geometry": encode_geometry,
+}
+
+
+def encode_tuple_header(number_of_fields: int) -> bytes:
+    return struct.pack("!h", number_of_fields)
+
+
+def encode_row_chunks(
+    rows: Iterable[Iterable], column_types: List[str], rows_per_chunk: int = 1000
+) -> Iterator[bytes]:
+    """Encode rows in chunks of bytes, starting with the header of the format."""
+    encoders = [ENCODERS[column_type] for column_type in column_types]
+    tuple_header = encode_tuple_header(len(column_types))
+
+    data = [HEADER]
+    for i, row in enumerate(rows, start=1):
+        data.append(tuple_header)
+        for value, encoder in zip(row, encoders):
+            data.append(NULL if value is None else encoder(value))
+        if i % rows_per_chunk == 0:
+            yield b"".join(data)
+            data = []
+    data.append(TRAILER)
+    yield b"".join(data)
+
+
+def encode_rows(rows: Iterable[Iterable], column_types: List[str]) -> io.BytesIO:
+    """Encode rows as file which can be used with postgresDB.copy_binary.
+
+    Parameters
+    ----------
+    rows: iterable of rows, each row has one value per column
+    column_types: type of each column, one of the keys of ENCODERS
+    """
+    return io.BytesIO(b"".join(encode_row_chunks(rows, column_types)))
+
+
+class ChunkedFile(io.RawIOBase):
+    """Read-only file which reads bytes from an iterable of chunks.
+
+    Chunks are only created when the file is read. COPY reads the file
+    in blocks, so rows don't need to be held in memory all at once.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk:
+            try:
+                self._chunk = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+def stream_rows(rows: Iterable[Iterable], column_types: List[str]) -> io.BufferedReader:
+    """Encode rows lazily as file which can be used with postgresDB.copy_binary.
+
+    See encode_rows. Rows are encoded while the file is read.
+    """
+    return io.BufferedReader(ChunkedFile(encode_row_chunks(rows, column_types)))
@@ -0,0 +1,17 @@
+"""Encode data in the text format of the Postgres COPY statement.
+
+See https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.2
+"""
+
+
+def escape_copy_value(value) -> str:
+    """Escape a value for the text format of the COPY statement."""
+    value = str(value)
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        value = (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return value
@@ -19,6 +19,8 @@ def create_directories() -> None:
         "/api/tasks",
         "/api/users",
         "/api/yes_maybe",
+        "/stats_cache",
+        "/stats_state",
     )
 
     for dir_name in dirs:
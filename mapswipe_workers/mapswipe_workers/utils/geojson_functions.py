@@ -1,63 +1,101 @@
+import csv
 import gzip
 import json
 import os
-import shutil
 import subprocess
+import sys
 import tempfile
 
 from osgeo import ogr, osr
+from shapely import wkt
+from shapely.geometry import mapping
 
 from mapswipe_workers.definitions import logger
 
+# Properties which are kept as strings in GeoJSON files.
+STRING_PROPERTIES = ["project_id", "name", "project_details", "task_id", "group_id"]
+
+GEOJSON_METADATA = {"usage": "This data can only be used for editing in OpenStreetMap."}
+
+
+def cast_properties(properties: dict, geometry_field: str = "geom") -> dict:
+    """
+    Try to cast all values as float, except project_id and other ids or names.
+    Remove empty values and the redundant geometry property.
+    """
+    cast = {}
+    for property, value in properties.items():
+        if property in STRING_PROPERTIES:
+            # don't try to cast project_id
+            cast[property] = value
+        elif property == geometry_field or value == "":
+            continue
+        else:
+            try:
+                cast[property] = float(value)
+            except (ValueError, TypeError):
+                cast[property] = value
+    return cast
+
 
 def gzipped_csv_to_gzipped_geojson(
     filename: str, geometry_field: str = "geom", add_metadata: bool = False
 ):
     """Convert gzipped csv file to gzipped GeoJSON.
 
-    First the gzipped files are unzipped and stored in temporary csv and geojson files.
-    Then the unzipped csv file is converted into a geojson file with ogr2ogr.
-    Last, the generated geojson file is again compressed using gzip.
+    The csv file is read row by row. The WKT geometry of each row is converted
+    and the other values are cast, before the feature is written to the
+    gzipped GeoJSON file. Therefore only one row is kept in memory.
+    The GeoJSON file is written to a unique temporary file first,
+    which then replaces the GeoJSON file at once.
     """
-    # generate temporary files which will be automatically deleted at the end
-    tmp_csv_file = os.path.join(tempfile._get_default_tempdir(), "tmp.csv")
-    tmp_geojson_file = os.path.join(tempfile._get_default_tempdir(), "tmp.geojson")
-
     outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
+    layer_name = os.path.basename(filename).split(".")[0]
 
-    # uncompress content of zipped csv file and save to csv file
-    with gzip.open(filename, "rb") as f_in:
-        with open(tmp_csv_file, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
+    # WKT geometries can be longer than the default field size limit
+    csv.field_size_limit(sys.maxsize)
 
-    # use ogr2ogr to transform csv file into geojson file
-    # TODO: remove geom column from normal attributes in sql query
-    subprocess.run(
-        [
-            "ogr2ogr",
-            "-f",
-            "GeoJSON",
-            tmp_geojson_file,
-            tmp_csv_file,
-            "-sql",
-            f'SELECT *, CAST({geometry_field} as geometry) FROM "tmp"',  # noqa E501
-        ],
-        check=True,
+    fd, tmp_outfile = tempfile.mkstemp(
+        dir=os.path.dirname(outfile), prefix=f"{layer_name}_", suffix=".tmp"
     )
-
-    if add_metadata:
-        add_metadata_to_geojson(tmp_geojson_file)
-
-    cast_datatypes_for_geojson(tmp_geojson_file)
-
-    # compress geojson file with gzip
-    with open(tmp_geojson_file, "r") as f:
-        json_data = json.load(f)
-
-    with gzip.open(outfile, "wt") as fout:
-        json.dump(json_data, fout)
-
-    logger.info(f"converted {filename} to {outfile} with ogr2ogr.")
+    os.close(fd)
+    try:
+        with gzip.open(filename, "rt", newline="") as f_in, gzip.open(
+            tmp_outfile, "wt"
+        ) as f_out:
+            f_out.write(
+                f'{{"type": "FeatureCollection", "name": {json.dumps(layer_name)}, '
+                '"features": ['
+            )
+            number_of_features = 0
+            for row in csv.DictReader(f_in):
+                # the last row of the csv might contain a comment about data use
+                if next(iter(row.values()), "").startswith("#"):
+                    continue
+
+                wkt_geometry = row.get(geometry_field)
+                feature = {
+                    "type": "Feature",
+                    "properties": cast_properties(row, geometry_field),
+                    "geometry": (
+                        mapping(wkt.loads(wkt_geometry)) if wkt_geometry else None
+                    ),
+                }
+                if number_of_features > 0:
+                    f_out.write(", ")
+                json.dump(feature, f_out)
+                number_of_features += 1
+
+            f_out.write("]")
+            if add_metadata:
+                f_out.write(f', "metadata": {json.dumps(GEOJSON_METADATA)}')
+            f_out.write("}")
+        os.replace(tmp_outfile, outfile)
+    finally:
+        if os.path.isfile(tmp_outfile):
+            os.remove(tmp_outfile)
+
+    logger.info(f"converted {number_of_features} features of {filename} to {outfile}.")
 
 
 def csv_to_geojson(filename: str, geometry_field: str = "geom"):
@@ -102,30 +140,8 @@ def cast_datatypes_for_geojson(filename: str):
         logger.info(f"there are no features for this file: {filename}")
 
     else:
-        properties = list(geojson_data["features"][0]["properties"].keys())
-        for i in range(0, len(geojson_data["features"])):
-            for property in properties:
-                if property in [
-                    "project_id",
-                    "name",
-                    "project_details",
-                    "task_id",
-                    "group_id",
-                ]:
-                    # don't try to cast project_id
-                    pass
-                elif property in ["geom"]:
-                    # remove redundant geometry property
-                    del geojson_data["features"][i]["properties"][property]
-                elif geojson_data["features"][i]["properties"][property] == "":
-                    del geojson_data["features"][i]["properties"][property]
-                else:
-                    try:
-                        geojson_data["features"][i]["properties"][property] = float(
-                            geojson_data["features"][i]["properties"][property]
-                        )
-                    except (ValueError, TypeError):
-                        pass
+        for feature in geojson_data["features"]:
+            feature["properties"] = cast_properties(feature["properties"])
 
         with open(filename, "w") as f:
             json.dump(geojson_data, f)
@@ -144,9 +160,7 @@ def add_metadata_to_geojson(filename: str, geometry_field: str = "geom"):
     if len(geojson_data["features"]) < 1:
         logger.info(f"there are no features for this file: {filename}")
 
-    geojson_data["metadata"] = {
-        "usage": "This data can only be used for editing in OpenStreetMap."
-    }
+    geojson_data["metadata"] = GEOJSON_METADATA
 
     with open(filename, "w") as f:
         json.dump(geojson_data, f)
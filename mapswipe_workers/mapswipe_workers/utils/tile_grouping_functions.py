@@ -1,10 +1,12 @@
 import math
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+import numpy as np
 from osgeo import ogr
 
 from mapswipe_workers.definitions import logger
 from mapswipe_workers.utils import tile_functions as t
+from mapswipe_workers.utils import vectorized_tile_functions as vt
 
 
 def get_geometry_from_file(infile: str):
@@ -50,301 +52,180 @@ def get_geometry_from_file(infile: str):
     return extent, geomcol
 
 
-def get_horizontal_slice(extent: List, geomcol, zoom: int):
+def get_polygon_rings(geomcol) -> List[List[np.ndarray]]:
     """
-    The function slices all input geometries vertically
-    using a height of max 3 tiles per geometry.
-    The function iterates over all input geometries.
-    For each geometry tile coordinates are calculated.
-    Then this geometry is split into several geometries using the min
-    and max tile coordinates for the geometry.
+    The function to get the coordinates of all polygons of a geometry collection.
 
     Parameters
     ----------
-    extent : list
-        the extent of the layer as [x_min, x_max, y_min, y_max]
     geomcol : ogr.Geometry(ogr.wkbGeometryCollection)
-        a geometry collection of all feature geometries for the given file
-    zoom : int
-        the tile map service zoom level
+        a geometry collection of polygons and multipolygons
 
     Returns
     -------
-    slice_infos : dict
-        a dictionary containing a list of "tile_y_top" coordinates,
-        a list of "tile_y_bottom" coordinates and a "slice_collection"
-        containing a ogr geometry collection
+    polygons : list
+        a list with the rings of each polygon, each ring as an array
+        of closed lon, lat coordinates
     """
 
-    slice_infos = {
-        "tile_y_top": [],
-        "tile_y_bottom": [],
-        "slice_collection": ogr.Geometry(ogr.wkbGeometryCollection),
-    }
-
-    xmin = extent[0]
-    xmax = extent[1]
-    ymin = extent[2]
-    ymax = extent[3]
-
+    polygons = []
     for i in range(0, geomcol.GetGeometryCount()):
-        polygon_to_slice = geomcol.GetGeometryRef(i)
-        # logging.info('polygon to slice: %s' % polygon_to_slice)'''
-
-        # polygon_to_slice = geomcol.GetGeometryRef(0)
-
-        # get upper left left tile coordinates
-        pixel = t.lat_long_zoom_to_pixel_coords(ymax, xmin, zoom)
-        tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
-        TileX_left = tile.x
-        TileY_top = tile.y
-
-        # get lower right tile coordinates
-        pixel = t.lat_long_zoom_to_pixel_coords(ymin, xmax, zoom)
-        tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
-
-        TileX_right = tile.x
-        TileY_bottom = tile.y
-        TileHeight = abs(TileY_top - TileY_bottom)
-
-        TileY = TileY_top
-
-        # get rows
-        rows = int(math.ceil(TileHeight / 3))
-
-        ############################################################
-
-        for i in range(0, rows + 1):
-            # Calculate lat, lon of upper left corner of tile
-            PixelX = TileX_left * 256
-            PixelY = TileY * 256
-            lon_left, lat_top = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
-
-            PixelX = TileX_right * 256
-            PixelY = (TileY + 3) * 256
-            lon_right, lat_bottom = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
-
-            # Create Geometry
-            ring = ogr.Geometry(ogr.wkbLinearRing)
-            ring.AddPoint(lon_left, lat_top)
-            ring.AddPoint(lon_right, lat_top)
-            ring.AddPoint(lon_right, lat_bottom)
-            ring.AddPoint(lon_left, lat_bottom)
-            ring.AddPoint(lon_left, lat_top)
-            poly = ogr.Geometry(ogr.wkbPolygon)
-            poly.AddGeometry(ring)
-
-            sliced_poly = poly.Intersection(polygon_to_slice)
-
-            if sliced_poly:
-                if sliced_poly.GetGeometryName() == "POLYGON":
-                    slice_infos["tile_y_top"].append(TileY)
-                    slice_infos["tile_y_bottom"].append(TileY + 3)
-                    slice_infos["slice_collection"].AddGeometry(sliced_poly)
-                elif sliced_poly.GetGeometryName() == "MULTIPOLYGON":
-                    for geom_part in sliced_poly:
-                        slice_infos["tile_y_top"].append(TileY)
-                        slice_infos["tile_y_bottom"].append(TileY + 3)
-                        slice_infos["slice_collection"].AddGeometry(geom_part)
-                else:
-                    pass
-            else:
-                pass
-
-            TileY = TileY + 3
-
-    return slice_infos
-
-
-def get_vertical_slice(slice_infos: Dict, zoom: int, width_threshold: int = 40):
+        geometry = geomcol.GetGeometryRef(i)
+        if geometry.GetGeometryName() == "MULTIPOLYGON":
+            parts = [
+                geometry.GetGeometryRef(j) for j in range(geometry.GetGeometryCount())
+            ]
+        elif geometry.GetGeometryName() == "POLYGON":
+            parts = [geometry]
+        else:
+            continue
+
+        for part in parts:
+            rings = []
+            for j in range(0, part.GetGeometryCount()):
+                points = part.GetGeometryRef(j).GetPoints()
+                if not points:
+                    continue
+                ring = np.array(points, dtype=np.float64)[:, :2]
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                rings.append(ring)
+            if rings:
+                polygons.append(rings)
+    return polygons
+
+
+def get_tile_runs(
+    polygons: List[List[np.ndarray]],
+    tile_x_left: int,
+    tile_y_top: int,
+    columns: int,
+    rows: int,
+    zoom: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    The function slices the horizontal stripes vertically.
-    Each input stripe has a height of three tiles
-    and will be splitted into vertical parts.
-    The width of each part is defined by the width threshold set below.
+    The function rasterizes polygons to runs of the tiles they intersect.
+    A tile is occupied if an edge of a polygon passes through it
+    or if its center lies inside of a polygon.
+    Edges are clipped to each row of tiles they cross.
+    The inside of the polygons is filled row by row with a scanline
+    through the middle of the row.
+    As for OGR, the edges are straight lines in lon, lat coordinates.
+    Only the runs are returned and not a bitmap of all tiles,
+    so that the memory depends on the outline of the polygons
+    and not on the size of their extent.
 
     Parameters
     ----------
-    slice_infos : dict
-        a dictionary containing a list of "tile_y_top" coordinates,
-        a list of "tile_y_bottom" coordinates
-        and a "slice_collection" containing a ogr geometry collection
+    polygons : list
+        a list with the rings of each polygon as returned by get_polygon_rings
+    tile_x_left : int
+        the x coordinate of the first column of tiles
+    tile_y_top : int
+        the y coordinate of the first row of tiles
+    columns : int
+        the number of columns of tiles
+    rows : int
+        the number of rows of tiles
     zoom : int
         the tile map service zoom level
-    width_threshold :  int
-        the number of vertical tiles for a group,
-        this defines how "long" groups are.
 
     Returns
     -------
-    raw_groups : dict
-        a dictionary containing "xMin", "xMax", "yMin", "yMax"
-        and a "group_polygon" as ogr.Geometry(ogr.wkbPolygon)
-        and the "group_id" as key
+    run_rows : np.ndarray
+        the row of each run of occupied tiles
+    first_columns : np.ndarray
+        the first column of each run
+    last_columns : np.ndarray
+        the last column of each run, runs can overlap
     """
 
-    # create an empty dict for the group ids
-    # and TileY_min, TileY_may, TileX_min, TileX_max
-    raw_groups = {}
-    group_id = 100
-
-    # add these variables to test, if groups are created correctly
-    TileY_top = -1
-
-    geomcol = slice_infos["slice_collection"]
-
-    # process each polygon individually
-    for p in range(0, geomcol.GetGeometryCount()):
-        horizontal_slice = geomcol.GetGeometryRef(p)
-
-        # sometimes we get really really small polygones, skip these
-        if horizontal_slice.GetArea() < 0.0000001:
-            continue
-
-        extent = horizontal_slice.GetEnvelope()
-        xmin = extent[0]
-        xmax = extent[1]
-        ymin = extent[2]
-        ymax = extent[3]
-
-        # get upper left left tile coordinates
-        pixel = t.lat_long_zoom_to_pixel_coords(ymax, xmin, zoom)
-        tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
-        TileX_left = tile.x
-
-        # get lower right tile coordinates
-        pixel = t.lat_long_zoom_to_pixel_coords(ymin, xmax, zoom)
-        tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
-        TileX_right = tile.x
-
-        # we don't compute tile y top and tile y botton coordinates again,
-        # but get the ones from the list
-        # doing so we can avoid problems due to rounding errors
-        # which result in wrong tile coordinates
-        TileY_top = slice_infos["tile_y_top"][p]
-        TileY_bottom = slice_infos["tile_y_bottom"][p]
-
-        TileWidth = abs(TileX_right - TileX_left)
-        TileX = TileX_left
-
-        # get columns
-        cols = int(math.ceil(TileWidth / width_threshold))
-        # avoid zero division error and check if cols is smaller than zero
-        if cols < 1:
-            continue
-
-        # how wide should the group be, calculate from total width
-        # and do equally for all slices
-        step_size = math.ceil(TileWidth / cols)
-
-        # the step_size should be always and even number
-        # this will make sure that there will be always 6 tasks per screen
-        if step_size % 2 == 1:
-            step_size += 1
+    runs = [(np.zeros(0, dtype=np.int64),) * 3]
+    if not polygons:
+        return runs[0]
 
-        for i in range(0, cols):
-            # we need to make sure that geometries are not clipped at the edge
-            if i == (cols - 1):
-                step_size = TileX_right - TileX + 1
-                if step_size % 2 == 1:
-                    step_size += 1
-
-            # Calculate lat, lon of upper left corner of tile
-            PixelX = TileX * 256
-            PixelY = TileY_top * 256
-            lon_left, lat_top = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
-            # logging.info('lon_left: %s, lat_top: %s' % (lon_left, lat_top))
-
-            PixelX = (TileX + step_size) * 256
-            PixelY = TileY_bottom * 256
-            lon_right, lat_bottom = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
-
-            # TODO line 254-262 does exactly the same as in line 345-352,
-            #  maybe put it in a function create_geom_from_group_coords
-            # Create Geometry
-            ring = ogr.Geometry(ogr.wkbLinearRing)
-            ring.AddPoint(lon_left, lat_top)
-            ring.AddPoint(lon_right, lat_top)
-            ring.AddPoint(lon_right, lat_bottom)
-            ring.AddPoint(lon_left, lat_bottom)
-            ring.AddPoint(lon_left, lat_top)
-            group_poly = ogr.Geometry(ogr.wkbPolygon)
-            group_poly.AddGeometry(ring)
-
-            # add info to groups_dict
-            group_id += 1
-            group_id_string = f"g{group_id}"
-            raw_groups[group_id_string] = {
-                "xMin": TileX,
-                "xMax": TileX + step_size - 1,
-                "yMin": TileY_top,
-                "yMax": TileY_bottom - 1,
-                "group_polygon": group_poly,
-            }
-
-            TileX = TileX + step_size
-
-    logger.info("created vertical_slice")
-    return raw_groups
-
-
-def groups_intersect(group_a: Dict, group_b: Dict):
-    """Check if groups intersect."""
-    x_max = int(group_a["xMax"])
-    x_min = int(group_a["xMin"])
-    y_max = int(group_a["yMax"])
-    y_min = int(group_a["yMin"])
-
-    x_maxB = int(group_b["xMax"])
-    x_minB = int(group_b["xMin"])
-    y_maxB = int(group_b["yMax"])
-    y_minB = int(group_b["yMin"])
-
-    return (
-        (x_min <= x_maxB)
-        and (x_minB <= x_max)
-        and (y_min <= y_maxB)
-        and (y_minB <= y_max)
+    # all edges of all rings with the index of their polygon
+    edges = np.concatenate(
+        [np.hstack([ring[:-1], ring[1:]]) for rings in polygons for ring in rings]
     )
+    polygon_index = np.repeat(
+        np.arange(len(polygons)),
+        [sum(len(ring) - 1 for ring in rings) for rings in polygons],
+    )
+    lon_0, lat_0, lon_1, lat_1 = edges.T
 
+    # latitude of the upper edge of each row, ascending when negated
+    row_lats = vt.tile_latitudes(np.arange(tile_y_top, tile_y_top + rows + 1), zoom)
+    negated_row_lats = -row_lats
 
-def merge_groups(group_a: Dict, group_b: Dict, zoom: int):
-    """Merge two overlapping groups into a single group.
-
-    This can result in groups that are "longer" than
-    the groups set in the first place and they can be
-    longer than the initial groupSize defined by the project
-    manager.
-    """
-
-    x_max = int(group_a["xMax"])
-    x_min = int(group_a["xMin"])
-    y_max = int(group_a["yMax"])
-    y_min = int(group_a["yMin"])
+    # each edge is clipped to all rows it crosses
+    lat_high = np.maximum(lat_0, lat_1)
+    lat_low = np.minimum(lat_0, lat_1)
+    first_row = np.maximum(
+        np.searchsorted(negated_row_lats, -lat_high, side="right") - 1, 0
+    )
+    last_row = np.minimum(
+        np.searchsorted(negated_row_lats, -lat_low, side="left") - 1, rows - 1
+    )
+    row_count = np.maximum(last_row - first_row + 1, 0)
+    edge = np.repeat(np.arange(len(edges)), row_count)
+    row = np.arange(len(edge)) - np.repeat(np.cumsum(row_count) - row_count, row_count)
+    row += first_row[edge]
+
+    lat_span = lat_1[edge] - lat_0[edge]
+    horizontal = lat_span == 0
+    lat_span[horizontal] = 1
+    slope = (lon_1[edge] - lon_0[edge]) / lat_span
+
+    def lon_at(lat: np.ndarray) -> np.ndarray:
+        return lon_0[edge] + (lat - lat_0[edge]) * slope
+
+    lat_top = np.minimum(lat_high[edge], row_lats[row])
+    lat_bottom = np.maximum(lat_low[edge], row_lats[row + 1])
+    lon_top = np.where(horizontal, lon_0[edge], lon_at(lat_top))
+    lon_bottom = np.where(horizontal, lon_1[edge], lon_at(lat_bottom))
+
+    def column_of(lon: np.ndarray) -> np.ndarray:
+        return (lon + 180) / 360 * math.pow(2, zoom) - tile_x_left
+
+    def add_runs(run_rows, first_columns, last_columns):
+        first_columns = np.clip(first_columns, 0, columns)
+        last_columns = np.clip(last_columns, -1, columns - 1)
+        valid = first_columns <= last_columns
+        runs.append((run_rows[valid], first_columns[valid], last_columns[valid]))
+
+    # mark all tiles an edge passes through,
+    # but not the tiles it only touches at their left edge
+    add_runs(
+        row,
+        np.floor(column_of(np.minimum(lon_top, lon_bottom))).astype(np.int64),
+        np.ceil(column_of(np.maximum(lon_top, lon_bottom))).astype(np.int64) - 1,
+    )
 
-    x_maxB = int(group_b["xMax"])
-    x_minB = int(group_b["xMin"])
+    # fill the tiles between the edges of each polygon using the even-odd rule
+    row_middle = (row_lats[row] + row_lats[row + 1]) / 2
+    crosses = (lat_0[edge] > row_middle) != (lat_1[edge] > row_middle)
+    crossing_row = row[crosses]
+    crossing_column = column_of(lon_at(row_middle)[crosses])
+    order = np.lexsort((crossing_column, crossing_row, polygon_index[edge[crosses]]))
+    crossing_row = crossing_row[order]
+    crossing_column = crossing_column[order]
+    add_runs(
+        crossing_row[0::2],
+        np.ceil(crossing_column[0::2] - 0.5).astype(np.int64),
+        np.floor(crossing_column[1::2] - 0.5).astype(np.int64),
+    )
 
-    # if two groups overlap, merge into one group
-    new_x_min = min([x_min, x_minB])
-    new_x_max = max([x_max, x_maxB])
+    run_rows, first_columns, last_columns = (np.concatenate(r) for r in zip(*runs))
+    return run_rows, first_columns, last_columns
 
-    # check if group_x_size is even and adjust new_x_max
-    if (new_x_max - new_x_min + 1) % 2 == 1:
-        new_x_max += 1
 
-    # Calculate lat, lon of upper left corner of tile
-    PixelX = int(new_x_min) * 256
-    PixelY = (int(y_max) + 1) * 256
-    lon_left, lat_top = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
-    # logging.info('lon_left: %s, lat_top: %s' % (lon_left, lat_top))
+def create_group_polygon(x_min: int, x_max: int, y_min: int, y_max: int, zoom: int):
+    """Create the polygon of a group from its tile coordinates."""
 
-    # Calculate lat, lon of bottom right corner of tile
-    PixelX = (int(new_x_max) + 1) * 256
-    PixelY = int(y_min) * 256
-    lon_right, lat_bottom = t.pixel_coords_zoom_to_lat_lon(PixelX, PixelY, zoom)
+    lon_left, lon_right = vt.tile_longitudes([x_min, x_max + 1], zoom).tolist()
+    lat_top, lat_bottom = vt.tile_latitudes([y_min, y_max + 1], zoom).tolist()
 
-    # Create Geometry
     ring = ogr.Geometry(ogr.wkbLinearRing)
     ring.AddPoint(lon_left, lat_top)
     ring.AddPoint(lon_right, lat_top)
@@ -353,56 +234,121 @@ def merge_groups(group_a: Dict, group_b: Dict, zoom: int):
     ring.AddPoint(lon_left, lat_top)
     poly = ogr.Geometry(ogr.wkbPolygon)
     poly.AddGeometry(ring)
+    return poly
 
-    new_group = {
-        "xMin": new_x_min,
-        "xMax": new_x_max,
-        "yMin": y_min,
-        "yMax": y_max,
-        "group_polygon": poly,
-    }
 
-    return new_group
+def get_grid_groups(
+    extent: List, polygons: List[List[np.ndarray]], zoom: int, width_threshold: int
+) -> List[Dict]:
+    """
+    The function creates groups from the runs of tiles of the polygons.
+    The tiles are combined in stripes with a height of 3 tiles and in
+    columns of 2 tiles, which start at an even tile x coordinate.
+    Each run of occupied columns in a stripe is split into groups,
+    which are at most about as wide as the width threshold.
+    Groups of different runs or stripes can not overlap.
 
+    Parameters
+    ----------
+    extent : list
+        the extent of the layer as [x_min, x_max, y_min, y_max]
+    polygons : list
+        a list with the rings of each polygon as returned by get_polygon_rings
+    zoom : int
+        the tile map service zoom level
+    width_threshold :  int
+        the number of vertical tiles for a group,
+        this defines how "long" groups are.
 
-def adjust_overlapping_groups(groups: Dict, zoom: int):
-    """Loop through groups dict and merge overlapping groups."""
+    Returns
+    -------
+    groups : list
+        a list of dictionaries containing "xMin", "xMax", "yMin", "yMax"
+        ordered by "yMin" and "xMin"
+    """
 
-    groups_without_overlap = {}
-    overlaps_total = 0
+    xmin = extent[0]
+    xmax = extent[1]
+    ymin = extent[2]
+    ymax = extent[3]
 
-    for group_id in list(groups.keys()):
+    # get upper left left tile coordinates
+    pixel = t.lat_long_zoom_to_pixel_coords(ymax, xmin, zoom)
+    tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
+    TileX_left = tile.x - tile.x % 2
+    TileY_top = tile.y
 
-        # skip if groups has been removed already
-        if group_id not in groups.keys():
-            continue
+    # get lower right tile coordinates
+    pixel = t.lat_long_zoom_to_pixel_coords(ymin, xmax, zoom)
+    tile = t.pixel_coords_to_tile_address(pixel.x, pixel.y)
+    TileX_right = tile.x
+    TileY_bottom = tile.y
 
-        overlap_count = 0
-        for group_id_b in list(groups.keys()):
-            # skip if it is the same group
-            if group_id_b == group_id:
-                continue
+    # get stripes of 3 tiles and columns of 2 tiles
+    stripes = int(math.ceil(abs(TileY_top - TileY_bottom) / 3)) + 1
+    columns = int(math.ceil((TileX_right - TileX_left + 1) / 2))
 
-            if groups_intersect(groups[group_id], groups[group_id_b]):
-                overlap_count += 1
-                new_group = merge_groups(groups[group_id], groups[group_id_b], zoom)
-                del groups[group_id_b]
-                groups_without_overlap[group_id] = new_group
+    run_rows, first_columns, last_columns = get_tile_runs(
+        polygons, TileX_left, TileY_top, 2 * columns, 3 * stripes, zoom
+    )
 
-        if overlap_count == 0:
-            groups_without_overlap[group_id] = groups[group_id]
+    # runs of tiles are widened to stripes and columns
+    stripe = run_rows // 3
+    first = first_columns // 2
+    last = last_columns // 2
+    order = np.lexsort((first, stripe))
+    stripe, first, last = stripe[order], first[order], last[order]
+
+    # merge runs of columns which overlap or touch in a stripe,
+    # the stripe is part of the keys to merge runs of all stripes at once
+    width = columns + 2
+    first_key = stripe * width + first
+    last_key = np.maximum.accumulate(stripe * width + last)
+    new_run = np.ones(len(first_key), dtype=bool)
+    new_run[1:] = first_key[1:] > last_key[:-1] + 1
+    ends_run = np.ones(len(first_key), dtype=bool)
+    ends_run[:-1] = new_run[1:]
+    run_first = np.nonzero(new_run)[0]
+    run_last = np.nonzero(ends_run)[0]
+    run_stripes = stripe[run_first]
+    run_starts = first[run_first]
+    run_ends = last_key[run_last] - run_stripes * width + 1
+
+    groups = []
+    for stripe, start, end in zip(
+        run_stripes.tolist(), run_starts.tolist(), run_ends.tolist()
+    ):
+        TileX = TileX_left + 2 * start
+        TileWidth = 2 * (end - start)
 
-        del groups[group_id]
-        overlaps_total += overlap_count
+        # how wide should the group be, calculate from total width
+        # and do equally for all groups of the run
+        cols = int(math.ceil(TileWidth / width_threshold))
+        step_size = math.ceil(TileWidth / cols)
 
-    logger.info(f"overlaps_total: {overlaps_total}")
-    return groups_without_overlap, overlaps_total
+        # the step_size should be always and even number
+        # this will make sure that there will be always 6 tasks per screen
+        if step_size % 2 == 1:
+            step_size += 1
+
+        for x_min in range(TileX, TileX + TileWidth, step_size):
+            groups.append(
+                {
+                    "xMin": x_min,
+                    "xMax": min(x_min + step_size, TileX + TileWidth) - 1,
+                    "yMin": TileY_top + 3 * stripe,
+                    "yMax": TileY_top + 3 * stripe + 2,
+                }
+            )
+
+    logger.info(f"created {len(groups)} groups from tile grid")
+    return groups
 
 
 def extent_to_groups(infile, zoom: int, groupSize):
     """
-    The function to polygon geometries of a given input file
-    into horizontal slices and then vertical slices.
+    The function to rasterize the polygon geometries of a given input file
+    to tiles and to group these tiles in stripes and columns.
 
     Parameters
     ----------
@@ -414,33 +360,22 @@ def extent_to_groups(infile, zoom: int, groupSize):
 
     Returns
     -------
-    raw_groups_dict : dict
+    groups_dict : dict
         a dictionary containing "xMin", "xMax", "yMin", "yMax"
         and a "group_polygon" as ogr.Geometry(ogr.wkbPolygon)
         and the "group_id" as key
     """
     extent, geomcol = get_geometry_from_file(infile)
 
-    # get horizontal slices --> rows
-    horizontal_slice_infos = get_horizontal_slice(extent, geomcol, zoom)
-
-    # then get vertical slices --> columns
-    raw_groups_dict = get_vertical_slice(horizontal_slice_infos, zoom, groupSize)
+    polygons = get_polygon_rings(geomcol)
+    groups = get_grid_groups(extent, polygons, zoom, groupSize)
 
-    # finally remove overlapping groups
-    groups_dict, overlaps_total = adjust_overlapping_groups(raw_groups_dict, zoom)
-
-    # check if there are still overlaps
-    c = 0
-    while overlaps_total > 0:
-        c += 1
-        # avoid that this runs forever
-        if c == 5:
-            break
-
-        groups_dict, overlaps_total = adjust_overlapping_groups(
-            groups_dict.copy(), zoom
+    groups_dict = {}
+    for group_id, group in enumerate(groups, start=101):
+        group["group_polygon"] = create_group_polygon(
+            group["xMin"], group["xMax"], group["yMin"], group["yMax"], zoom
         )
+        groups_dict[f"g{group_id}"] = group
 
     return groups_dict
 
@@ -493,25 +428,3 @@ def vertical_groups_as_geojson(raw_group_infos: Dict, outfile: str):
     logger.info("created all %s." % outfile)
 
     return True
-
-
-def horizontal_groups_as_geojson(slices_info: Dict, outfile: str):
-
-    # Create the output Driver and out GeoJson
-    outDriver = ogr.GetDriverByName("GeoJSON")
-    # Create the output GeoJSON
-    outDataSource = outDriver.CreateDataSource(outfile)
-    outLayer = outDataSource.CreateLayer(outfile, geom_type=ogr.wkbPolygon)
-    slices_geom = slices_info["slice_collection"]
-
-    for group in slices_geom:
-        featureDefn = outLayer.GetLayerDefn()
-        outFeature = ogr.Feature(featureDefn)
-        outFeature.SetGeometry(group)
-        outLayer.CreateFeature(outFeature)
-        outFeature = None
-
-    outDataSource = None
-    logger.info("created all %s." % outfile)
-
-    return True
@@ -0,0 +1,312 @@
+"""Tile functions which operate on NumPy arrays of tile coordinates.
+
+The results are identical to the scalar functions in tile_functions,
+including the WKT geometries which are created without OGR.
+"""
+
+import math
+import struct
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from mapswipe_workers.utils import tile_functions
+
+INT_MIN = -(2**31)
+INT_MAX = 2**31 - 1
+
+
+def tile_longitudes(tile_x: np.ndarray, zoom: int) -> np.ndarray:
+    """Compute the longitude of the left edge of tiles."""
+    map_size = 256 * math.pow(2, zoom)
+    pixel_x = np.asarray(tile_x, dtype=np.int64) * 256
+    return 360 * ((pixel_x / map_size) - 0.5)
+
+
+def tile_latitudes(tile_y: np.ndarray, zoom: int) -> np.ndarray:
+    """Compute the latitude of the upper edge of tiles.
+
+    The exp and atan functions of NumPy can differ in the last bit
+    from those of the math module. To get the same coordinates as
+    tile_functions the latitude is computed with the math module.
+    """
+    tile_y = np.asarray(tile_y, dtype=np.int64)
+    return np.fromiter(
+        (
+            tile_functions.pixel_coords_zoom_to_lat_lon(0, y * 256, zoom)[1]
+            for y in tile_y.tolist()
+        ),
+        dtype=np.float64,
+        count=len(tile_y),
+    )
+
+
+def tile_quadkeys(tile_x: np.ndarray, tile_y: np.ndarray, zoom: int) -> np.ndarray:
+    """Create quadkeys of tiles by interleaving the bits of x and y."""
+    tile_x = np.asarray(tile_x, dtype=np.int64)
+    tile_y = np.asarray(tile_y, dtype=np.int64)
+    if zoom == 0:
+        return np.full(len(tile_x), "", dtype="U1")
+
+    shifts = np.arange(zoom - 1, -1, -1, dtype=np.int64)
+    digits = ((tile_x[:, None] >> shifts) & 1) + 2 * ((tile_y[:, None] >> shifts) & 1)
+    characters = (digits + ord("0")).astype(np.uint8)
+    return characters.view(f"S{zoom}").ravel().astype(f"U{zoom}")
+
+
+def quadkeys_to_tile_coords(
+    quadkeys: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get x, y and zoom of tiles from their quadkeys.
+
+    Quadkeys can have different lengths, which is the zoom level of a tile.
+    """
+    quadkeys = np.asarray(quadkeys, dtype=np.bytes_)
+    zoom = np.char.str_len(quadkeys).astype(np.int64)
+    max_zoom = int(zoom.max(initial=0))
+    tile_x = np.zeros(len(quadkeys), dtype=np.int64)
+    tile_y = np.zeros(len(quadkeys), dtype=np.int64)
+    if max_zoom == 0:
+        return tile_x, tile_y, zoom
+
+    characters = quadkeys.astype(f"S{max_zoom}").view(np.uint8)
+    digits = characters.reshape(len(quadkeys), max_zoom).astype(np.int64) - ord("0")
+    if ((digits < 0) | (digits > 3))[np.arange(max_zoom) < zoom[:, None]].any():
+        raise ValueError("Quadkeys can only contain the digits 0, 1, 2 and 3.")
+    # Shorter quadkeys are padded with zero bytes, which give negative digits.
+    digits[digits < 0] = 0
+    shifts = np.clip(zoom[:, None] - 1 - np.arange(max_zoom), 0, None)
+    tile_x = np.bitwise_or.reduce((digits & 1) << shifts, axis=1)
+    tile_y = np.bitwise_or.reduce((digits >> 1) << shifts, axis=1)
+    return tile_x, tile_y, zoom
+
+
+def lat_long_zoom_to_pixel_coords(
+    lat: np.ndarray, lon: np.ndarray, zoom: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute pixel coordinates from lat-long points at a given zoom level.
+
+    The trigonometric functions of NumPy can differ in the last bit from
+    those of the math module. Points within this rounding error of a pixel
+    edge might get another pixel than with tile_functions.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    sin_lat = np.sin(lat * math.pi / 180.0)
+    x = ((lon + 180) / 360) * 256 * math.pow(2, zoom)
+    y = (
+        (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi))
+        * 256  # noqa: W503
+        * math.pow(2, zoom)  # noqa: W503
+    )
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+
+
+def pixel_coords_zoom_to_lat_lon(
+    pixel_x: np.ndarray, pixel_y: np.ndarray, zoom: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute longitude, latitude from pixel coordinates at a given zoom level.
+
+    The longitude is identical to tile_functions. The latitude can differ
+    in the last bit. Use tile_latitudes to get identical latitudes of tiles.
+    """
+    map_size = 256 * math.pow(2, zoom)
+    x = (np.asarray(pixel_x) / map_size) - 0.5
+    y = 0.5 - (np.asarray(pixel_y) / map_size)
+    lon = 360 * x
+    lat = 90 - 360 * np.arctan(np.exp(-y * 2 * math.pi)) / math.pi
+    return lon, lat
+
+
+def pixel_coords_to_tile_address(
+    pixel_x: np.ndarray, pixel_y: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute tile addresses from pixel coordinates of points within tiles."""
+    return (
+        np.floor_divide(np.asarray(pixel_x), 256).astype(np.int64),
+        np.floor_divide(np.asarray(pixel_y), 256).astype(np.int64),
+    )
+
+
+def tile_urls(
+    tile_x: np.ndarray, tile_y: np.ndarray, zoom: int, tile_server: dict
+) -> List[str]:
+    """Create URLs of tiles for a tile server.
+
+    See tile_functions.tile_coords_zoom_and_tileserver_to_url.
+    """
+    if tile_server["name"] == "bing":
+        return [
+            tile_functions.quadKey_to_Bing_URL(quadkey, tile_server["apiKey"])
+            for quadkey in tile_quadkeys(tile_x, tile_y, zoom).tolist()
+        ]
+    return [
+        tile_functions.tile_coords_zoom_and_tileserver_to_url(x, y, zoom, tile_server)
+        for x, y in zip(np.asarray(tile_x).tolist(), np.asarray(tile_y).tolist())
+    ]
+
+
+def intelliround(value: str) -> str:
+    """Trim digits which are likely round off errors like OGR does."""
+    length = len(value)
+    if length <= 10:
+        return value
+    dot_position = value.find(".")
+    if dot_position == -1 or "e" in value or "E" in value:
+        return value
+
+    count_before_dot = dot_position - 1
+    if value[0] == "-":
+        count_before_dot -= 1
+
+    def trailing(character: str, digits: int) -> bool:
+        return dot_position < length - digits and all(
+            count_before_dot >= minimum or value[length - i] == character
+            for i, minimum in zip(range(3, 8), range(4, 9))
+        )
+
+    if value[length - 6 : length - 1] == "00000":  # noqa: E203
+        return value[:-1]
+    if trailing("0", 8) and value[length - 9 : length - 7] == "00":  # noqa: E203
+        return value[:-8]
+    if value[length - 6 : length - 1] == "99999":  # noqa: E203
+        return round_up(value[: length - 6])
+    if trailing("9", 9) and value[length - 9 : length - 7] == "99":  # noqa: E203
+        return round_up(value[: length - 9])
+    return value
+
+
+def round_up(value: str) -> str:
+    """Add one to the last digit of a decimal number."""
+    characters = list(value)
+    i = len(characters) - 1
+    while i >= 0 and characters[i] in "9.":
+        if characters[i] == "9":
+            characters[i] = "0"
+        i -= 1
+    if i >= 0 and characters[i] != "-":
+        characters[i] = chr(ord(characters[i]) + 1)
+    else:
+        characters.insert(i + 1, "1")
+    return "".join(characters)
+
+
+def format_wkt_number(value: float) -> str:
+    """Format a coordinate like OGR does when exporting a geometry as WKT."""
+    if abs(value) < 1:
+        text = intelliround(f"{value:.15f}").rstrip("0")
+        if text.endswith("."):
+            text += "0"
+    else:
+        text = f"{value:.15G}"
+    if text.isdigit():
+        text += ".0"
+    return text
+
+
+def is_int(value: float) -> bool:
+    return INT_MIN <= value <= INT_MAX and value == int(value)
+
+
+def wkt_polygon_formatter(
+    longitudes: np.ndarray, latitudes: np.ndarray
+) -> Callable[[float, float, float, float], str]:
+    """Create a function which formats rectangles as WKT polygons.
+
+    Each of the given longitudes and latitudes is formatted only once.
+    The corners of the rectangles need to be among these values.
+    """
+    longitudes = longitudes.tolist()
+    latitudes = latitudes.tolist()
+    lons = {lon: format_wkt_number(lon) for lon in longitudes}
+    lats = {lat: format_wkt_number(lat) for lat in latitudes}
+    # OGR formats both values as integer if both are integers.
+    integer_pairs = {
+        (lon, lat): f"{int(lon)} {int(lat)}"
+        for lon in longitudes
+        if is_int(lon)
+        for lat in latitudes
+        if is_int(lat)
+    }
+
+    def coordinate(lon: float, lat: float) -> str:
+        pair = integer_pairs.get((lon, lat))
+        if pair is None:
+            return f"{lons[lon]} {lats[lat]} 0"
+        return f"{pair} 0"
+
+    def polygon(lon_left: float, lat_top: float, lon_right: float, lat_bottom: float):
+        top_left = coordinate(lon_left, lat_top)
+        return (
+            f"POLYGON (({top_left},"
+            f"{coordinate(lon_right, lat_top)},"
+            f"{coordinate(lon_right, lat_bottom)},"
+            f"{coordinate(lon_left, lat_bottom)},"
+            f"{top_left}))"
+        )
+
+    return polygon
+
+
+def geometries_from_tile_coords(
+    tile_x: np.ndarray, tile_y: np.ndarray, zoom: int
+) -> List[str]:
+    """Create WKT polygons for tiles in any order.
+
+    The WKT is identical to tile_functions.geometry_from_tile_coords.
+    """
+    tile_x = np.asarray(tile_x, dtype=np.int64)
+    tile_y = np.asarray(tile_y, dtype=np.int64)
+    edges_x = np.unique(np.concatenate([tile_x, tile_x + 1]))
+    edges_y = np.unique(np.concatenate([tile_y, tile_y + 1]))
+    longitudes = tile_longitudes(edges_x, zoom)
+    latitudes = tile_latitudes(edges_y, zoom)
+    polygon = wkt_polygon_formatter(longitudes, latitudes)
+    lon_of = dict(zip(edges_x.tolist(), longitudes.tolist()))
+    lat_of = dict(zip(edges_y.tolist(), latitudes.tolist()))
+    return [
+        polygon(lon_of[x], lat_of[y], lon_of[x + 1], lat_of[y + 1])
+        for x, y in zip(tile_x.tolist(), tile_y.tolist())
+    ]
+
+
+# Little endian WKB header of a polygon with one ring of five points.
+WKB_POLYGON_HEADER = struct.pack("<BIII", 1, 3, 1, 5)
+
+
+def wkb_polygons_from_tile_coords(
+    tile_x: np.ndarray, tile_y: np.ndarray, zoom: int
+) -> List[bytes]:
+    """Create WKB polygons for tiles in any order without OGR.
+
+    The rings have the same points as the WKT of geometries_from_tile_coords,
+    but the coordinates are not rounded by formatting them as text.
+    """
+    tile_x = np.asarray(tile_x, dtype=np.int64)
+    tile_y = np.asarray(tile_y, dtype=np.int64)
+    edges_x, index_x = np.unique(
+        np.concatenate([tile_x, tile_x + 1]), return_inverse=True
+    )
+    edges_y, index_y = np.unique(
+        np.concatenate([tile_y, tile_y + 1]), return_inverse=True
+    )
+    longitudes = tile_longitudes(edges_x, zoom)[index_x.ravel()].reshape(2, -1)
+    latitudes = tile_latitudes(edges_y, zoom)[index_y.ravel()].reshape(2, -1)
+    lon_left, lon_right = longitudes
+    lat_top, lat_bottom = latitudes
+    points = np.empty((len(tile_x), 5, 2), dtype="<f8")
+    points[:, :, 0] = np.stack([lon_left, lon_right, lon_right, lon_left, lon_left], 1)
+    points[:, :, 1] = np.stack([lat_top, lat_top, lat_bottom, lat_bottom, lat_top], 1)
+    return [WKB_POLYGON_HEADER + ring.tobytes() for ring in points]
+
+
+def tiles_of_extent(
+    x_min: int, x_max: int, y_min: int, y_max: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get x and y of all tiles of an extent ordered by x and then by y."""
+    tile_x, tile_y = np.meshgrid(
+        np.arange(x_min, x_max + 1, dtype=np.int64),
+        np.arange(y_min, y_max + 1, dtype=np.int64),
+        indexing="ij",
+    )
+    return tile_x.ravel(), tile_y.ravel()
@@ -2,7 +2,11 @@ import os
 import tempfile
 import unittest
 
-from mapswipe_workers.generate_stats.project_stats import get_results
+from mapswipe_workers.generate_stats.project_stats import (
+    get_latest_mapping_session_id,
+    get_results,
+    get_results_of_groups,
+)
 from tests.integration import base, set_up, tear_down
 
 
@@ -29,15 +33,18 @@ class TestGetResults(base.BaseTestCase):
             ),
             ("tasks", None),
             ("users", None),
-            ("mapping_sessions", [
-                "project_id",
-                "group_id",
-                "user_id",
-                "mapping_session_id",
-                "start_time",
-                "end_time",
-                "items_count",
-            ]),
+            (
+                "mapping_sessions",
+                [
+                    "project_id",
+                    "group_id",
+                    "user_id",
+                    "mapping_session_id",
+                    "start_time",
+                    "end_time",
+                    "items_count",
+                ],
+            ),
             ("mapping_sessions_results", None),
         ]:
             set_up.set_postgres_test_data(
@@ -76,6 +83,37 @@ class TestGetResults(base.BaseTestCase):
             ],
         )
 
+    def test_get_results_of_mapping_session_range(self):
+        self.assertEqual(get_latest_mapping_session_id(self.project_id), 3601759)
+
+        df = get_results(
+            self.results_filename,
+            self.project_id,
+            after_mapping_session_id=3601718,
+            until_mapping_session_id=3601734,
+        )
+        # mapping sessions 3601728, 3601731 and 3601734
+        self.assertEqual(len(df), 42 + 354 + 258)
+        self.assertEqual(set(df["group_id"]), {"g106", "g105", "g102"})
+
+        self.assertIsNone(
+            get_results(
+                self.results_filename,
+                self.project_id,
+                after_mapping_session_id=3601759,
+            )
+        )
+
+    def test_get_results_of_groups(self):
+        df = get_results_of_groups(
+            self.project_id, ["g101", "g102"], until_mapping_session_id=3117247
+        )
+        # mapping sessions 118511, 627233, 2663748 and 3117247
+        self.assertEqual(len(df), 4 * 258)
+        self.assertListEqual(
+            list(df.columns), ["project_id", "group_id", "user_id", "task_id", "result"]
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import psycopg2
+
+from mapswipe_workers import auth
+
+
+class TestPostgresConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = auth.PostgresConnectionPool(min_size=1, max_size=2, timeout=0.1)
+        self.pool.fill()
+
+    def tearDown(self):
+        self.pool.closeall()
+
+    def test_reuse_connection(self):
+        connection = self.pool.getconn()
+        self.pool.putconn(connection)
+        self.assertIs(self.pool.getconn(), connection)
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["connections_created"], 1)
+
+    def test_max_size(self):
+        self.pool.getconn()
+        self.pool.getconn()
+        with self.assertRaises(psycopg2.pool.PoolError):
+            self.pool.getconn()
+        self.assertEqual(self.pool.stats()["size"], 2)
+
+    def test_replace_broken_connection(self):
+        connection = self.pool.getconn()
+        self.pool.putconn(connection)
+        connection.close()
+
+        new_connection = self.pool.getconn()
+        self.assertIsNot(new_connection, connection)
+        self.assertFalse(new_connection.closed)
+        self.assertEqual(self.pool.stats()["connections_discarded"], 1)
+
+    def test_rollback_on_return(self):
+        connection = self.pool.getconn()
+        connection.cursor().execute("SELECT 1")
+        self.pool.putconn(connection)
+        self.assertEqual(
+            connection.get_transaction_status(),
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
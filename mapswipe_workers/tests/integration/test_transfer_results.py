@@ -79,6 +79,35 @@ class TestTransferResultsProject(BaseTestCase):
 
         self.verify_mapping_results_in_postgres()
 
+    def test_changes_in_pages(self):
+        """Test if results of all pages are transferred and deleted in Firebase."""
+        fb_db = auth.firebaseDB()
+
+        # Add results for a second group to get more than one page.
+        test_dir = os.path.dirname(__file__)
+        fixture_name = "build_area_additional_results_different_group.json"
+        file_path = os.path.join(
+            test_dir, "fixtures", "tile_map_service_grid", "results", fixture_name
+        )
+        with open(file_path) as test_file:
+            new_results = json.load(test_file)
+        fb_db.reference(f"v2/results/{self.project_id}/g120").set(new_results)
+
+        transfer_results(project_id_list=[self.project_id], page_size=1)
+
+        ref = fb_db.reference("v2/results/{0}".format(self.project_id))
+        self.assertIsNone(ref.get())
+
+        pg_db = auth.postgresDB()
+        sql_query = (
+            f"SELECT group_id "
+            f"FROM mapping_sessions "
+            f"WHERE project_id = '{self.project_id}' "
+            f"ORDER BY group_id"
+        )
+        result = pg_db.retr_query(sql_query)
+        self.assertEqual(result, [("g115",), ("g120",)])
+
     def test_user_not_in_postgres(self):
         """Test if results are transfered for users which are not yet in Postgres."""
         pg_db = auth.postgresDB()
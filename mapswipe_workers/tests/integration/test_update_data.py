@@ -2,7 +2,9 @@ import os
 import tempfile
 import unittest
 
+from mapswipe_workers import auth
 from mapswipe_workers.firebase_to_postgres.update_data import (
+    backfill_progress,
     get_contributor_count_from_postgres,
     get_project_progress,
 )
@@ -32,6 +34,31 @@ class TestUpdateData(base.BaseTestCase):
         progress = get_project_progress(self.project_id)
         self.assertEqual(progress, round(100 / 60))
 
+    def test_backfill_progress(self):
+        pg_db = auth.postgresDB()
+        pg_db.query("TRUNCATE groups_progress, projects_contributors")
+        self.assertEqual(get_contributor_count_from_postgres(self.project_id), 0)
+        self.assertEqual(get_project_progress(self.project_id), 0)
+
+        backfill_progress()
+        self.assertEqual(get_contributor_count_from_postgres(self.project_id), 1)
+        self.assertEqual(get_project_progress(self.project_id), round(100 / 60))
+
+    def test_progress_after_deleted_mapping_sessions(self):
+        pg_db = auth.postgresDB()
+        pg_db.query(
+            "DELETE FROM mapping_sessions_results msr "
+            "USING mapping_sessions ms "
+            "WHERE ms.mapping_session_id = msr.mapping_session_id "
+            "AND ms.project_id = %s",
+            [self.project_id],
+        )
+        pg_db.query(
+            "DELETE FROM mapping_sessions WHERE project_id = %s", [self.project_id]
+        )
+        self.assertEqual(get_contributor_count_from_postgres(self.project_id), 0)
+        self.assertEqual(get_project_progress(self.project_id), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
 import unittest
+from unittest import mock
 
+from mapswipe_workers import auth
 from mapswipe_workers.firebase_to_postgres import update_data
+from tests.integration import base, set_up, tear_down
 
 
 class TestUpdateProjectData(unittest.TestCase):
@@ -22,5 +25,64 @@ class TestUpdateProjectData(unittest.TestCase):
         # self.assertIsNotNone(result)
 
 
+class TestUpdateChangedProjectData(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project_id = set_up.create_test_project(
+            "tile_map_service_grid", "build_area"
+        )
+
+    def tearDown(self):
+        auth.firebaseDB().reference("v2/updates/projects").delete()
+        tear_down.delete_test_data(self.project_id)
+
+    def get_status_in_postgres(self):
+        pg_db = auth.postgresDB()
+        query = "SELECT status FROM projects WHERE project_id = %s"
+        return pg_db.retr_query(query, [self.project_id])[0][0]
+
+    def test_update_changed_project(self):
+        """Test if only projects in the updates queue are updated."""
+        fb_db = auth.firebaseDB()
+        fb_db.reference(f"v2/projects/{self.project_id}/status").set("finished")
+        self.assertNotEqual(self.get_status_in_postgres(), "finished")
+
+        # The queue is empty. The changed status is only found by the full poll.
+        self.assertEqual(update_data.update_changed_project_data(), [])
+        self.assertNotEqual(self.get_status_in_postgres(), "finished")
+
+        # This is done by a Firebase function when the status is written.
+        fb_db.reference(f"v2/updates/projects/{self.project_id}").set(1)
+        self.assertEqual(update_data.update_changed_project_data(), [self.project_id])
+        self.assertEqual(self.get_status_in_postgres(), "finished")
+        self.assertIsNone(fb_db.reference("v2/updates/projects").get())
+
+    def test_keep_project_changed_while_updating(self):
+        """Test if a status written during the update is updated by the next run."""
+        fb_db = auth.firebaseDB()
+        update_project_data = update_data.update_project_data
+
+        def write_status_during_update(project_ids):
+            update_project_data(project_ids)
+            fb_db.reference(f"v2/projects/{self.project_id}/status").set("finished")
+            fb_db.reference(f"v2/updates/projects/{self.project_id}").set(2)
+
+        fb_db.reference(f"v2/updates/projects/{self.project_id}").set(1)
+        with mock.patch.object(
+            update_data, "update_project_data", write_status_during_update
+        ):
+            self.assertEqual(
+                update_data.update_changed_project_data(), [self.project_id]
+            )
+        self.assertNotEqual(self.get_status_in_postgres(), "finished")
+        self.assertEqual(
+            fb_db.reference("v2/updates/projects").get(), {self.project_id: 2}
+        )
+
+        self.assertEqual(update_data.update_changed_project_data(), [self.project_id])
+        self.assertEqual(self.get_status_in_postgres(), "finished")
+        self.assertIsNone(fb_db.reference("v2/updates/projects").get())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,11 +5,15 @@ import unittest
 import pandas as pd
 
 from mapswipe_workers.generate_stats.project_stats import (
-    get_agg_results_by_task_id,
+    create_stats_state,
+    get_agg_results_from_task_counts,
+    get_custom_options,
     get_results,
     get_tasks,
 )
-from mapswipe_workers.generate_stats.user_stats import get_agg_results_by_user_id
+from mapswipe_workers.generate_stats.user_stats import (
+    get_agg_results_by_user_id_from_contributions,
+)
 from tests.integration import base, set_up, tear_down
 
 
@@ -68,15 +72,17 @@ class TestUserStats(base.BaseTestCase):
         tasks_df = get_tasks(self.tasks_filename, self.project_id)
         self.assertEqual(len(tasks_df), 67436)
 
-        agg_results_df = get_agg_results_by_task_id(
-            results_df,
-            tasks_df,
-            pd.Series(data='[{"value": 0}, {"value": 1}, {"value": 2}, {"value": 3}]'),
+        custom_options = get_custom_options(
+            pd.Series(data='[{"value": 0}, {"value": 1}, {"value": 2}, {"value": 3}]')
+        )
+        state = create_stats_state(0, results_df, custom_options)
+        agg_results_df = get_agg_results_from_task_counts(
+            state["task_counts"], tasks_df, custom_options
         )
         self.assertEqual(len(agg_results_df), 67436)
 
-        agg_results_by_user_id_df = get_agg_results_by_user_id(
-            results_df, agg_results_df
+        agg_results_by_user_id_df = get_agg_results_by_user_id_from_contributions(
+            state["contributions"], state["sessions"], state["usernames"]
         )
         self.assertEqual(len(agg_results_by_user_id_df), 477)
 
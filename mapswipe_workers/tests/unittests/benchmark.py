@@ -0,0 +1,10 @@
+import os
+import unittest
+
+# Benchmarks compare the run time to a reference implementation.
+# They are slow and their timings depend on the machine,
+# so they only run if requested, e.g.:
+# RUN_BENCHMARKS=1 python -m unittest discover --start-directory tests/unittests
+benchmark = unittest.skipUnless(
+    os.environ.get("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run benchmarks"
+)
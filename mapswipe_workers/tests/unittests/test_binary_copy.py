@@ -0,0 +1,86 @@
+import datetime
+import struct
+import unittest
+
+from mapswipe_workers.utils import binary_copy
+
+
+class TestBinaryCopy(unittest.TestCase):
+    def test_encode_rows(self):
+        f = binary_copy.encode_rows(
+            [("a", 1), (None, None)],
+            ["varchar", "int"],
+        )
+        data = f.getvalue()
+        self.assertTrue(data.startswith(binary_copy.HEADER))
+        self.assertTrue(data.endswith(binary_copy.TRAILER))
+        rows = data[len(binary_copy.HEADER) : -len(binary_copy.TRAILER)]
+        self.assertEqual(
+            rows,
+            struct.pack("!hi", 2, 1)
+            + b"a"
+            + struct.pack("!ii", 4, 1)
+            + struct.pack("!hii", 2, -1, -1),
+        )
+
+    def test_stream_rows(self):
+        rows = [(f"task-{i}", i) for i in range(2500)]
+        expected = binary_copy.encode_rows(rows, ["varchar", "int"]).getvalue()
+
+        f = binary_copy.stream_rows(iter(rows), ["varchar", "int"])
+        chunks = []
+        chunk = f.read(100)
+        while chunk:
+            chunks.append(chunk)
+            chunk = f.read(100)
+        self.assertEqual(b"".join(chunks), expected)
+
+    def test_stream_rows_is_lazy(self):
+        encoded_rows = []
+
+        def rows():
+            for i in range(10000):
+                encoded_rows.append(i)
+                yield ("a", i)
+
+        f = binary_copy.stream_rows(rows(), ["varchar", "int"])
+        self.assertEqual(f.read(len(binary_copy.HEADER)), binary_copy.HEADER)
+        self.assertLess(len(encoded_rows), 10000)
+
+    def test_encode_timestamp(self):
+        self.assertEqual(
+            binary_copy.encode_timestamp(datetime.datetime(2000, 1, 1, 0, 0, 1)),
+            struct.pack("!iq", 8, 1000000),
+        )
+        # time zone is ignored as for the text format
+        self.assertEqual(
+            binary_copy.encode_timestamp(
+                datetime.datetime(
+                    1999, 12, 31, 23, 59, 59, tzinfo=datetime.timezone.utc
+                )
+            ),
+            struct.pack("!iq", 8, -1000000),
+        )
+
+    def test_encode_varchar(self):
+        self.assertEqual(
+            binary_copy.encode_varchar("ü\t"), struct.pack("!i", 3) + "ü\t".encode()
+        )
+
+    def test_wkb_with_srid(self):
+        # POINT (1 2) as little endian WKB
+        wkb = struct.pack("<BIdd", 1, 1, 1.0, 2.0)
+        self.assertEqual(
+            binary_copy.wkb_with_srid(wkb, 4326),
+            struct.pack("<BIIdd", 1, 0x20000001, 4326, 1.0, 2.0),
+        )
+        # POINT (1 2) as big endian WKB
+        wkb = struct.pack(">BIdd", 0, 1, 1.0, 2.0)
+        self.assertEqual(
+            binary_copy.wkb_with_srid(wkb, 4326),
+            struct.pack(">BIIdd", 0, 0x20000001, 4326, 1.0, 2.0),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
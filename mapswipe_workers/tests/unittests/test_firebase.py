@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from firebase_admin import exceptions
+
+from mapswipe_workers.firebase import firebase
+from mapswipe_workers.firebase.firebase import Firebase, get_batches_of_size
+from tests.unittests.benchmark import benchmark
+
+
+class ReferenceStandIn:
+    """Record updates like a reference of the Firebase Realtime Database.
+
+    Each update takes `latency` seconds.
+    The first `overloaded_requests` updates raise an UnavailableError.
+    The highest number of updates running at the same time is recorded.
+    """
+
+    def __init__(self, latency: float = 0.0, overloaded_requests: int = 0):
+        self.latency = latency
+        self.overloaded_requests = overloaded_requests
+        self.requests = 0
+        self.running = 0
+        self.max_running = 0
+        self.batch_sizes = []
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def update(self, value: dict):
+        with self.lock:
+            self.requests += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            overloaded = self.requests <= self.overloaded_requests
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.running -= 1
+        if overloaded:
+            raise exceptions.UnavailableError("Service unavailable")
+        with self.lock:
+            self.batch_sizes.append(
+                sum(
+                    len(k) + len(json.dumps(v, separators=(",", ":")))
+                    for k, v in value.items()
+                )
+            )
+            self.data.update(value)
+
+
+def create_firebase(ref: ReferenceStandIn) -> Firebase:
+    fb_db = SimpleNamespace(reference=lambda path: ref)
+    with mock.patch.object(firebase.auth, "firebaseDB", return_value=fb_db):
+        return Firebase()
+
+
+def create_tasks(group_count: int, task_count: int) -> dict:
+    return {
+        f"g{group}": [
+            {
+                "groupId": f"g{group}",
+                "taskId": f"18-{group}-{task}",
+                "taskX": group,
+                "taskY": task,
+                "geometry": "POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))",
+                "url": f"https://example.org/{group}/{task}.png",
+            }
+            for task in range(task_count)
+        ]
+        for group in range(group_count)
+    }
+
+
+def save_tasks_to_firebase(ref, projectId, groupsOfTasks):
+    """Previous implementation with sequential updates of 150 groups each.
+
+    Used as reference for the performance of Firebase.save_tasks_to_firebase.
+    """
+    task_upload_dict = {}
+    for group_counter, group_id in enumerate(groupsOfTasks.keys()):
+        for i in range(0, len(groupsOfTasks[group_id])):
+            groupsOfTasks[group_id][i].pop("geometry", None)
+        task_upload_dict[f"v2/tasks/{projectId}/{group_id}"] = groupsOfTasks[group_id]
+        if len(task_upload_dict) % 150 == 0 or (group_counter + 1) == len(
+            groupsOfTasks
+        ):
+            ref.update(task_upload_dict)
+            task_upload_dict = {}
+
+
+@mock.patch.object(firebase, "keep_firebase_connections_alive", mock.Mock())
+class TestFirebase(unittest.TestCase):
+    def test_get_batches_of_size(self):
+        items = [(f"path/{i}", "x" * 10) for i in range(10)]
+        # each item has 6 bytes of path and 12 bytes of JSON
+        batches = list(get_batches_of_size(items, max_bytes=40))
+        self.assertEqual([len(batch) for batch, _ in batches], [2, 2, 2, 2, 2])
+        self.assertEqual([size for _, size in batches], [36] * 5)
+        self.assertEqual(
+            {k: v for batch, _ in batches for k, v in batch.items()}, dict(items)
+        )
+
+        # items larger than max_bytes are sent on their own
+        items = [("a", "x"), ("b", "x" * 100), ("c", "x")]
+        batches = list(get_batches_of_size(items, max_bytes=40))
+        self.assertEqual([list(batch) for batch, _ in batches], [["a"], ["b"], ["c"]])
+
+    def test_save_tasks_to_firebase(self):
+        ref = ReferenceStandIn()
+        fb = create_firebase(ref)
+        tasks = create_tasks(group_count=100, task_count=10)
+        fb.save_tasks_to_firebase("p1", tasks, useCompression=False)
+
+        self.assertEqual(len(ref.data), 100)
+        for group_id, group_tasks in create_tasks(100, 10).items():
+            for task in group_tasks:
+                task.pop("geometry")
+            self.assertEqual(ref.data[f"v2/tasks/p1/{group_id}"], group_tasks)
+
+    def test_update_in_batches(self):
+        ref = ReferenceStandIn()
+        fb = create_firebase(ref)
+        items = [(f"v2/tasks/p1/g{i}", ["x" * 100] * 10) for i in range(100)]
+        uploaded_bytes = fb.update_in_batches(items, max_bytes=10000)
+
+        self.assertEqual(ref.data, dict(items))
+        self.assertGreater(ref.requests, 1)
+        self.assertLessEqual(max(ref.batch_sizes), 10000)
+        self.assertEqual(sum(ref.batch_sizes), uploaded_bytes)
+
+    def test_update_in_parallel(self):
+        ref = ReferenceStandIn(latency=0.01)
+        fb = create_firebase(ref)
+        items = [(f"v2/tasks/p1/g{i}", ["x" * 100] * 10) for i in range(100)]
+        fb.update_in_batches(items, max_bytes=2000, max_workers=4)
+
+        self.assertEqual(ref.data, dict(items))
+        self.assertEqual(ref.requests, 100)
+        self.assertGreater(ref.max_running, 1)
+        self.assertLessEqual(ref.max_running, 4)
+
+    def test_retry_if_overloaded(self):
+        ref = ReferenceStandIn(overloaded_requests=2)
+        fb = create_firebase(ref)
+        with mock.patch.object(firebase.time, "sleep") as sleep:
+            fb.update_in_batches([("a", 1), ("b", 2)], max_workers=1)
+        self.assertEqual(ref.data, {"a": 1, "b": 2})
+        self.assertEqual(ref.requests, 3)
+        self.assertEqual([c.args for c in sleep.call_args_list], [(1,), (2,)])
+
+    def test_raise_if_overloaded_too_often(self):
+        ref = ReferenceStandIn(overloaded_requests=100)
+        fb = create_firebase(ref)
+        with mock.patch.object(firebase.time, "sleep"):
+            with self.assertRaises(exceptions.UnavailableError):
+                fb.update_in_batches([("a", 1)])
+        self.assertEqual(ref.requests, 3)
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare to sequential updates of 150 groups for 3000 groups."""
+        ref = ReferenceStandIn(latency=0.02)
+        start = time.perf_counter()
+        save_tasks_to_firebase(ref, "p1", create_tasks(group_count=3000, task_count=5))
+        reference_duration = time.perf_counter() - start
+        reference_requests = ref.requests
+
+        ref = ReferenceStandIn(latency=0.02)
+        fb = create_firebase(ref)
+        items = [
+            (f"v2/tasks/p1/{group_id}", tasks)
+            for group_id, tasks in create_tasks(group_count=3000, task_count=5).items()
+        ]
+        # as many batches as the sequential updates to measure only parallelism
+        max_bytes = (
+            sum(len(p) + len(json.dumps(t, separators=(",", ":"))) for p, t in items)
+            // 20
+        )
+        start = time.perf_counter()
+        fb.update_in_batches(items, max_bytes=max_bytes)
+        duration = time.perf_counter() - start
+
+        self.assertEqual(len(ref.data), 3000)
+        self.assertGreaterEqual(ref.requests, reference_requests)
+        self.assertGreater(ref.max_running, 1)
+        self.assertLess(duration, reference_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
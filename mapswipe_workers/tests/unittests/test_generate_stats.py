@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+
+from mapswipe_workers.generate_stats import generate_stats
+
+
+def project_stats_dict(project_id: str, progress: float) -> dict:
+    return {
+        "project_id": project_id,
+        "progress": progress,
+        "number_of_users": 2,
+        "number_of_results": 10,
+        "number_of_results_progress": 10,
+        "day": "2022-11-27",
+    }
+
+
+class TestGenerateStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.filename = os.path.join(self.tmp_dir.name, "projects_dynamic.csv")
+        self.projects_dynamic_df = pd.DataFrame(
+            [
+                project_stats_dict("project-1", 0.1),
+                project_stats_dict("project-2", 0.2),
+                project_stats_dict("project-3", 0.3),
+            ]
+        )
+
+    def test_save_project_info_dynamic(self):
+        projects_dynamic_df = generate_stats.save_project_info_dynamic(
+            self.filename,
+            self.projects_dynamic_df,
+            {
+                "project-1": project_stats_dict("project-1", 0.5),
+                # no results
+                "project-2": {},
+                # failed
+                "project-3": None,
+                "project-4": project_stats_dict("project-4", 0.4),
+            },
+        )
+        self.assertEqual(
+            projects_dynamic_df[["project_id", "progress"]].values.tolist(),
+            [["project-3", 0.3], ["project-1", 0.5], ["project-4", 0.4]],
+        )
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["projects_dynamic.csv"])
+        self.assertEqual(
+            pd.read_csv(self.filename, index_col="idx").values.tolist(),
+            projects_dynamic_df.values.tolist(),
+        )
+
+    def test_failed_project_does_not_stop_other_projects(self):
+        def _get_per_project_statistics(project_id, project_info):
+            if project_id == "project-2":
+                raise ValueError("failed")
+            return project_stats_dict(project_id, 1.0)
+
+        project_type = SimpleNamespace(
+            constructor=SimpleNamespace(
+                get_per_project_statistics=_get_per_project_statistics
+            )
+        )
+        projects_df = pd.DataFrame(
+            {
+                "project_id": ["project-1", "project-2", "project-3"],
+                "project_type": 1,
+            }
+        )
+        projects_dir = os.path.join(self.tmp_dir.name, "api", "projects")
+        os.makedirs(projects_dir)
+        self.projects_dynamic_df.to_csv(
+            os.path.join(projects_dir, "projects_dynamic.csv"), index_label="idx"
+        )
+
+        with mock.patch.object(
+            generate_stats, "DATA_PATH", self.tmp_dir.name
+        ), mock.patch.object(
+            generate_stats, "ProjectType", return_value=project_type
+        ), mock.patch.object(
+            generate_stats.overall_stats,
+            "get_project_static_info",
+            return_value=projects_df,
+        ), mock.patch.object(
+            generate_stats.overall_stats, "save_projects"
+        ) as save_projects, mock.patch.object(
+            generate_stats.overall_stats, "get_overall_stats"
+        ), mock.patch.object(
+            generate_stats, "generate_data_for_mapswipe_website"
+        ):
+            generate_stats.generate_stats(["project-1", "project-2", "project-3"])
+
+        projects_dynamic_df = save_projects.call_args.args[2]
+        self.assertEqual(
+            projects_dynamic_df[["project_id", "progress"]].values.tolist(),
+            [["project-2", 0.2], ["project-1", 1.0], ["project-3", 1.0]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.utils import geojson_functions
+
+
+def create_agg_results(number_of_tasks: int) -> pd.DataFrame:
+    """Create aggregated results like in the agg_results csv files."""
+    tile_x = np.arange(number_of_tasks) + 100
+    return pd.DataFrame(
+        {
+            "task_id": [f"18-{x}-200" for x in tile_x],
+            "0_count": 1,
+            "1_count": np.arange(number_of_tasks) % 3,
+            "total_count": 1 + np.arange(number_of_tasks) % 3,
+            "agreement": np.where(np.arange(number_of_tasks) % 2 == 0, 0.5, np.nan),
+            "project_id": "-NFNr55R_LYJvxP7wmte",
+            "group_id": "g101",
+            "geom": [
+                f"POLYGON(({x} 1,{x + 1} 1,{x + 1} 2.5,{x} 2.5,{x} 1))" for x in tile_x
+            ],
+            "url": "https://example.com/tile.png",
+        }
+    )
+
+
+class TestGeojsonFunctions(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.filename = os.path.join(self.tmp_dir.name, "agg_results_project.csv.gz")
+        self.outfile = os.path.join(
+            self.tmp_dir.name, "agg_results_project_geom.geojson.gz"
+        )
+
+    def load_geojson(self) -> dict:
+        with gzip.open(self.outfile, "rt") as f:
+            return json.load(f)
+
+    def test_gzipped_csv_to_gzipped_geojson(self):
+        create_agg_results(3).to_csv(self.filename, index_label="idx")
+        geojson_functions.gzipped_csv_to_gzipped_geojson(self.filename)
+
+        geojson = self.load_geojson()
+        self.assertEqual(geojson["type"], "FeatureCollection")
+        self.assertEqual(geojson["name"], "agg_results_project")
+        self.assertNotIn("metadata", geojson)
+        self.assertEqual(len(geojson["features"]), 3)
+        self.assertEqual(
+            geojson["features"][1],
+            {
+                "type": "Feature",
+                "properties": {
+                    "idx": 1.0,
+                    "task_id": "18-101-200",
+                    "0_count": 1.0,
+                    "1_count": 1.0,
+                    "total_count": 2.0,
+                    "project_id": "-NFNr55R_LYJvxP7wmte",
+                    "group_id": "g101",
+                    "url": "https://example.com/tile.png",
+                },
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [[101, 1], [102, 1], [102, 2.5], [101, 2.5], [101, 1]]
+                    ],
+                },
+            },
+        )
+        self.assertEqual(geojson["features"][2]["properties"]["agreement"], 0.5)
+        self.assertEqual(
+            sorted(os.listdir(self.tmp_dir.name)),
+            ["agg_results_project.csv.gz", "agg_results_project_geom.geojson.gz"],
+        )
+
+    def test_metadata_and_empty_file(self):
+        create_agg_results(0).to_csv(self.filename, index_label="idx")
+        geojson_functions.gzipped_csv_to_gzipped_geojson(
+            self.filename, add_metadata=True
+        )
+        self.assertEqual(
+            self.load_geojson(),
+            {
+                "type": "FeatureCollection",
+                "name": "agg_results_project",
+                "features": [],
+                "metadata": geojson_functions.GEOJSON_METADATA,
+            },
+        )
+
+    def test_constant_memory(self):
+        """Convert 20,000 tasks with less memory than the size of the GeoJSON."""
+        create_agg_results(20000).to_csv(self.filename, index_label="idx")
+
+        tracemalloc.start()
+        geojson_functions.gzipped_csv_to_gzipped_geojson(self.filename)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with gzip.open(self.outfile, "rb") as f:
+            size = len(f.read())
+        self.assertLess(peak * 10, size)
+
+
+if __name__ == "__main__":
+    unittest.main()
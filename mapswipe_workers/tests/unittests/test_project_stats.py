@@ -1,16 +1,35 @@
+import time
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from mapswipe_workers.generate_stats.project_stats import (
     add_missing_result_columns,
     calc_agreement,
+    calc_agreements,
     calc_count,
     calc_parent_option_count,
+    calc_quadkeys,
     calc_share,
     get_custom_options,
 )
+from mapswipe_workers.utils import tile_functions
 from tests.integration.base import BaseTestCase
+from tests.unittests.benchmark import benchmark
+
+
+def random_counts(number_of_tasks: int) -> pd.DataFrame:
+    """Create counts like get_agg_results_from_task_counts with a sub option of 1."""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(
+        rng.integers(0, 5, size=(number_of_tasks, 5)),
+        columns=["0_count", "1_count", "2_count", "3_count", "4_count"],
+    )
+    df["total_count"] = calc_count(df)
+    df = calc_parent_option_count(df, {0: set(), 1: {4}, 2: set(), 3: set()})
+    df["0_share"] = df["0_count"] / df["total_count"]
+    return df
 
 
 class TestProjectStats(BaseTestCase):
@@ -22,6 +41,47 @@ class TestProjectStats(BaseTestCase):
         agg2 = calc_agreement(ds)
         self.assertEqual(agg2, 0.32564102564102565)
 
+    def test_calc_agreements(self):
+        df = random_counts(1000)
+        agreements = calc_agreements(df)
+        expected = df.filter(like="count").apply(calc_agreement, axis=1)
+        # same float values, None is NaN
+        np.testing.assert_array_equal(agreements.to_numpy(), expected.to_numpy())
+        self.assertTrue(agreements[df["total_count"] <= 1].isna().all())
+
+    def test_calc_quadkeys(self):
+        task_ids = pd.Series(
+            ["18-147787-137940", "1-0-1", "0-0-0", "g101", "18-147787", None]
+        )
+        quadkeys = calc_quadkeys(task_ids)
+        self.assertEqual(
+            quadkeys.tolist(),
+            [
+                tile_functions.tile_coords_and_zoom_to_quadKey(147787, 137940, 18),
+                "2",
+                "",
+                None,
+                None,
+                None,
+            ],
+        )
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare calc_agreements to calc_agreement for 20,000 tasks."""
+        df = random_counts(20000)
+
+        start = time.perf_counter()
+        expected = df.filter(like="count").apply(calc_agreement, axis=1)
+        row_wise_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        agreements = calc_agreements(df)
+        duration = time.perf_counter() - start
+
+        np.testing.assert_array_equal(agreements.to_numpy(), expected.to_numpy())
+        self.assertLess(duration * 10, row_wise_duration)
+
     def test_calc_count(self):
         df = pd.DataFrame(
             data=[[1, 15, 5, 20], [1, 234, 45, 6]],
@@ -0,0 +1,180 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.generate_stats import project_stats_by_date
+from mapswipe_workers.generate_stats.project_stats import get_sessions
+from tests.unittests.benchmark import benchmark
+from tests.unittests.test_project_stats_state import load_results
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "tile_map_service_grid"
+)
+
+
+def create_results(number_of_sessions: int, tasks_per_group: int) -> tuple:
+    """
+    Create results and groups of a project in which groups are mapped
+    by more users than required and users map on several days.
+    """
+    rng = np.random.default_rng(42)
+    number_of_groups = max(1, number_of_sessions // 4)
+    sessions_df = pd.DataFrame(
+        {
+            "project_id": "project",
+            "group_id": "g"
+            + pd.Series(rng.integers(0, number_of_groups, number_of_sessions)).astype(
+                str
+            ),
+            "user_id": "u"
+            + pd.Series(
+                rng.integers(0, number_of_sessions // 10 + 1, number_of_sessions)
+            ).astype(str),
+            "day": pd.Timestamp("2022-11-21")
+            + pd.to_timedelta(rng.integers(0, 60, number_of_sessions), unit="D"),
+        }
+    )
+    results_df = sessions_df.loc[sessions_df.index.repeat(tasks_per_group)].reset_index(
+        drop=True
+    )
+    results_df["task_id"] = (
+        results_df["group_id"]
+        + "-"
+        + np.tile(np.arange(tasks_per_group), number_of_sessions).astype(str)
+    )
+    groups_df = pd.DataFrame(
+        {
+            "project_id": "project",
+            "group_id": "g" + pd.Series(np.arange(number_of_groups)).astype(str),
+            "number_of_tasks": tasks_per_group,
+            "number_of_users_required": rng.integers(1, 6, number_of_groups),
+        }
+    )
+    return results_df, groups_df
+
+
+def load_groups(fixture_dir: str) -> pd.DataFrame:
+    groups_df = pd.read_csv(
+        os.path.join(fixture_dir, "groups", "build_area_sandoa.csv"),
+        sep="\t",
+        names=[
+            "project_id",
+            "group_id",
+            "number_of_tasks",
+            "finished_count",
+            "required_count",
+            "progress",
+            "project_type_specifics",
+        ],
+    )
+    groups_df["number_of_users_required"] = (
+        groups_df["required_count"] + groups_df["finished_count"]
+    )
+    return groups_df
+
+
+class TestProjectStatsByDate(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.filename = os.path.join(self.tmp_dir.name, "history.csv")
+
+    def assert_same_csv(self, expected_filename: str):
+        with open(self.filename) as f, open(expected_filename) as f_expected:
+            self.assertEqual(f.read(), f_expected.read())
+
+    def test_get_project_history(self):
+        integration_fixture_dir = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "integration",
+            "fixtures",
+            "tile_map_service_grid",
+        )
+        project_stats_by_date.get_project_history(
+            load_results(integration_fixture_dir),
+            load_groups(integration_fixture_dir),
+            "-NFNr55R_LYJvxP7wmte",
+            self.filename,
+        )
+        self.assert_same_csv(
+            os.path.join(FIXTURE_DIR, "history", "history_-NFNr55R_LYJvxP7wmte.csv")
+        )
+
+    def test_get_project_history_more_users_than_required(self):
+        results_df, groups_df = create_results(400, 3)
+        project_stats_by_date.get_project_history(
+            results_df, groups_df, "project", self.filename
+        )
+        self.assert_same_csv(
+            os.path.join(FIXTURE_DIR, "history", "history_project.csv")
+        )
+
+    def test_get_project_history_from_sessions(self):
+        results_df, groups_df = create_results(400, 3)
+        project_stats_by_date.get_project_history(
+            get_sessions(results_df), groups_df, "project", self.filename
+        )
+        self.assert_same_csv(
+            os.path.join(FIXTURE_DIR, "history", "history_project.csv")
+        )
+
+    def test_calc_results_progress(self):
+        rows = [
+            (number_of_users, number_of_users_required, cum_number_of_users)
+            for number_of_users in range(1, 5)
+            for number_of_users_required in range(1, 5)
+            for cum_number_of_users in range(number_of_users, 10)
+        ]
+        number_of_users, number_of_users_required, cum_number_of_users = map(
+            np.array, zip(*rows)
+        )
+        number_of_results_progress = project_stats_by_date.calc_results_progress(
+            number_of_users,
+            number_of_users_required,
+            cum_number_of_users,
+            10,
+            number_of_users * 10,
+        )
+
+        expected = []
+        for n, required, cum_n in rows:
+            if cum_n <= required:
+                expected.append(n * 10)
+            elif cum_n - n < required:
+                expected.append((required - (cum_n - n)) * 10)
+            else:
+                expected.append(0)
+        self.assertEqual(number_of_results_progress.tolist(), expected)
+
+    @benchmark
+    def test_benchmark(self):
+        """Generate the history of a project with 2,000,000 results."""
+        results_df, groups_df = create_results(20000, 100)
+
+        start = time.perf_counter()
+        history_df = project_stats_by_date.get_project_history(
+            results_df, groups_df, "project", self.filename
+        )
+        duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        project_stats_by_date.get_project_history(
+            get_sessions(results_df), groups_df, "project", self.filename
+        )
+        sessions_duration = time.perf_counter() - start
+
+        # sessions of a user for the same group on the same day are counted once
+        self.assertEqual(
+            history_df["cum_number_of_results"].iloc[-1],
+            len(get_sessions(results_df)) * 100,
+        )
+        self.assertLessEqual(history_df["cum_progress"].iloc[-1], 1)
+        self.assertLess(sessions_duration, duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
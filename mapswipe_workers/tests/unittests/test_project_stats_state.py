@@ -0,0 +1,260 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from mapswipe_workers.generate_stats import project_stats_by_date, user_stats
+from mapswipe_workers.generate_stats.project_stats import (
+    append_to_gzipped_csv,
+    create_stats_state,
+    get_counts_by_task_id,
+    get_pending_results_filename,
+    load_stats_state,
+    publish_pending_results,
+    save_stats_state,
+    update_stats_state,
+)
+from tests.unittests import test_user_stats
+from tests.unittests.benchmark import benchmark
+
+CUSTOM_OPTIONS = {0: set(), 1: set(), 2: set(), 3: set()}
+
+
+def load_results(fixture_dir: str) -> pd.DataFrame:
+    """Load results in the format of project_stats.get_results from fixtures."""
+    mapping_sessions_df = pd.read_csv(
+        os.path.join(fixture_dir, "mapping_sessions", "build_area_sandoa.csv"),
+        sep="\t",
+        names=[
+            "project_id",
+            "group_id",
+            "user_id",
+            "mapping_session_id",
+            "start_time",
+            "end_time",
+            "items_count",
+        ],
+        parse_dates=["start_time"],
+    )
+    results_df = pd.read_csv(
+        os.path.join(fixture_dir, "mapping_sessions_results", "build_area_sandoa.csv"),
+        sep="\t",
+        names=["mapping_session_id", "task_id", "result"],
+    )
+    users_df = pd.read_csv(
+        os.path.join(fixture_dir, "users", "build_area_sandoa.csv"),
+        sep="\t",
+        names=["user_id", "username", "created", "updated_at"],
+        usecols=["user_id", "username"],
+    )
+    results_df = results_df.merge(mapping_sessions_df, on="mapping_session_id").merge(
+        users_df, on="user_id", how="left"
+    )
+    results_df["username"] = results_df["username"].fillna("unknown")
+    results_df["day"] = results_df["start_time"].dt.floor("D")
+    return results_df
+
+
+def get_agg_results_by_user_id(state: dict) -> pd.DataFrame:
+    return user_stats.get_agg_results_by_user_id_from_contributions(
+        state["contributions"], state["sessions"], state["usernames"]
+    )
+
+
+class TestProjectStatsState(unittest.TestCase):
+    def setUp(self):
+        fixture_dir = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "integration",
+            "fixtures",
+            "tile_map_service_grid",
+        )
+        self.results_df = load_results(fixture_dir)
+        self.groups_df = pd.read_csv(
+            os.path.join(fixture_dir, "groups", "build_area_sandoa.csv"),
+            sep="\t",
+            names=[
+                "project_id",
+                "group_id",
+                "number_of_tasks",
+                "finished_count",
+                "required_count",
+                "progress",
+                "project_type_specifics",
+            ],
+        )
+        self.groups_df["number_of_users_required"] = (
+            self.groups_df["required_count"] + self.groups_df["finished_count"]
+        )
+
+    def add_results_incrementally(self, watermarks: list) -> dict:
+        """Create the state with the results up to the first watermark.
+        Then add the results up to each following watermark."""
+        results_df = self.results_df
+        state = create_stats_state(
+            watermarks[0],
+            results_df[results_df["mapping_session_id"] <= watermarks[0]],
+            CUSTOM_OPTIONS,
+        )
+        for watermark in watermarks[1:]:
+            new_results_df = results_df[
+                (results_df["mapping_session_id"] > state["watermark"])
+                & (results_df["mapping_session_id"] <= watermark)
+            ]
+            previous_results_df = results_df[
+                (results_df["mapping_session_id"] <= state["watermark"])
+                & results_df["group_id"].isin(new_results_df["group_id"])
+            ][["project_id", "group_id", "user_id", "task_id", "result"]]
+            state = update_stats_state(
+                state, watermark, new_results_df, previous_results_df, CUSTOM_OPTIONS
+            )
+        return state
+
+    def test_same_stats_as_from_all_results(self):
+        expected = create_stats_state(3601759, self.results_df, CUSTOM_OPTIONS)
+        state = self.add_results_incrementally([874551, 2248341, 3601731, 3601759])
+
+        self.assertEqual(state["watermark"], 3601759)
+        assert_series_equal(state["task_counts"], expected["task_counts"])
+        assert_series_equal(state["usernames"], expected["usernames"])
+        assert_frame_equal(
+            state["contributions"].sort_index(), expected["contributions"]
+        )
+        assert_frame_equal(
+            get_agg_results_by_user_id(state), get_agg_results_by_user_id(expected)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "history.csv")
+            history_df = project_stats_by_date.get_project_history(
+                state["sessions"], self.groups_df.copy(), "project", filename
+            )
+            expected_history_df = project_stats_by_date.get_project_history(
+                self.results_df, self.groups_df.copy(), "project", filename
+            )
+        assert_frame_equal(history_df, expected_history_df)
+
+    def test_same_user_stats_as_get_agg_results_by_user_id(self):
+        state = create_stats_state(3601759, self.results_df, CUSTOM_OPTIONS)
+        agg_results_df = (
+            get_counts_by_task_id(state["task_counts"], CUSTOM_OPTIONS)
+            .reset_index(level="project_id", drop=True)
+            .reset_index()
+        )
+        assert_frame_equal(
+            get_agg_results_by_user_id(state),
+            test_user_stats.get_agg_results_by_user_id(self.results_df, agg_results_df),
+        )
+
+    def test_save_and_load_stats_state(self):
+        state = create_stats_state(3601759, self.results_df, CUSTOM_OPTIONS)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "stats_state.pkl.gz")
+            self.assertIsNone(load_stats_state(filename))
+
+            save_stats_state(filename, state)
+            loaded_state = load_stats_state(filename)
+            self.assertEqual(os.listdir(tmp_dir), ["stats_state.pkl.gz"])
+
+            with open(filename, "wb") as f:
+                f.write(b"broken")
+            self.assertIsNone(load_stats_state(filename))
+
+        self.assertEqual(loaded_state["watermark"], 3601759)
+        assert_series_equal(loaded_state["task_counts"], state["task_counts"])
+        assert_frame_equal(loaded_state["sessions"], state["sessions"])
+
+    def test_publish_pending_results(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "results.csv.gz")
+            new_filename = os.path.join(tmp_dir, "results_new.csv.gz")
+            self.results_df.iloc[:10].to_csv(filename, compression="gzip")
+            self.results_df.iloc[10:20].to_csv(new_filename, compression="gzip")
+
+            # pending results of a run which failed before saving the state
+            stale_filename = get_pending_results_filename(filename, 3601760)
+            shutil.copyfile(filename, stale_filename)
+            append_to_gzipped_csv(stale_filename, new_filename)
+
+            # the state was saved without pending results
+            publish_pending_results(filename, 3601759)
+            self.assertEqual(len(pd.read_csv(filename)), 10)
+            self.assertEqual(
+                sorted(os.listdir(tmp_dir)), ["results.csv.gz", "results_new.csv.gz"]
+            )
+
+            # the state was saved before the pending results were published
+            pending_filename = get_pending_results_filename(filename, 3601761)
+            shutil.copyfile(filename, pending_filename)
+            append_to_gzipped_csv(pending_filename, new_filename)
+            publish_pending_results(filename, 3601761)
+            self.assertEqual(len(pd.read_csv(filename)), 20)
+            self.assertEqual(
+                sorted(os.listdir(tmp_dir)), ["results.csv.gz", "results_new.csv.gz"]
+            )
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare adding 500 new results to 200,000 results with a full calculation."""
+        rng = np.random.default_rng(42)
+        number_of_sessions, tasks_per_group = 2000, 100
+        sessions_df = pd.DataFrame(
+            {
+                "project_id": "project",
+                "group_id": rng.integers(0, 200, number_of_sessions).astype(str),
+                "user_id": rng.integers(0, 1000, number_of_sessions).astype(str),
+                "mapping_session_id": np.arange(number_of_sessions),
+                "day": pd.Timestamp("2022-11-21")
+                + pd.to_timedelta(rng.integers(0, 100, number_of_sessions), unit="D"),
+            }
+        ).drop_duplicates(["group_id", "user_id"])
+        results_df = sessions_df.loc[
+            sessions_df.index.repeat(tasks_per_group)
+        ].reset_index(drop=True)
+        results_df["task_id"] = (
+            results_df["group_id"]
+            + "-"
+            + np.tile(np.arange(tasks_per_group), len(sessions_df)).astype(str)
+        )
+        results_df["result"] = rng.integers(0, 4, len(results_df))
+        results_df["username"] = "user-" + results_df["user_id"]
+
+        watermark = sessions_df["mapping_session_id"].iloc[-6]
+        state = create_stats_state(
+            watermark,
+            results_df[results_df["mapping_session_id"] <= watermark],
+            CUSTOM_OPTIONS,
+        )
+        new_results_df = results_df[results_df["mapping_session_id"] > watermark]
+        self.assertEqual(len(new_results_df), 500)
+
+        start = time.perf_counter()
+        create_stats_state(
+            sessions_df["mapping_session_id"].iloc[-1], results_df, CUSTOM_OPTIONS
+        )
+        full_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        previous_results_df = results_df[
+            (results_df["mapping_session_id"] <= watermark)
+            & results_df["group_id"].isin(new_results_df["group_id"])
+        ]
+        update_stats_state(
+            state,
+            sessions_df["mapping_session_id"].iloc[-1],
+            new_results_df,
+            previous_results_df,
+            CUSTOM_OPTIONS,
+        )
+        duration = time.perf_counter() - start
+
+        self.assertLess(duration, full_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
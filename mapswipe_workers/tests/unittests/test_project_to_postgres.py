@@ -0,0 +1,53 @@
+import json
+import re
+import unittest
+
+from mapswipe_workers.project_types.project import encode_text_chunks
+
+COPY_ESCAPES = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+
+
+def decode_value(value: str):
+    if value == "\\N":
+        return None
+    return re.sub(r"\\[\\tnr]", lambda m: COPY_ESCAPES[m.group()], value)
+
+
+def decode_text_copy(data: bytes) -> list:
+    """Parse data in the text format of the COPY statement like postgres."""
+    return [
+        [decode_value(value) for value in line.split("\t")]
+        for line in data.decode("utf-8").split("\n")[:-1]
+    ]
+
+
+class TestEncodeTextChunks(unittest.TestCase):
+    def test_round_trip(self):
+        specifics = json.dumps(
+            {"name": "it's a\ttab", "text": "new\nline", "path": "back\\slash"}
+        )
+        rows = [
+            ("project-1", "g101", "18-1-2", "", specifics),
+            ("project-1", "g101", "it's\ta\nback\\slash", None, "{}"),
+        ]
+        data = b"".join(encode_text_chunks(rows))
+
+        self.assertEqual(decode_text_copy(data), [list(row) for row in rows])
+        self.assertEqual(
+            json.loads(decode_text_copy(data)[0][4]),
+            {"name": "it's a\ttab", "text": "new\nline", "path": "back\\slash"},
+        )
+
+    def test_chunks(self):
+        rows = [("project-1", f"g{i}", i) for i in range(5)]
+        chunks = list(encode_text_chunks(rows, rows_per_chunk=2))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(
+            decode_text_copy(b"".join(chunks)),
+            [["project-1", f"g{i}", str(i)] for i in range(5)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,17 @@
 import os
 import unittest
+from dataclasses import asdict
 
 from mapswipe_workers.project_types import ChangeDetectionProject
+from mapswipe_workers.project_types.project import BaseProject
+from mapswipe_workers.project_types.tile_map_service.change_detection.project import (
+    ChangeDetectionTask,
+)
+from mapswipe_workers.utils import (
+    binary_copy,
+    tile_functions,
+    vectorized_tile_functions,
+)
 from tests import fixtures
 
 
@@ -36,6 +46,86 @@ class TestChangeDetectionProject(unittest.TestCase):
         for group in self.project.groups.values():
             self.assertGreater(group.numberOfTasks, 0)
 
+    def test_create_tasks_url_b(self):
+        self.project.validate_geometries()
+        self.project.create_groups()
+        self.project.create_tasks()
+        for tasks in self.project.tasks.values():
+            for task in tasks:
+                self.assertEqual(
+                    task.urlB,
+                    tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                        task.taskX,
+                        task.taskY,
+                        self.project.zoomLevel,
+                        self.project.tileServerB,
+                    ),
+                )
+
+    def get_expected_tasks(self) -> dict:
+        """Create task objects tile by tile like before tasks were columns."""
+        expected_tasks = {}
+        for group_id, group in self.project.groups.items():
+            expected_tasks[group_id] = [
+                ChangeDetectionTask(
+                    projectId=self.project.projectId,
+                    groupId=group_id,
+                    taskId=f"{self.project.zoomLevel}-{x}-{y}",
+                    taskX=x,
+                    taskY=y,
+                    geometry=tile_functions.geometry_from_tile_coords(
+                        x, y, self.project.zoomLevel
+                    ),
+                    url=tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                        x, y, self.project.zoomLevel, self.project.tileServer
+                    ),
+                    urlB=tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                        x, y, self.project.zoomLevel, self.project.tileServerB
+                    ),
+                )
+                for x in range(group.xMin, group.xMax + 1)
+                for y in range(group.yMin, group.yMax + 1)
+            ]
+        return expected_tasks
+
+    def test_tasks_same_as_task_objects(self):
+        self.project.validate_geometries()
+        self.project.create_groups()
+        self.project.create_tasks()
+        expected_tasks = self.get_expected_tasks()
+
+        task_dicts = self.project.tasks_to_dicts(self.project.tasks)
+        self.assertEqual(list(task_dicts.keys()), list(expected_tasks.keys()))
+        for group_id, tasks in expected_tasks.items():
+            self.assertEqual(task_dicts[group_id], [asdict(t) for t in tasks])
+            group_tasks = self.project.tasks[group_id]
+            self.assertEqual(list(group_tasks), tasks)
+            self.assertEqual(group_tasks[0], tasks[0])
+            self.assertEqual(group_tasks[-1], tasks[-1])
+            self.assertEqual(group_tasks[1:3], tasks[1:3])
+
+        self.assertEqual(
+            list(self.project.get_raw_tasks_rows(self.project.tasks, wkb=False)),
+            list(BaseProject.get_raw_tasks_rows(self.project, expected_tasks)),
+        )
+        # The WKB is not parsed from the WKT, so only the other columns are equal.
+        rows = list(self.project.get_raw_tasks_rows(self.project.tasks, wkb=True))
+        expected_rows = list(
+            BaseProject.get_raw_tasks_rows(self.project, expected_tasks)
+        )
+        self.assertEqual(
+            [row[:3] + row[4:] for row in rows],
+            [row[:3] + row[4:] for row in expected_rows],
+        )
+        expected_geometries = [
+            binary_copy.wkb_with_srid(geometry, 4326)
+            for tasks in self.project.tasks.values()
+            for geometry in vectorized_tile_functions.wkb_polygons_from_tile_coords(
+                tasks.tile_x, tasks.tile_y, tasks.zoom
+            )
+        ]
+        self.assertEqual([row[3] for row in rows], expected_geometries)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,6 +4,7 @@ import unittest
 from mapswipe_workers.project_types.tile_map_service.classification.project import (
     ClassificationProject,
 )
+from mapswipe_workers.utils import tile_functions
 from tests import fixtures
 
 
@@ -34,6 +35,39 @@ class TestClassificationProject(unittest.TestCase):
         for group in self.project.groups.values():
             self.assertGreater(group.numberOfTasks, 0)
 
+    def test_create_tasks_same_as_tile_functions(self):
+        """Test if tasks are identical to the tasks created tile by tile."""
+        self.project.validate_geometries()
+        self.project.create_groups()
+        self.project.create_tasks()
+        for group_id, group in self.project.groups.items():
+            tasks = self.project.tasks[group_id]
+            expected_tiles = [
+                (x, y)
+                for x in range(group.xMin, group.xMax + 1)
+                for y in range(group.yMin, group.yMax + 1)
+            ]
+            self.assertEqual([(t.taskX, t.taskY) for t in tasks], expected_tiles)
+            for task in tasks:
+                self.assertEqual(
+                    task.taskId, f"{self.project.zoomLevel}-{task.taskX}-{task.taskY}"
+                )
+                self.assertEqual(
+                    task.geometry,
+                    tile_functions.geometry_from_tile_coords(
+                        task.taskX, task.taskY, self.project.zoomLevel
+                    ),
+                )
+                self.assertEqual(
+                    task.url,
+                    tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                        task.taskX,
+                        task.taskY,
+                        self.project.zoomLevel,
+                        self.project.tileServer,
+                    ),
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
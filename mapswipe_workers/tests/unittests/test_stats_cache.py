@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.testing import assert_frame_equal
+
+from mapswipe_workers.generate_stats import stats_cache
+from mapswipe_workers.generate_stats.project_stats import load_df, load_df_from_csv
+from tests.unittests.benchmark import benchmark
+
+
+def create_tasks(number_of_tasks: int) -> pd.DataFrame:
+    """Create tasks like in the tasks csv file of a tile map service project."""
+    rng = np.random.default_rng(42)
+    tile_x = rng.integers(100000, 110000, number_of_tasks)
+    tile_y = rng.integers(100000, 110000, number_of_tasks)
+    return pd.DataFrame(
+        {
+            "project_id": "-NFNr55R_LYJvxP7wmte",
+            "group_id": "g" + pd.Series(np.arange(number_of_tasks) // 100).astype(str),
+            "task_id": [f"18-{x}-{y}" for x, y in zip(tile_x, tile_y)],
+            "tile_z": 18,
+            "tile_x": tile_x,
+            "tile_y": tile_y,
+            "geom": [
+                f"POLYGON(({x} {y},{x + 1} {y},{x + 1} {y + 1},{x} {y + 1},{x} {y}))"
+                for x, y in zip(tile_x, tile_y)
+            ],
+            "url": np.where(tile_x % 2 == 0, "https://example.com/tile.png", None),
+        }
+    )
+
+
+class TestStatsCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        os.mkdir(os.path.join(self.tmp_dir.name, "stats_cache"))
+        patcher = mock.patch.object(stats_cache, "DATA_PATH", self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.filename = os.path.join(self.tmp_dir.name, "tasks_project.csv.gz")
+
+    def write_csv(self, df: pd.DataFrame):
+        df.to_csv(self.filename, compression="gzip")
+
+    def test_same_data_frame_as_from_csv(self):
+        self.write_csv(create_tasks(1000))
+        expected = load_df_from_csv(self.filename)
+
+        self.assertIsNone(stats_cache.read_cache(self.filename))
+        stats_cache.write_cache(self.filename, expected)
+        df = stats_cache.read_cache(self.filename)
+        assert_frame_equal(df, expected)
+
+        with pa.memory_map(stats_cache.get_cache_filename(self.filename)) as source:
+            schema = pa.ipc.open_file(source).schema
+        self.assertTrue(pa.types.is_dictionary(schema.field("group_id").type))
+        self.assertTrue(pa.types.is_string(schema.field("task_id").type))
+
+    def test_changed_csv_file(self):
+        self.write_csv(create_tasks(10))
+        # the cache is created when the csv file is loaded for the first time
+        load_df(self.filename)
+        self.assertIsNotNone(stats_cache.read_cache(self.filename))
+
+        self.write_csv(create_tasks(20))
+        cache_mtime = os.path.getmtime(stats_cache.get_cache_filename(self.filename))
+        os.utime(self.filename, (cache_mtime + 1, cache_mtime + 1))
+        self.assertIsNone(stats_cache.read_cache(self.filename))
+        self.assertEqual(len(load_df(self.filename)), 20)
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare loading 200,000 tasks from the cache and from the csv file."""
+        self.write_csv(create_tasks(200000))
+
+        start = time.perf_counter()
+        expected = load_df_from_csv(self.filename)
+        csv_duration = time.perf_counter() - start
+
+        stats_cache.write_cache(self.filename, expected)
+        start = time.perf_counter()
+        df = stats_cache.read_cache(self.filename)
+        duration = time.perf_counter() - start
+
+        assert_frame_equal(df, expected)
+        self.assertLess(duration, csv_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
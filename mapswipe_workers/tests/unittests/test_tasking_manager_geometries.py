@@ -0,0 +1,259 @@
+import csv
+import gzip
+import os
+import random
+import time
+import unittest
+
+import numpy as np
+
+from mapswipe_workers.generate_stats import tasking_manager_geometries
+from tests.unittests.benchmark import benchmark
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "tile_map_service_grid"
+)
+INTEGRATION_FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "integration",
+    "fixtures",
+    "tile_map_service_grid",
+)
+
+
+def load_tasks(fixture_name: str) -> list:
+    """
+    Load the tiles of the tasks of a project and select about two thirds
+    of them as yes and maybe results.
+    """
+    random.seed(42)
+    filename = os.path.join(INTEGRATION_FIXTURE_DIR, "tasks", f"{fixture_name}.csv")
+    tasks = []
+    with open(filename) as f:
+        for row in csv.reader(f, delimiter="\t"):
+            task_z, task_x, task_y = map(int, row[2].split("-"))
+            if random.random() < 0.65:
+                tasks.append(
+                    {"id": row[2], "task_x": task_x, "task_y": task_y, "task_z": task_z}
+                )
+    return tasks
+
+
+def create_tasks(number_of_tasks: int, number_of_clusters: int) -> dict:
+    """Create tiles in clusters, like the yes and maybe results of a project."""
+    random.seed(42)
+    tasks = {}
+    while len(tasks) < number_of_tasks:
+        center_x = random.randint(100000, 120000)
+        center_y = random.randint(100000, 120000)
+        for _ in range(number_of_tasks // number_of_clusters):
+            task_x = center_x + int(random.gauss(0, 20))
+            task_y = center_y + int(random.gauss(0, 20))
+            task_id = f"18-{task_x}-{task_y}"
+            tasks[task_id] = {
+                "id": task_id,
+                "task_x": task_x,
+                "task_y": task_y,
+                "task_z": 18,
+            }
+    return tasks
+
+
+def get_group_ids_by_merging_duplicates(tasks: dict, neighbour_list: list) -> dict:
+    """Assign group ids like create_hot_tm_tasks did before, as reference."""
+
+    def _neighbours(task_id):
+        task = tasks[task_id]
+        for i, j in neighbour_list:
+            neighbour_id = f"{task['task_z']}-{task['task_x'] + i}-{task['task_y'] + j}"
+            if neighbour_id in tasks:
+                yield neighbour_id
+
+    group_ids = {}
+    highest_group_id = 0
+    for task_id in sorted(tasks.keys()):
+        if task_id not in group_ids:
+            highest_group_id += 1
+            group_ids[task_id] = highest_group_id
+        for neighbour_id in _neighbours(task_id):
+            group_ids[neighbour_id] = group_ids[task_id]
+
+    while True:
+        duplicated_groups = {}
+        for task_id in tasks.keys():
+            for neighbour_id in _neighbours(task_id):
+                if group_ids[neighbour_id] != group_ids[task_id]:
+                    duplicated_groups.setdefault(group_ids[task_id], set()).add(
+                        group_ids[neighbour_id]
+                    )
+                    duplicated_groups.setdefault(group_ids[neighbour_id], set()).add(
+                        group_ids[task_id]
+                    )
+        if not duplicated_groups:
+            return group_ids
+
+        for group_id in sorted(duplicated_groups.keys(), reverse=True):
+            lowest_group_id = min(group_id, *duplicated_groups[group_id])
+            for task_id in tasks.keys():
+                if group_ids[task_id] == group_id:
+                    group_ids[task_id] = lowest_group_id
+
+
+def split_group_by_queue(
+    group_data: dict, group_size: int, neighbourhood_size: int
+) -> list:
+    """Split a group like create_hot_tm_tasks did before, as reference."""
+    queue = [group_data]
+    split_groups_list = []
+    while queue:
+        group_data = queue.pop(0)
+        x_list = [int(data["task_x"]) for data in group_data.values()]
+        y_list = [int(data["task_y"]) for data in group_data.values()]
+        min_x, x_width = min(x_list), max(x_list) - min(x_list)
+        min_y, y_width = min(y_list), max(y_list) - min(y_list)
+
+        new_grouped_data = {"a": {}, "b": {}}
+        for result, data in group_data.items():
+            if x_width >= y_width:
+                in_first_segment = int(data["task_x"]) < (min_x + (x_width / 2))
+            else:
+                in_first_segment = int(data["task_y"]) < (min_y + (y_width / 2))
+            new_grouped_data["a" if in_first_segment else "b"][result] = data
+
+        for k in ["a", "b"]:
+            if len(new_grouped_data[k]) < group_size and x_width * y_width <= 2 * (
+                neighbourhood_size * neighbourhood_size
+            ):
+                split_groups_list.append(new_grouped_data[k])
+            else:
+                queue.append(new_grouped_data[k])
+    return split_groups_list
+
+
+class TestTaskingManagerGeometries(unittest.TestCase):
+    def test_same_group_ids_as_merging_duplicates(self):
+        for neighbourhood_shape in ["rectangle", "star"]:
+            neighbour_list = tasking_manager_geometries.get_neighbour_list(
+                neighbourhood_shape, 5
+            )
+            for number_of_clusters in [1, 5, 50]:
+                tasks = create_tasks(2000, number_of_clusters)
+                self.assertEqual(
+                    tasking_manager_geometries.get_group_ids(tasks, neighbour_list),
+                    get_group_ids_by_merging_duplicates(tasks, neighbour_list),
+                )
+
+    def test_create_hot_tm_tasks(self):
+        tasks = create_tasks(2000, 20)
+        groups = tasking_manager_geometries.create_hot_tm_tasks(
+            "project", list(tasks.values())
+        )
+        self.assertEqual(
+            sorted(task_id for group in groups.values() for task_id in group),
+            sorted(tasks),
+        )
+        for task in tasks.values():
+            self.assertNotIn("my_group_id", task)
+
+    def test_same_groups_as_before(self):
+        """Compare with the groups created for real projects before."""
+        expected = {}
+        filename = os.path.join(FIXTURE_DIR, "hot_tm", "hot_tm_groups.csv.gz")
+        with gzip.open(filename, "rt", newline="") as f:
+            for row in csv.DictReader(f):
+                expected.setdefault(row["fixture_name"], {}).setdefault(
+                    int(row["group_id"]), []
+                ).append(row["task_id"])
+
+        for fixture_name in [
+            "build_area",
+            "build_area_heidelberg",
+            "build_area_sandoa",
+        ]:
+            groups = tasking_manager_geometries.create_hot_tm_tasks(
+                "project", load_tasks(fixture_name)
+            )
+            self.assertEqual(
+                {group_id: list(group) for group_id, group in groups.items()},
+                expected[fixture_name],
+            )
+
+    def test_split_group(self):
+        tasks = create_tasks(2000, 1)
+        task_x = np.array([task["task_x"] for task in tasks.values()])
+        task_y = np.array([task["task_y"] for task in tasks.values()])
+        split_groups_list = tasking_manager_geometries.split_group(
+            task_x, task_y, 15, 5
+        )
+
+        indices = np.concatenate([indices for _, indices in split_groups_list])
+        self.assertEqual(sorted(indices.tolist()), list(range(len(tasks))))
+        self.assertTrue(all(len(indices) < 15 for _, indices in split_groups_list))
+        depths = [depth for depth, _ in split_groups_list]
+        self.assertEqual(depths, sorted(depths))
+
+        # the reference also returns empty halves, which are skipped now
+        task_ids = list(tasks.keys())
+        self.assertEqual(
+            [[task_ids[i] for i in indices] for _, indices in split_groups_list],
+            [list(group) for group in split_group_by_queue(tasks, 15, 5) if group],
+        )
+
+    def test_split_group_of_same_tiles(self):
+        """Tiles of different zoom levels can have the same coordinates."""
+        split_groups_list = tasking_manager_geometries.split_group(
+            np.array([5, 5, 5]), np.array([7, 7, 7]), 1, 5
+        )
+        self.assertEqual(
+            [(depth, indices.tolist()) for depth, indices in split_groups_list],
+            [(0, [0, 1, 2])],
+        )
+
+    @benchmark
+    def test_benchmark_split_group(self):
+        """Split a group of 200,000 tiles."""
+        tasks = {
+            f"18-{task_x}-{task_y}": {"task_x": task_x, "task_y": task_y}
+            for task_x in range(100000, 100500)
+            for task_y in range(100000, 100400)
+        }
+        task_x = np.array([task["task_x"] for task in tasks.values()])
+        task_y = np.array([task["task_y"] for task in tasks.values()])
+
+        start = time.perf_counter()
+        split_groups_list = tasking_manager_geometries.split_group(
+            task_x, task_y, 15, 5
+        )
+        duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = split_group_by_queue(tasks, 15, 5)
+        reference_duration = time.perf_counter() - start
+
+        self.assertEqual(
+            len(split_groups_list), len([group for group in reference if group])
+        )
+        self.assertLess(duration, reference_duration)
+
+    @benchmark
+    def test_benchmark(self):
+        """Assign group ids to 500,000 tiles."""
+        neighbour_list = tasking_manager_geometries.get_neighbour_list("rectangle", 5)
+        tasks = create_tasks(5000, 50)
+
+        start = time.perf_counter()
+        get_group_ids_by_merging_duplicates(tasks, neighbour_list)
+        reference_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tasking_manager_geometries.get_group_ids(tasks, neighbour_list)
+        duration = time.perf_counter() - start
+
+        tasks = create_tasks(500000, 500)
+        group_ids = tasking_manager_geometries.get_group_ids(tasks, neighbour_list)
+        self.assertEqual(len(group_ids), len(tasks))
+        self.assertLess(duration, reference_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,31 @@ import json
 import os
 import unittest
 
-from mapswipe_workers.utils import tile_grouping_functions
+import numpy as np
+
+from mapswipe_workers.utils import tile_grouping_functions, vectorized_tile_functions
 from mapswipe_workers.utils.validate_input import save_geojson_to_file
 
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def get_tiles(groups: dict) -> set:
+    return {
+        (x, y)
+        for group in groups.values()
+        for x in range(int(group["xMin"]), int(group["xMax"]) + 1)
+        for y in range(int(group["yMin"]), int(group["yMax"]) + 1)
+    }
+
+
+def groups_intersect(group_a: dict, group_b: dict) -> bool:
+    return (
+        group_a["xMin"] <= group_b["xMax"]
+        and group_b["xMin"] <= group_a["xMax"]
+        and group_a["yMin"] <= group_b["yMax"]
+        and group_b["yMin"] <= group_a["yMax"]
+    )
+
 
 class TestTileGroupingFunctions(unittest.TestCase):
     def test_extent_to_group(self):
@@ -28,3 +50,76 @@ class TestTileGroupingFunctions(unittest.TestCase):
             test_groups = json.load(json_file)
 
         self.assertEqual(len(test_groups), len(created_groups))
+        self.assertEqual(get_tiles(test_groups), get_tiles(created_groups))
+
+    def test_groups_do_not_overlap(self):
+        groups = tile_grouping_functions.extent_to_groups(
+            os.path.join(FIXTURE_DIR, "completeness/closed_polygons.geojson"), 18, 100
+        )
+        groups = list(groups.values())
+        for i, group in enumerate(groups):
+            for group_b in groups[i + 1 :]:
+                self.assertFalse(groups_intersect(group, group_b))
+
+    def test_tile_runs(self):
+        # a rectangle with a hole along the edges of tiles at zoom 3
+        lons = vectorized_tile_functions.tile_longitudes(range(9), 3)
+        lats = vectorized_tile_functions.tile_latitudes(range(9), 3)
+        polygon = [
+            np.array(
+                [
+                    [lons[x], lats[y]]
+                    for x, y in [(1, 2), (6, 2), (6, 5), (1, 5), (1, 2)]
+                ]
+            ),
+            np.array(
+                [
+                    [lons[x], lats[y]]
+                    for x, y in [(2, 3), (2, 4), (4, 4), (4, 3), (2, 3)]
+                ]
+            ),
+        ]
+        occupancy = np.zeros((8, 8), dtype=bool)
+        for row, first, last in zip(
+            *tile_grouping_functions.get_tile_runs([polygon], 0, 0, 8, 8, 3)
+        ):
+            occupancy[row, first : last + 1] = True
+
+        expected = np.zeros((8, 8), dtype=bool)
+        expected[2:5, 1:6] = True
+        expected[3, 2:4] = False
+        self.assertEqual(occupancy.tolist(), expected.tolist())
+
+    def test_tile_runs_of_large_extent(self):
+        # a square of 10,000 x 10,000 tiles at zoom 18
+        x_left, y_top = 140000, 90000
+        lon_left, lon_right = vectorized_tile_functions.tile_longitudes(
+            [x_left, x_left + 10000], 18
+        )
+        lat_top, lat_bottom = vectorized_tile_functions.tile_latitudes(
+            [y_top, y_top + 10000], 18
+        )
+        polygon = [
+            np.array(
+                [
+                    [lon_left, lat_top],
+                    [lon_right, lat_top],
+                    [lon_right, lat_bottom],
+                    [lon_left, lat_bottom],
+                    [lon_left, lat_top],
+                ]
+            )
+        ]
+        rows, first, last = tile_grouping_functions.get_tile_runs(
+            [polygon], x_left, y_top, 10000, 10000, 18
+        )
+
+        # a few runs per row instead of a bitmap of all tiles
+        self.assertLess(len(rows), 5 * 10000)
+        self.assertEqual(np.unique(rows).tolist(), list(range(10000)))
+        first_of_row = np.full(10000, 10000)
+        np.minimum.at(first_of_row, rows, first)
+        last_of_row = np.full(10000, -1)
+        np.maximum.at(last_of_row, rows, last)
+        self.assertTrue((first_of_row == 0).all())
+        self.assertTrue((last_of_row == 9999).all())
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import os
+import time
+import unittest
+
+import dateutil.parser
+
+from mapswipe_workers.firebase_to_postgres.transfer_results import (
+    format_timestamp,
+    parse_timestamp,
+    results_to_file,
+)
+from tests.unittests.benchmark import benchmark
+
+
+def results_to_file_csv(results: dict, projectId: str):
+    """Previous implementation of results_to_file using csv.writer and dateutil.
+
+    Used as reference for the output and the performance of results_to_file.
+    """
+    results_file = io.StringIO("")
+    user_group_results_file = io.StringIO("")
+
+    w = csv.writer(results_file, delimiter="\t", quotechar="'")
+    user_group_results_csv = csv.writer(
+        user_group_results_file, delimiter="\t", quotechar="'"
+    )
+
+    for groupId, users in results.items():
+        for userId, result_data in users.items():
+            user_group_ids = [
+                user_group_id
+                for user_group_id, is_selected in result_data.get(
+                    "userGroups", {}
+                ).items()
+                if is_selected
+            ]
+
+            start_time = dateutil.parser.parse(result_data["startTime"])
+            end_time = dateutil.parser.parse(result_data["endTime"])
+            timestamp = end_time
+            app_version = result_data.get("appVersion", "")
+            client_type = result_data.get("clientType", "")
+
+            if type(result_data["results"]) is dict:
+                task_results = result_data["results"].items()
+            else:
+                task_results = [
+                    (taskId, result)
+                    for taskId, result in enumerate(result_data["results"])
+                    if result is not None
+                ]
+            for taskId, result in task_results:
+                w.writerow(
+                    [
+                        projectId,
+                        groupId,
+                        userId,
+                        taskId,
+                        timestamp,
+                        start_time,
+                        end_time,
+                        result,
+                        app_version,
+                        client_type,
+                    ]
+                )
+
+            if result_data["results"]:
+                user_group_results_csv.writerows(
+                    [
+                        [projectId, groupId, userId, user_group_id]
+                        for user_group_id in user_group_ids
+                    ]
+                )
+
+    results_file.seek(0)
+    user_group_results_file.seek(0)
+    return results_file, user_group_results_file
+
+
+def create_results(group_count: int, user_count: int, task_count: int) -> dict:
+    """Create results in the structure used by Firebase."""
+    results = {}
+    for g in range(group_count):
+        results[f"g{g}"] = {
+            f"user-{u}": {
+                "startTime": f"2021-03-01T10:{u % 60:02d}:12.{g % 1000:03d}Z",
+                "endTime": f"2021-03-01T11:{u % 60:02d}:12.{g % 1000:03d}Z",
+                "appVersion": "2.1.0",
+                "clientType": "mobile-android",
+                "userGroups": {"group-a": True, "group-b": False},
+                "results": {f"18-{t}-{g}": (t + u) % 4 for t in range(task_count)},
+            }
+            for u in range(user_count)
+        }
+    return results
+
+
+def to_rows(file: io.StringIO) -> list:
+    return file.getvalue().splitlines()
+
+
+class TestResultsToFile(unittest.TestCase):
+    def test_parse_timestamp(self):
+        for timestamp in [
+            "2020-02-03T15:39:39.332Z",
+            "2020-02-03T15:39:39.000Z",
+            "2020-02-03T15:39:39Z",
+            "2020-02-03 15:39:39",
+        ]:
+            self.assertEqual(
+                parse_timestamp(timestamp), dateutil.parser.parse(timestamp)
+            )
+            self.assertEqual(
+                format_timestamp(timestamp), str(dateutil.parser.parse(timestamp))
+            )
+
+    def test_same_output_as_csv(self):
+        file_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "..",
+            "integration",
+            "fixtures",
+            "tile_map_service_grid",
+            "results",
+            "build_area.json",
+        )
+        with open(file_path) as f:
+            results = json.load(f)
+        # Results of a second user stored as list by Firebase.
+        results["g116"] = {
+            "other-user": {
+                "startTime": "2020-02-03T14:36:29.286Z",
+                "endTime": "2020-02-03T15:39:39.332Z",
+                "results": [None, None, 1, 0, None, 2],
+            }
+        }
+
+        results_file, user_group_results_file = results_to_file(results, "test_project")
+        expected_file, expected_user_group_file = results_to_file_csv(
+            results, "test_project"
+        )
+        self.assertEqual(to_rows(results_file), to_rows(expected_file))
+        self.assertEqual(
+            to_rows(user_group_results_file), to_rows(expected_user_group_file)
+        )
+
+    def test_escape_values(self):
+        results = {
+            "g1": {
+                "user\twith\\tab": {
+                    "startTime": "2020-02-03T14:36:29.286Z",
+                    "endTime": "2020-02-03T15:39:39.332Z",
+                    "appVersion": "1.0\n",
+                    "results": {"task-1": 1},
+                }
+            }
+        }
+        results_file, _ = results_to_file(results, "test_project")
+        row = results_file.getvalue()
+        self.assertEqual(row.count("\n"), 1)
+        self.assertIn("\tuser\\twith\\\\tab\t", row)
+        self.assertIn("\t1.0\\n\t", row)
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare to the previous implementation for 1M results."""
+        results = create_results(group_count=1000, user_count=10, task_count=100)
+
+        start = time.perf_counter()
+        expected_file, _ = results_to_file_csv(results, "test_project")
+        csv_duration = time.perf_counter() - start
+
+        parse_timestamp.cache_clear()
+        format_timestamp.cache_clear()
+        start = time.perf_counter()
+        results_file, _ = results_to_file(results, "test_project")
+        duration = time.perf_counter() - start
+
+        self.assertEqual(to_rows(results_file), to_rows(expected_file))
+        self.assertLess(duration, csv_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
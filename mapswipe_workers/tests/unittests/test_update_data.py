@@ -0,0 +1,277 @@
+import concurrent.futures
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import firebase_admin
+import requests
+from firebase_admin import db, exceptions
+
+from mapswipe_workers.firebase import connection
+from mapswipe_workers.firebase_to_postgres import update_data
+from tests.unittests.benchmark import benchmark
+
+
+class FirebaseStandIn:
+    """Serve data like the REST API of the Firebase Realtime Database.
+
+    Each request takes `latency` seconds.
+    The first `overloaded_requests` requests are answered with HTTP 429.
+    The highest number of requests answered at the same time is recorded.
+    """
+
+    def __init__(self, data: dict, latency: float = 0.0, overloaded_requests: int = 0):
+        self.data = data
+        self.latency = latency
+        self.overloaded_requests = overloaded_requests
+        self.requests = 0
+        self.running = 0
+        self.max_running = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.app = firebase_admin.initialize_app(
+            options={
+                "databaseURL": f"http://127.0.0.1:{self.server.server_port}/?ns=test"
+            },
+            name=f"stand-in-{self.server.server_port}",
+        )
+        self.fb_db = SimpleNamespace(
+            reference=lambda path: db.reference(path, app=self.app)
+        )
+
+    def close(self):
+        firebase_admin.delete_app(self.app)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path: str, shallow: bool):
+        node = self.data
+        for key in path.strip("/").split("/"):
+            if not isinstance(node, dict):
+                return None
+            node = node.get(key)
+        if shallow and isinstance(node, dict):
+            return {
+                key: True if isinstance(value, dict) else value
+                for key, value in node.items()
+            }
+        return node
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(url.query)
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    stand_in.running += 1
+                    stand_in.max_running = max(stand_in.max_running, stand_in.running)
+                    stand_in.connections.add(self.client_address)
+                    overloaded = stand_in.requests <= stand_in.overloaded_requests
+                time.sleep(stand_in.latency)
+                with stand_in.lock:
+                    stand_in.running -= 1
+
+                if overloaded:
+                    status, value = 429, {"error": "Too many requests"}
+                else:
+                    path = url.path[: -len(".json")]
+                    shallow = query.get("shallow") == ["true"]
+                    status, value = 200, stand_in.get(path, shallow)
+
+                body = json.dumps(value).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def get_user_attribute_from_firebase(fb_db, user_ids, attribute):
+    """Previous implementation with one request per user and attribute.
+
+    Used as reference for the performance of get_attributes_from_firebase.
+    """
+
+    def get_user_attribute(_user_id, _attribute):
+        ref = fb_db.reference(f"v2/users/{_user_id}/{_attribute}")
+        return [_user_id, ref.get()]
+
+    user_attribute_dict = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+        futures = []
+        for user_id in user_ids:
+            futures.append(
+                executor.submit(
+                    get_user_attribute, _user_id=user_id, _attribute=attribute
+                )
+            )
+
+        for future in concurrent.futures.as_completed(futures):
+            user_id, status = future.result()
+            user_attribute_dict[user_id] = status
+    return user_attribute_dict
+
+
+def create_users(user_count: int, contribution_count: int) -> dict:
+    """Create users in the structure used by Firebase."""
+    return {
+        f"user-{u}": {
+            "username": f"name-{u}",
+            "created": "2021-03-01T10:12:13.456Z",
+            "taskContributionCount": u,
+            "contributions": {
+                f"project-{p}": {"groupId": "g1", "timestamp": "2021-03-01"}
+                for p in range(contribution_count)
+            },
+        }
+        for u in range(user_count)
+    }
+
+
+class TestGetAttributesFromFirebase(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            "v2": {
+                "users": create_users(user_count=3, contribution_count=2),
+                "projects": {"project-1": {"status": "active", "name": "test"}},
+            }
+        }
+        del self.data["v2"]["users"]["user-2"]["created"]
+
+    def get_attributes(self, stand_in: FirebaseStandIn, *args, **kwargs):
+        with mock.patch.object(
+            update_data.auth, "firebaseDB", return_value=stand_in.fb_db
+        ):
+            return update_data.get_attributes_from_firebase(*args, **kwargs)
+
+    def test_get_attributes(self):
+        stand_in = FirebaseStandIn(self.data)
+        self.addCleanup(stand_in.close)
+
+        users = self.get_attributes(
+            stand_in,
+            "v2/users",
+            ["user-0", "user-2", "missing-user"],
+            ["username", "created"],
+        )
+        self.assertEqual(
+            users,
+            {
+                "user-0": {
+                    "username": "name-0",
+                    "created": "2021-03-01T10:12:13.456Z",
+                },
+                "user-2": {"username": "name-2", "created": None},
+                "missing-user": {"username": None, "created": None},
+            },
+        )
+        # one request per user
+        self.assertEqual(stand_in.requests, 3)
+
+        projects = self.get_attributes(
+            stand_in, "v2/projects", ["project-1"], ["status"]
+        )
+        self.assertEqual(projects, {"project-1": {"status": "active"}})
+
+    def test_retry_if_overloaded(self):
+        stand_in = FirebaseStandIn(self.data, overloaded_requests=2)
+        self.addCleanup(stand_in.close)
+
+        users = self.get_attributes(
+            stand_in, "v2/users", ["user-0", "user-1"], ["username"]
+        )
+        self.assertEqual(
+            users, {"user-0": {"username": "name-0"}, "user-1": {"username": "name-1"}}
+        )
+        self.assertEqual(stand_in.requests, 4)
+
+    def test_parallel_requests_are_limited(self):
+        stand_in = FirebaseStandIn(self.data, latency=0.01)
+        self.addCleanup(stand_in.close)
+
+        # the first round sends 10 requests with a single worker
+        self.get_attributes(
+            stand_in, "v2/users", [f"user-{i}" for i in range(10)], ["username"], 4
+        )
+        self.assertEqual(stand_in.requests, 10)
+        self.assertEqual(stand_in.max_running, 1)
+
+    def test_raise_if_overloaded_too_often(self):
+        stand_in = FirebaseStandIn(self.data, overloaded_requests=100)
+        self.addCleanup(stand_in.close)
+
+        with self.assertRaises(exceptions.ResourceExhaustedError):
+            self.get_attributes(stand_in, "v2/users", ["user-0"], ["username"])
+        self.assertEqual(stand_in.requests, 3)
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare to one request per user and attribute for 2000 new users."""
+        data = {"v2": {"users": create_users(user_count=2000, contribution_count=20)}}
+        user_ids = list(data["v2"]["users"].keys())
+
+        stand_in = FirebaseStandIn(data, latency=0.002)
+        self.addCleanup(stand_in.close)
+        start = time.perf_counter()
+        usernames = get_user_attribute_from_firebase(
+            stand_in.fb_db, user_ids, "username"
+        )
+        created = get_user_attribute_from_firebase(stand_in.fb_db, user_ids, "created")
+        single_duration = time.perf_counter() - start
+
+        stand_in = FirebaseStandIn(data, latency=0.002)
+        self.addCleanup(stand_in.close)
+        start = time.perf_counter()
+        users = self.get_attributes(
+            stand_in, "v2/users", user_ids, ["username", "created"]
+        )
+        duration = time.perf_counter() - start
+
+        for user_id in user_ids:
+            self.assertEqual(users[user_id]["username"], usernames[user_id])
+            self.assertEqual(users[user_id]["created"], created[user_id])
+        self.assertEqual(stand_in.requests, len(user_ids))
+        self.assertLessEqual(len(stand_in.connections), 20)
+        self.assertLess(duration, single_duration)
+
+
+class TestFirebaseConnection(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = FirebaseStandIn({})
+        self.addCleanup(self.stand_in.close)
+
+    def test_keep_firebase_connections_alive(self):
+        session = connection.get_firebase_session(self.stand_in.fb_db)
+        self.assertIsInstance(session, requests.Session)
+
+        connection.keep_firebase_connections_alive(self.stand_in.fb_db, 30)
+        self.assertEqual(session.get_adapter("http://")._pool_maxsize, 30)
+
+    def test_unknown_firebase_admin_version(self):
+        with mock.patch.object(connection.firebase_admin, "__version__", "99.0.0"):
+            self.assertIsNone(connection.get_firebase_session(self.stand_in.fb_db))
+            # uses the default connection pool
+            connection.keep_firebase_connections_alive(self.stand_in.fb_db, 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,97 @@
 import os
+import time
 import unittest
 
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_frame_equal
 
-from mapswipe_workers.generate_stats.user_stats import get_agg_results_by_user_id
+from mapswipe_workers.generate_stats.project_stats import (
+    get_counts_by_task_id,
+    get_task_counts,
+)
+from mapswipe_workers.generate_stats.user_stats import (
+    add_simple_agreement_score,
+    get_agg_results_by_user_id_from_contributions,
+    get_contributions_by_user_id,
+    get_raw_contributions,
+)
+from tests.unittests.benchmark import benchmark
+
+CUSTOM_OPTIONS = {0: set(), 1: set(), 2: set(), 3: set()}
+
+
+def create_results(number_of_results: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    return pd.DataFrame(
+        {
+            "project_id": "project",
+            "group_id": "g1",
+            "user_id": rng.integers(0, number_of_results // 20, number_of_results)
+            .astype(str)
+            .astype(object),
+            "task_id": rng.integers(0, number_of_results // 5, number_of_results)
+            .astype(str)
+            .astype(object),
+            "result": rng.choice([0, 1, 2, 3, -999], number_of_results),
+        }
+    ).drop_duplicates(["user_id", "task_id"], ignore_index=True)
+
+
+def get_agg_results(results_df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        get_counts_by_task_id(
+            get_task_counts(results_df[results_df["result"] != -999]), CUSTOM_OPTIONS
+        )
+        .reset_index(level="project_id", drop=True)
+        .reset_index()
+    )
+
+
+def get_raw_contributions_row_by_row(
+    results_df: pd.DataFrame, agg_results_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Compare each result to the counts of its task as reference."""
+
+    def _agreeing(row):
+        if row["result"] == -999:
+            return 0
+        return row[f"{row['result']}_count"] - 1
+
+    def _disagreeing(row):
+        if row["total_count"] == 0:
+            return 0
+        return row["total_count"] - (row["agreeing_contributions"] + 1)
+
+    raw_contributions_df = results_df.merge(agg_results_df, on=["group_id", "task_id"])
+    raw_contributions_df["agreeing_contributions"] = raw_contributions_df.apply(
+        _agreeing, axis=1
+    )
+    raw_contributions_df["disagreeing_contributions"] = raw_contributions_df.apply(
+        _disagreeing, axis=1
+    )
+    return raw_contributions_df
+
+
+def get_agg_results_by_user_id(
+    results_df: pd.DataFrame, agg_results_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Aggregate the row by row contributions of all results as reference."""
+    raw_contributions_df = get_raw_contributions_row_by_row(results_df, agg_results_df)
+    agg_results_by_user_id_df = raw_contributions_df.groupby(
+        ["project_id", "user_id", "username"]
+    ).agg(
+        groups_completed=pd.NamedAgg(column="group_id", aggfunc=pd.Series.nunique),
+        total_contributions=pd.NamedAgg(column="user_id", aggfunc="count"),
+        agreeing_contributions=pd.NamedAgg(
+            column="agreeing_contributions", aggfunc="sum"
+        ),
+        disagreeing_contributions=pd.NamedAgg(
+            column="disagreeing_contributions", aggfunc="sum"
+        ),
+    )
+    add_simple_agreement_score(agg_results_by_user_id_df)
+    return agg_results_by_user_id_df.reset_index()
 
 
 class TestUserStats(unittest.TestCase):
@@ -28,15 +115,125 @@ class TestUserStats(unittest.TestCase):
 
     def test_get_agg_results_by_user_id(self):
 
-        agg_results_by_user_id_df = get_agg_results_by_user_id(
-            self.results_df, self.agg_results_df
+        agg_results_by_user_id_df = get_agg_results_by_user_id_from_contributions(
+            get_contributions_by_user_id(self.results_df, self.agg_results_df),
+            self.results_df[["project_id", "group_id", "user_id"]],
+            self.results_df.groupby("user_id")["username"].last(),
         )
-        agg_results_by_user_id_df.sort_index(inplace=True)
 
         assert_frame_equal(
             agg_results_by_user_id_df, self.user_stats_df, check_dtype=False
         )
 
 
+class TestContributions(unittest.TestCase):
+    def setUp(self):
+        self.results_df = create_results(2000)
+        self.agg_results_df = get_agg_results(self.results_df)
+
+    def test_get_raw_contributions(self):
+        raw_contributions_df = get_raw_contributions(
+            self.results_df, self.agg_results_df
+        )
+        expected = get_raw_contributions_row_by_row(
+            self.results_df, self.agg_results_df
+        )
+        self.assertEqual(
+            sorted(
+                zip(
+                    raw_contributions_df["user_id"],
+                    raw_contributions_df["task_id"],
+                    raw_contributions_df["agreeing_contributions"],
+                    raw_contributions_df["disagreeing_contributions"],
+                )
+            ),
+            sorted(
+                zip(
+                    expected["user_id"],
+                    expected["task_id"],
+                    expected["agreeing_contributions"],
+                    expected["disagreeing_contributions"],
+                )
+            ),
+        )
+        self.assertListEqual(
+            list(raw_contributions_df.columns),
+            list(self.results_df.columns)
+            + ["agreeing_contributions", "disagreeing_contributions"],
+        )
+
+    def test_get_contributions_by_user_id_in_chunks(self):
+        expected = get_contributions_by_user_id(self.results_df, self.agg_results_df)
+        self.assertEqual(
+            expected["total_contributions"].sum(),
+            self.results_df["task_id"].isin(self.agg_results_df["task_id"]).sum(),
+        )
+        for users_per_chunk in [1, 7, 1000]:
+            assert_frame_equal(
+                get_contributions_by_user_id(
+                    self.results_df, self.agg_results_df, users_per_chunk
+                ),
+                expected,
+            )
+
+    def test_task_in_several_groups(self):
+        results_df = pd.DataFrame(
+            {
+                "project_id": "project",
+                "group_id": ["g1", "g1", "g1", "g2", "g2"],
+                "user_id": ["a", "b", "c", "a", "b"],
+                "task_id": "18-1-2",
+                "result": [1, 1, 0, 0, 1],
+            }
+        )
+        agg_results_df = get_agg_results(results_df)
+        self.assertEqual(len(agg_results_df), 2)
+
+        raw_contributions_df = get_raw_contributions(results_df, agg_results_df)
+        self.assertListEqual(
+            raw_contributions_df["agreeing_contributions"].tolist(), [1, 1, 0, 0, 0]
+        )
+        self.assertListEqual(
+            raw_contributions_df["disagreeing_contributions"].tolist(),
+            [1, 1, 2, 1, 1],
+        )
+        self.assertListEqual(
+            get_contributions_by_user_id(results_df, agg_results_df)[
+                "total_contributions"
+            ].tolist(),
+            [2, 2, 1],
+        )
+
+    def test_no_results(self):
+        contributions_df = get_contributions_by_user_id(
+            self.results_df.iloc[:0], self.agg_results_df
+        )
+        self.assertTrue(contributions_df.empty)
+        self.assertListEqual(
+            list(contributions_df.columns),
+            [
+                "total_contributions",
+                "agreeing_contributions",
+                "disagreeing_contributions",
+            ],
+        )
+
+    @benchmark
+    def test_benchmark(self):
+        """Compare to the row by row calculation for 50,000 results."""
+        results_df = create_results(50000)
+        agg_results_df = get_agg_results(results_df)
+
+        start = time.perf_counter()
+        get_raw_contributions_row_by_row(results_df, agg_results_df)
+        row_by_row_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_contributions_by_user_id(results_df, agg_results_df)
+        duration = time.perf_counter() - start
+
+        self.assertLess(duration, row_by_row_duration)
+
+
 if __name__ == "__main__":
     unittest.main()
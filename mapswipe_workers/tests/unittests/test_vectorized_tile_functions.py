@@ -0,0 +1,331 @@
+import random
+import struct
+import time
+import unittest
+
+import numpy as np
+
+from mapswipe_workers.utils import tile_functions, vectorized_tile_functions
+from tests.unittests.benchmark import benchmark
+
+TILE_SERVERS = [
+    {"name": "bing", "url": "", "apiKey": "bing-key"},
+    {
+        "name": "sinergise",
+        "url": "https://services.sentinel-hub.com/ogc/wmts/{key}?tilematrix={z}"
+        "&tilecol={x}&tilerow={y}&layer={layer}",
+        "apiKey": "sinergise-key",
+        "wmtsLayerName": "layer",
+    },
+    {
+        "name": "maxar_premium",
+        "url": "https://maxar.example.com/{z}/{x}/{y}.png?key={key}",
+        "apiKey": "maxar-key",
+    },
+    {"name": "custom", "url": "https://tiles.example.com/{z}/{x}/{-y}.png"},
+    {"name": "custom", "url": "https://tiles.example.com/{z}/{x}/{y}.png"},
+]
+
+
+def random_extents(count: int) -> list:
+    extents = [
+        # Tiles around latitude 0 and longitude 0.
+        (131068, 131076, 131068, 131076, 18),
+        # Tiles at the border of the world.
+        (0, 5, 0, 5, 18),
+        (262138, 262143, 262138, 262143, 18),
+        (0, 1, 0, 1, 1),
+    ]
+    random.seed(42)
+    for _ in range(count):
+        zoom = random.choice([10, 14, 16, 18, 19])
+        x_min = random.randint(0, 2**zoom - 20)
+        y_min = random.randint(0, 2**zoom - 20)
+        extents.append(
+            (x_min, x_min + random.randint(0, 19), y_min, y_min + random.randint(0, 19))
+            + (zoom,)
+        )
+    return extents
+
+
+def random_tiles(count: int, zoom: int) -> tuple:
+    rng = np.random.default_rng(42)
+    return rng.integers(0, 2**zoom, count), rng.integers(0, 2**zoom, count)
+
+
+def random_points(count: int) -> tuple:
+    rng = np.random.default_rng(42)
+    return rng.uniform(-85, 85, count), rng.uniform(-180, 180, count)
+
+
+def quadkey_to_tile_coords(quadkey: str) -> tuple:
+    """Decode a quadkey digit by digit as reference for the benchmark."""
+    tile_x = tile_y = 0
+    for digit in quadkey:
+        tile_x = (tile_x << 1) | (int(digit) & 1)
+        tile_y = (tile_y << 1) | (int(digit) >> 1)
+    return tile_x, tile_y, len(quadkey)
+
+
+class TestVectorizedTileFunctions(unittest.TestCase):
+    def test_same_geometries_as_ogr(self):
+        for x_min, x_max, y_min, y_max, zoom in random_extents(20):
+            tile_x, tile_y = vectorized_tile_functions.tiles_of_extent(
+                x_min, x_max, y_min, y_max
+            )
+            geometries = vectorized_tile_functions.geometries_from_tile_coords(
+                tile_x, tile_y, zoom
+            )
+            expected = [
+                tile_functions.geometry_from_tile_coords(x, y, zoom)
+                for x in range(x_min, x_max + 1)
+                for y in range(y_min, y_max + 1)
+            ]
+            self.assertEqual(geometries, expected)
+
+    def test_format_wkt_number(self):
+        for value, expected in [
+            (8.52951049804688, "8.52951049804688"),
+            (-45.0, "-45"),
+            (0.0, "0.0"),
+            (0.5, "0.5"),
+            (1e-7, "0.0000001"),
+            (-0.123456789012345678, "-0.123456789012346"),
+            (0.9999999999999, "1.0"),
+            (-0.9999999999999, "-1.0"),
+            (0.1000000000000001, "0.1"),
+            (-0.001373291015497, "-0.001373291015497"),
+        ]:
+            self.assertEqual(
+                vectorized_tile_functions.format_wkt_number(value), expected
+            )
+
+    def test_quadkeys(self):
+        for x_min, x_max, y_min, y_max, zoom in random_extents(20):
+            tile_x, tile_y = vectorized_tile_functions.tiles_of_extent(
+                x_min, x_max, y_min, y_max
+            )
+            quadkeys = vectorized_tile_functions.tile_quadkeys(tile_x, tile_y, zoom)
+            expected = [
+                tile_functions.tile_coords_and_zoom_to_quadKey(x, y, zoom)
+                for x, y in zip(tile_x.tolist(), tile_y.tolist())
+            ]
+            self.assertEqual(quadkeys.tolist(), expected)
+
+    def test_urls(self):
+        for tile_server in TILE_SERVERS:
+            tile_server = {"apiKey": None, **tile_server}
+            for x_min, x_max, y_min, y_max, zoom in random_extents(5):
+                tile_x, tile_y = vectorized_tile_functions.tiles_of_extent(
+                    x_min, x_max, y_min, y_max
+                )
+                urls = vectorized_tile_functions.tile_urls(
+                    tile_x, tile_y, zoom, tile_server
+                )
+                expected = [
+                    tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                        x, y, zoom, tile_server
+                    )
+                    for x, y in zip(tile_x.tolist(), tile_y.tolist())
+                ]
+                self.assertEqual(urls, expected)
+
+    def test_geometries_from_tile_coords(self):
+        tile_x, tile_y = random_tiles(1000, 18)
+        geometries = vectorized_tile_functions.geometries_from_tile_coords(
+            tile_x, tile_y, 18
+        )
+        expected = [
+            tile_functions.geometry_from_tile_coords(x, y, 18)
+            for x, y in zip(tile_x.tolist(), tile_y.tolist())
+        ]
+        self.assertEqual(geometries, expected)
+
+    def test_wkb_polygons_from_tile_coords(self):
+        tile_x, tile_y = random_tiles(1000, 18)
+        geometries = vectorized_tile_functions.wkb_polygons_from_tile_coords(
+            tile_x, tile_y, 18
+        )
+        for x, y, geometry in zip(tile_x.tolist(), tile_y.tolist(), geometries):
+            lon_left, lat_top = tile_functions.pixel_coords_zoom_to_lat_lon(
+                x * 256, y * 256, 18
+            )
+            lon_right, lat_bottom = tile_functions.pixel_coords_zoom_to_lat_lon(
+                (x + 1) * 256, (y + 1) * 256, 18
+            )
+            expected = struct.pack(
+                "<BIII10d",
+                1,
+                3,
+                1,
+                5,
+                *(lon_left, lat_top, lon_right, lat_top, lon_right, lat_bottom),
+                *(lon_left, lat_bottom, lon_left, lat_top),
+            )
+            self.assertEqual(geometry, expected)
+
+    def test_quadkeys_to_tile_coords(self):
+        random.seed(42)
+        tiles = [(0, 0, 0)]
+        for _ in range(1000):
+            zoom = random.randint(1, 22)
+            size = 2**zoom
+            tiles.append((random.randrange(size), random.randrange(size), zoom))
+        quadkeys = [
+            tile_functions.tile_coords_and_zoom_to_quadKey(x, y, zoom)
+            for x, y, zoom in tiles
+        ]
+        tile_x, tile_y, zoom = vectorized_tile_functions.quadkeys_to_tile_coords(
+            quadkeys
+        )
+        self.assertEqual(list(zip(tile_x, tile_y, zoom)), tiles)
+
+        with self.assertRaises(ValueError):
+            vectorized_tile_functions.quadkeys_to_tile_coords(["0124"])
+
+    def test_pixel_coords(self):
+        lat, lon = random_points(1000)
+        pixel_x, pixel_y = vectorized_tile_functions.lat_long_zoom_to_pixel_coords(
+            lat, lon, 18
+        )
+        expected = [
+            tile_functions.lat_long_zoom_to_pixel_coords(*point, 18)
+            for point in zip(lat.tolist(), lon.tolist())
+        ]
+        self.assertEqual(pixel_x.tolist(), [p.x for p in expected])
+        self.assertEqual(pixel_y.tolist(), [p.y for p in expected])
+
+        tile_x, tile_y = vectorized_tile_functions.pixel_coords_to_tile_address(
+            pixel_x, pixel_y
+        )
+        expected = [
+            tile_functions.pixel_coords_to_tile_address(*pixel)
+            for pixel in zip(pixel_x.tolist(), pixel_y.tolist())
+        ]
+        self.assertEqual(tile_x.tolist(), [t.x for t in expected])
+        self.assertEqual(tile_y.tolist(), [t.y for t in expected])
+
+        lon, lat = vectorized_tile_functions.pixel_coords_zoom_to_lat_lon(
+            pixel_x, pixel_y, 18
+        )
+        expected = [
+            tile_functions.pixel_coords_zoom_to_lat_lon(*pixel, 18)
+            for pixel in zip(pixel_x.tolist(), pixel_y.tolist())
+        ]
+        self.assertEqual(lon.tolist(), [lon for lon, _ in expected])
+        np.testing.assert_allclose(lat, [lat for _, lat in expected], atol=1e-12)
+
+    def test_tiles_of_extent(self):
+        tile_x, tile_y = vectorized_tile_functions.tiles_of_extent(10, 11, 20, 22)
+        np.testing.assert_array_equal(tile_x, [10, 10, 10, 11, 11, 11])
+        np.testing.assert_array_equal(tile_y, [20, 21, 22, 20, 21, 22])
+
+
+@benchmark
+class TestBenchmark(unittest.TestCase):
+    """Compare the vectorized functions to the scalar functions for 100,000 tiles."""
+
+    count = 100000
+
+    def compare(self, name, scalar_function, vectorized_function):
+        start = time.perf_counter()
+        scalar_function()
+        scalar_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized_function()
+        duration = time.perf_counter() - start
+
+        self.assertLess(duration, scalar_duration, name)
+
+    def test_lat_long_zoom_to_pixel_coords(self):
+        lat, lon = random_points(self.count)
+        self.compare(
+            "lat_long_zoom_to_pixel_coords",
+            lambda: [
+                tile_functions.lat_long_zoom_to_pixel_coords(*point, 18)
+                for point in zip(lat.tolist(), lon.tolist())
+            ],
+            lambda: vectorized_tile_functions.lat_long_zoom_to_pixel_coords(
+                lat, lon, 18
+            ),
+        )
+
+    def test_pixel_coords_zoom_to_lat_lon(self):
+        pixel_x, pixel_y = random_tiles(self.count, 26)
+        self.compare(
+            "pixel_coords_zoom_to_lat_lon",
+            lambda: [
+                tile_functions.pixel_coords_zoom_to_lat_lon(*pixel, 18)
+                for pixel in zip(pixel_x.tolist(), pixel_y.tolist())
+            ],
+            lambda: vectorized_tile_functions.pixel_coords_zoom_to_lat_lon(
+                pixel_x, pixel_y, 18
+            ),
+        )
+
+    def test_pixel_coords_to_tile_address(self):
+        pixel_x, pixel_y = random_tiles(self.count, 26)
+        self.compare(
+            "pixel_coords_to_tile_address",
+            lambda: [
+                tile_functions.pixel_coords_to_tile_address(*pixel)
+                for pixel in zip(pixel_x.tolist(), pixel_y.tolist())
+            ],
+            lambda: vectorized_tile_functions.pixel_coords_to_tile_address(
+                pixel_x, pixel_y
+            ),
+        )
+
+    def test_tile_quadkeys(self):
+        tile_x, tile_y = random_tiles(self.count, 18)
+        self.compare(
+            "tile_quadkeys",
+            lambda: [
+                tile_functions.tile_coords_and_zoom_to_quadKey(x, y, 18)
+                for x, y in zip(tile_x.tolist(), tile_y.tolist())
+            ],
+            lambda: vectorized_tile_functions.tile_quadkeys(tile_x, tile_y, 18),
+        )
+
+    def test_quadkeys_to_tile_coords(self):
+        tile_x, tile_y = random_tiles(self.count, 18)
+        quadkeys = vectorized_tile_functions.tile_quadkeys(tile_x, tile_y, 18)
+        self.compare(
+            "quadkeys_to_tile_coords",
+            lambda: [quadkey_to_tile_coords(q) for q in quadkeys.tolist()],
+            lambda: vectorized_tile_functions.quadkeys_to_tile_coords(quadkeys),
+        )
+
+    def test_geometries_from_tile_coords(self):
+        tile_x, tile_y = random_tiles(self.count, 18)
+        self.compare(
+            "geometries_from_tile_coords",
+            lambda: [
+                tile_functions.geometry_from_tile_coords(x, y, 18)
+                for x, y in zip(tile_x.tolist(), tile_y.tolist())
+            ],
+            lambda: vectorized_tile_functions.geometries_from_tile_coords(
+                tile_x, tile_y, 18
+            ),
+        )
+
+    def test_tile_urls(self):
+        tile_x, tile_y = random_tiles(self.count, 18)
+        tile_server = TILE_SERVERS[0]
+        self.compare(
+            "tile_urls",
+            lambda: [
+                tile_functions.tile_coords_zoom_and_tileserver_to_url(
+                    x, y, 18, tile_server
+                )
+                for x, y in zip(tile_x.tolist(), tile_y.tolist())
+            ],
+            lambda: vectorized_tile_functions.tile_urls(
+                tile_x, tile_y, 18, tile_server
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -256,3 +256,90 @@ CREATE TABLE IF NOT EXISTS results_user_groups_temp (
     user_id varchar,
     user_group_id varchar
 );
+
+-- Number of users who contributed to a group and number of groups
+-- a user contributed to per project. Both tables are maintained by
+-- triggers on mapping_sessions. They are used to get the progress and the
+-- number of contributors of a project without scanning mapping_sessions.
+CREATE TABLE IF NOT EXISTS groups_progress (
+    project_id varchar,
+    group_id varchar,
+    number_of_users int not null,
+    PRIMARY KEY (project_id, group_id),
+    FOREIGN KEY (project_id, group_id)
+    REFERENCES groups (project_id, group_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS projects_contributors (
+    project_id varchar,
+    user_id varchar,
+    number_of_groups int not null,
+    PRIMARY KEY (project_id, user_id),
+    FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION mapping_sessions_insert_progress() RETURNS trigger
+    LANGUAGE plpgsql AS
+$$
+BEGIN
+    INSERT INTO groups_progress (project_id, group_id, number_of_users)
+        SELECT project_id, group_id, count(*)
+        FROM new_mapping_sessions
+        GROUP BY project_id, group_id
+    ON CONFLICT (project_id, group_id)
+    DO UPDATE SET number_of_users = groups_progress.number_of_users + EXCLUDED.number_of_users;
+
+    INSERT INTO projects_contributors (project_id, user_id, number_of_groups)
+        SELECT project_id, user_id, count(*)
+        FROM new_mapping_sessions
+        GROUP BY project_id, user_id
+    ON CONFLICT (project_id, user_id)
+    DO UPDATE SET number_of_groups = projects_contributors.number_of_groups + EXCLUDED.number_of_groups;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION mapping_sessions_delete_progress() RETURNS trigger
+    LANGUAGE plpgsql AS
+$$
+BEGIN
+    UPDATE groups_progress gp
+    SET number_of_users = gp.number_of_users - removed.count
+    FROM (
+        SELECT project_id, group_id, count(*)
+        FROM old_mapping_sessions
+        GROUP BY project_id, group_id
+    ) removed
+    WHERE gp.project_id = removed.project_id AND gp.group_id = removed.group_id;
+
+    DELETE FROM groups_progress gp
+    USING old_mapping_sessions removed
+    WHERE gp.project_id = removed.project_id
+        AND gp.group_id = removed.group_id
+        AND gp.number_of_users <= 0;
+
+    UPDATE projects_contributors pc
+    SET number_of_groups = pc.number_of_groups - removed.count
+    FROM (
+        SELECT project_id, user_id, count(*)
+        FROM old_mapping_sessions
+        GROUP BY project_id, user_id
+    ) removed
+    WHERE pc.project_id = removed.project_id AND pc.user_id = removed.user_id;
+
+    DELETE FROM projects_contributors pc
+    USING old_mapping_sessions removed
+    WHERE pc.project_id = removed.project_id
+        AND pc.user_id = removed.user_id
+        AND pc.number_of_groups <= 0;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER insert_mapping_sessions_progress AFTER INSERT ON mapping_sessions
+    REFERENCING NEW TABLE AS new_mapping_sessions
+    FOR EACH STATEMENT EXECUTE PROCEDURE mapping_sessions_insert_progress();
+
+CREATE TRIGGER delete_mapping_sessions_progress AFTER DELETE ON mapping_sessions
+    REFERENCING OLD TABLE AS old_mapping_sessions
+    FOR EACH STATEMENT EXECUTE PROCEDURE mapping_sessions_delete_progress();